@@ -0,0 +1,72 @@
+"""
+JSONバックエンド（orjson / ujson / json）のパース・シリアライズのマイクロベンチマーク
+
+生成したTwitterエクスポート風のアーカイブに対して、インストールされている各バックエンドの
+パース（アーカイブ全体を一括パース）とシリアライズ（ツイートごとにコンパクトなJSONへ変換）の
+スループット（MB/s）を計測し、出力が標準ライブラリとバイト単位で一致することを確認する。
+
+使用方法: python benchmarks/bench_json_backends.py [ツイート数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import json_codec
+
+def generate_archive(tweet_count, seed=0):
+    """日本語・顔文字・URLを含む {"tweet": {...}} 形式のツイートの配列を生成する"""
+    rnd = random.Random(seed)
+    pieces = ['今日は', 'いい天気ですね', 'テスト', 'ツイート', 'Python', 'hello world', '漢字かなカナ',
+              '😀', '🚀', '♥', '\n', '"引用"', 'https://t.co/abc']
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    tweets = []
+    for i in range(tweet_count):
+        tweet_id = str(1000000000000000000 + i)
+        text = ''.join(rnd.choice(pieces) for _ in range(rnd.randrange(5, 40)))
+        tweets.append({"tweet": {
+            "id_str": tweet_id,
+            "id": tweet_id,
+            "created_at": f"Wed {rnd.choice(months)} {rnd.randrange(1, 29):02d} 12:34:56 +0000 20{rnd.randrange(10, 24)}",
+            "full_text": text,
+            "lang": "ja",
+            "favorite_count": str(rnd.randrange(100)),
+            "retweet_count": str(rnd.randrange(10)),
+            "favorited": False,
+            "retweeted": False,
+            "display_text_range": ["0", str(len(text))],
+            "entities": {"hashtags": [], "symbols": [], "user_mentions": [],
+                         "urls": [{"url": "https://t.co/abc", "expanded_url": "https://example.com/", "indices": ["0", "23"]}]},
+        }})
+    return tweets
+
+def measure(func, repeat=3):
+    """最良の実行時間（秒）を返す"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    tweet_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    tweets = generate_archive(tweet_count)
+    archive = json_codec.stdlib_dumps(tweets)
+    size_mb = len(archive) / 1024 / 1024
+    expected = [json_codec.stdlib_dumps(tweet) for tweet in tweets]
+    print(f"アーカイブサイズ: {size_mb:.2f} MB ({tweet_count} ツイート)")
+
+    for backend in json_codec.available_backends():
+        json_codec.select_backend(backend)
+        # 結果が標準ライブラリと一致することを確認
+        assert json_codec.loads(archive) == tweets
+        assert [json_codec.dumps(tweet) for tweet in tweets] == expected
+        parse_time = measure(lambda: json_codec.loads(archive))
+        dump_time = measure(lambda: [json_codec.dumps(tweet) for tweet in tweets])
+        print(f"{backend:<8} パース: {size_mb / parse_time:8.2f} MB/s  シリアライズ: {size_mb / dump_time:8.2f} MB/s")
+
+if __name__ == "__main__":
+    main()
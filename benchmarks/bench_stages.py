@@ -0,0 +1,196 @@
+"""
+split_twitter_log_by_time の処理段階ごとのベンチマーク
+
+生成したアーカイブ（または指定したファイル）に対して、次の段階の処理時間を個別に計測する。
+- load: ファイルの読み込み（デコード・JSONパース）
+- detect: 日時キーとフォーマットの特定
+- parse_dates: 全ツイートの日時のパース
+- sort: 時系列順のソート
+- group: 期間ごとのグループ化
+- split: サイズ上限ごとのパートへの分割（シリアライズ・結合）
+- write: パートのファイルへの書き込み
+- remove_emojis: 全ツイートの本文に対する remove_emojis
+- total: split_twitter_log_by_time 全体
+
+結果はJSONファイルに保存でき、--compare で以前の結果と比較できる。
+
+使用方法: python benchmarks/bench_stages.py [ツイート数|入力ファイル] [--layout=js|array] [--text-only]
+          [--group-by=<単位>] [--size=<MB>] [--repeat=<N>] [--output=<結果.json>] [--compare=<以前の結果.json>]
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from operator import itemgetter
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+# リポジトリのルートの twitter_log_splitter と、アーカイブの生成スクリプトを参照できるようにする
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+sys.path.insert(0, BENCHMARK_DIR)
+import generate_archive
+import twitter_log_splitter as tls
+
+STAGES = ['load', 'detect', 'parse_dates', 'sort', 'group', 'split', 'write', 'remove_emojis', 'total']
+
+@contextlib.contextmanager
+def quiet():
+    """計測対象の処理が出力するメッセージと進捗バーを抑制する"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+class StageTimer:
+    """段階ごとの処理時間を記録する"""
+    def __init__(self):
+        self.times = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.times[name] = time.perf_counter() - start
+
+def run_stages(input_path, output_dir, max_size_bytes, text_only, group_by):
+    """split_in_memory と同じ順序で各段階を実行し、処理時間を返す"""
+    timer = StageTimer()
+    with quiet():
+        with timer.stage('load'):
+            tweets = tls.read_tweet_parts(tls.resolve_input_files(input_path))
+
+        with timer.stage('detect'):
+            schema = tls.get_tweet_schema(tweets[0])
+            get_value = schema.get_date
+            parse = tls.make_date_parser(schema.time_format)
+
+        with timer.stage('parse_dates'):
+            keyed_tweets = [(parse(get_value(tweet)), tweet) for tweet in tweets]
+
+        with timer.stage('sort'):
+            keyed_tweets.sort(key=itemgetter(0))
+
+        with timer.stage('group'):
+            period_key = tls.make_period_key(group_by)
+            grouped_tweets = {}
+            for epoch, tweet in keyed_tweets:
+                grouped_tweets.setdefault(period_key(epoch), []).append(tweet)
+
+        with timer.stage('split'):
+            parts = []
+            for period, period_tweets in sorted(grouped_tweets.items()):
+                if text_only:
+                    batches = tls.iter_text_batches(tls.iter_tweet_texts(period_tweets), max_size_bytes)
+                    join = tls.join_text_part
+                else:
+                    batches = tls.iter_size_bounded_batches(
+                        ((item, len(item[1])) for item in tls.iter_serialized_tweets(period_tweets)), max_size_bytes
+                    )
+                    join = tls.join_json_part
+                for number, batch in enumerate(batches, 1):
+                    parts.append((f"{period}_part_{number}.txt", join(batch)))
+
+        with timer.stage('write'):
+            for file_name, content in parts:
+                tls.write_bytes_atomic(os.path.join(output_dir, file_name), content)
+
+        texts = [(tweet.get('tweet', tweet).get('full_text') or tweet.get('tweet', tweet).get('text') or '') for tweet in tweets]
+        with timer.stage('remove_emojis'):
+            for text in texts:
+                tls.remove_emojis(text)
+
+    timer.times['parts'] = len(parts)
+    return timer.times, len(tweets)
+
+def run_total(input_path, output_dir, max_size_bytes, text_only, group_by):
+    """split_twitter_log_by_time 全体の処理時間を返す"""
+    with quiet():
+        start = time.perf_counter()
+        tls.split_twitter_log_by_time(input_path, output_dir, max_size_bytes, text_only=text_only, group_by=group_by)
+        return time.perf_counter() - start
+
+def print_results(results, previous=None):
+    """段階ごとの処理時間を表示する（以前の結果があれば比較する）"""
+    tweet_count = results['meta']['tweets']
+    header = f"{'段階':<14} {'時間(秒)':>10} {'ツイート/秒':>14}"
+    if previous:
+        header += f" {'以前(秒)':>10} {'比率':>8}"
+    print(header)
+    for stage in STAGES:
+        seconds = results['stages'].get(stage)
+        if seconds is None:
+            continue
+        line = f"{stage:<14} {seconds:>10.3f} {tweet_count / seconds if seconds else 0:>14,.0f}"
+        if previous and stage in previous['stages']:
+            old = previous['stages'][stage]
+            line += f" {old:>10.3f} {seconds / old if old else 0:>7.2f}x"
+        print(line)
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    options = dict(flag[2:].split('=', 1) for flag in flags if '=' in flag)
+    text_only = '--text-only' in flags
+    layout = options.get('layout', 'js')
+    group_by = options.get('group-by', 'month')
+    max_size_bytes = int(float(options.get('size', 5)) * 1024 * 1024)
+    repeat = int(options.get('repeat', 1))
+    target = args[0] if args else '100000'
+
+    with tempfile.TemporaryDirectory(prefix='bench-stages-') as work_dir:
+        if os.path.exists(target):
+            input_path = target
+        else:
+            input_path = os.path.join(work_dir, 'tweets.js' if layout == 'js' else 'tweets.json')
+            generate_archive.write_archive(input_path, int(target), layout)
+        input_size = os.path.getsize(input_path)
+
+        # 各段階の最良の処理時間を記録
+        best = {}
+        for i in range(repeat):
+            for name in ('stages', 'total'):
+                output_dir = os.path.join(work_dir, f"out_{name}_{i}")
+                os.makedirs(output_dir)
+                if name == 'stages':
+                    times, tweet_count = run_stages(input_path, output_dir, max_size_bytes, text_only, group_by)
+                else:
+                    times = {'total': run_total(input_path, output_dir, max_size_bytes, text_only, group_by)}
+                for stage, seconds in times.items():
+                    best[stage] = seconds if stage not in best else min(best[stage], seconds)
+
+    parts = best.pop('parts')
+    results = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'input': target if os.path.exists(target) else f"generated:{layout}",
+            'input_bytes': input_size,
+            'tweets': tweet_count,
+            'parts': parts,
+            'text_only': text_only,
+            'group_by': group_by,
+            'max_size_bytes': max_size_bytes,
+            'repeat': repeat,
+            'json_backend': tls.json_codec.backend_name(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'peak_rss': tls.get_peak_rss(),
+        },
+        'stages': best,
+    }
+
+    previous = None
+    if 'compare' in options:
+        with open(options['compare'], 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print(f"入力: {results['meta']['input']} ({input_size/1024/1024:.2f} MB, {tweet_count} ツイート, {parts} パート)")
+    print_results(results, previous)
+
+    if 'output' in options:
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {options['output']}")
+
+if __name__ == "__main__":
+    main()
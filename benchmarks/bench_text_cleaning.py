@@ -0,0 +1,79 @@
+"""
+テキスト整形（制御文字・顔文字の削除）のマイクロベンチマーク
+
+従来の実装（1文字ずつの unicodedata.category 判定 + 呼び出しごとの re.compile）と、
+インポート時に作成した変換テーブルによる1パス処理のスループット（MB/s）を比較する。
+
+使用方法: python benchmarks/bench_text_cleaning.py [テキストサイズ(MB)]
+"""
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+# リポジトリのルートの twitter_log_splitter と json_codec を参照できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import twitter_log_splitter as tls
+
+# 従来の実装と同じく、重複した範囲を含む顔文字の文字クラス
+LEGACY_EMOJI_CLASS = '[' + ''.join(
+    chr(start) if start == end else f"{chr(start)}-{chr(end)}" for start, end in tls.EMOJI_RANGES
+) + ']'
+
+def legacy_remove_emojis(text):
+    """従来の remove_emojis（呼び出しごとに re.compile する）"""
+    emoji_pattern = re.compile(LEGACY_EMOJI_CLASS, flags=re.UNICODE)
+    return emoji_pattern.sub(' ', text)
+
+def legacy_clean(text):
+    """従来のテキスト整形（制御文字の1文字ずつの判定 + 顔文字削除）"""
+    text = ''.join(ch for ch in text if unicodedata.category(ch)[0] != 'C' or ch in (' ', '\t', '\n'))
+    return legacy_remove_emojis(text)
+
+def generate_texts(size_mb, seed=0):
+    """日本語・英数字・顔文字・制御文字を混ぜたツイート風テキストを生成する"""
+    rnd = random.Random(seed)
+    pieces = ['今日は', 'いい天気ですね', 'テスト', 'ツイート', 'Python', 'hello world', '漢字かなカナ',
+              '😀', '🚀', '♥', '☀', '🇯🇵', '①', '​', '\x07', ' ', 'https://t.co/abc']
+    texts = []
+    total = 0
+    while total < size_mb * 1024 * 1024:
+        text = ''.join(rnd.choice(pieces) for _ in range(rnd.randrange(5, 40)))
+        texts.append(text)
+        total += len(text.encode('utf-8'))
+    return texts, total
+
+def measure(func, texts, total_bytes, repeat=3):
+    """最良の実行時間からスループット（MB/s）を計算する"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return total_bytes / 1024 / 1024 / best
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    texts, total_bytes = generate_texts(size_mb)
+
+    # 結果が従来の実装と一致することを確認
+    for text in texts[:2000]:
+        assert tls.strip_control_and_emojis(text) == legacy_clean(text)
+        assert tls.remove_emojis(text) == legacy_remove_emojis(text)
+
+    print(f"テキストサイズ: {total_bytes/1024/1024:.2f} MB ({len(texts)} 件)")
+    results = [
+        ("従来: 制御文字削除 + remove_emojis", measure(legacy_clean, texts, total_bytes)),
+        ("新: strip_control_and_emojis", measure(tls.strip_control_and_emojis, texts, total_bytes)),
+        ("従来: remove_emojis", measure(legacy_remove_emojis, texts, total_bytes)),
+        ("新: remove_emojis", measure(tls.remove_emojis, texts, total_bytes)),
+    ]
+    for name, throughput in results:
+        print(f"{name:<40} {throughput:8.2f} MB/s")
+
+if __name__ == "__main__":
+    main()
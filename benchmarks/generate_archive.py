@@ -0,0 +1,182 @@
+"""
+ベンチマーク用のTwitterエクスポート風アーカイブを生成するスクリプト
+
+同じシードからは常に同じアーカイブを生成する（決定的）。
+ツイートは1件ずつファイルに書き出すため、1000万件のような大きなアーカイブもメモリに展開せずに生成できる。
+
+レイアウト:
+- array: ツイートオブジェクトのJSON配列（API形式、.json）
+- js: window.YTD.tweets.part0 = [{"tweet": {...}}, ...] 形式（Twitterエクスポート形式、.js）
+
+使用方法: python benchmarks/generate_archive.py <出力ファイル> [ツイート数] [--layout=array|js] [--seed=<N>]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+# 日本語のツイートによく現れる語句
+JAPANESE_PHRASES = [
+    'おはようございます', '今日はいい天気ですね', 'お疲れさまでした', 'ありがとうございます',
+    '新しいブログを書きました', 'ラーメン食べた', '電車が遅れてる', '明日から出張です',
+    '週末は温泉に行きたい', 'この本めちゃくちゃ面白い', 'リリースしました', '眠い…',
+    '東京', '大阪', '桜が咲いた', '猫かわいい', '締め切りがやばい', 'ｱｲｳｴｵ（半角カナ）',
+    '①②③', '〜', '！', '？', '。', '、', 'ｗｗｗ', '（笑）', '「引用」',
+]
+
+# 英数字の語句（日本語と混在させる）
+LATIN_PHRASES = ['Python', 'GitHub', 'hello world', 'LGTM', 'v1.2.3', '2023', 'OK', 'WWDC', 'AI']
+
+# 絵文字（ZWJシーケンス・国旗・肌の色・異体字セレクタを含む）
+EMOJIS = [
+    '😀', '😂', '🥺', '🙏', '👍', '🎉', '🍣', '🍜', '🚃', '🌸', '☀️', '☔', '❤️', '♥', '✨',
+    '👨‍👩‍👧', '🏳️‍🌈', '🇯🇵', '👍🏽', '🤔', '💦', '⭐', '㊗️',
+]
+
+HASHTAGS = ['今日の一枚', 'プログラミング', '拡散希望', 'Python', '駆け出しエンジニアと繋がりたい', '猫']
+
+MENTIONS = ['example_user', 'test_account', 'tanaka_taro', 'suzuki_hanako']
+
+SOURCES = [
+    '<a href="http://twitter.com/download/iphone" rel="nofollow">Twitter for iPhone</a>',
+    '<a href="https://mobile.twitter.com" rel="nofollow">Twitter Web App</a>',
+    '<a href="http://twitter.com/download/android" rel="nofollow">Twitter for Android</a>',
+]
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# 生成するツイートの期間（エポック秒）: 2012-01-01 〜 2023-01-01
+START_EPOCH = 1325376000
+END_EPOCH = 1672531200
+
+def format_twitter_date(epoch):
+    """エポック秒をTwitter API形式の日時文字列に変換する"""
+    tm = time.gmtime(epoch)
+    return (f"{WEEKDAYS[tm.tm_wday]} {MONTHS[tm.tm_mon - 1]} {tm.tm_mday:02d} "
+            f"{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d} +0000 {tm.tm_year}")
+
+def generate_text(rnd):
+    """日本語・英数字・絵文字・ハッシュタグ・メンション・URLを混ぜたツイート本文と entities を生成する"""
+    pieces = []
+    hashtags = []
+    mentions = []
+    urls = []
+    if rnd.random() < 0.15:
+        mention = rnd.choice(MENTIONS)
+        pieces.append(f"@{mention} ")
+        mentions.append(mention)
+    for _ in range(rnd.randrange(1, 8)):
+        value = rnd.random()
+        if value < 0.6:
+            pieces.append(rnd.choice(JAPANESE_PHRASES))
+        elif value < 0.75:
+            pieces.append(rnd.choice(LATIN_PHRASES))
+        elif value < 0.95:
+            pieces.append(rnd.choice(EMOJIS))
+        else:
+            pieces.append('\n')
+    if rnd.random() < 0.2:
+        tag = rnd.choice(HASHTAGS)
+        pieces.append(f" #{tag}")
+        hashtags.append(tag)
+    if rnd.random() < 0.1:
+        pieces.append(" https://t.co/AbCdEf1234")
+        urls.append("https://t.co/AbCdEf1234")
+    text = ''.join(pieces)
+    entities = {
+        "hashtags": [{"text": tag, "indices": ["0", str(len(tag) + 1)]} for tag in hashtags],
+        "symbols": [],
+        "user_mentions": [{"name": mention, "screen_name": mention, "indices": ["0", str(len(mention) + 1)],
+                           "id_str": str(1000 + MENTIONS.index(mention)), "id": str(1000 + MENTIONS.index(mention))}
+                          for mention in mentions],
+        "urls": [{"url": url, "expanded_url": "https://example.com/", "display_url": "example.com",
+                  "indices": ["0", "23"]} for url in urls],
+    }
+    return text, entities
+
+def generate_tweet(rnd, index, epoch):
+    """Twitterエクスポートと同じフィールド構成のツイートを1件生成する"""
+    tweet_id = str(1000000000000000000 + index)
+    text, entities = generate_text(rnd)
+    tweet = {
+        "edit_info": {"initial": {"editTweetIds": [tweet_id], "editableUntil": format_twitter_date(epoch + 1800),
+                                  "editsRemaining": "5", "isEditEligible": False}},
+        "retweeted": False,
+        "source": rnd.choice(SOURCES),
+        "entities": entities,
+        "display_text_range": ["0", str(len(text))],
+        "favorite_count": str(int(rnd.paretovariate(1.5)) - 1),
+        "id_str": tweet_id,
+        "truncated": False,
+        "retweet_count": str(int(rnd.paretovariate(2.0)) - 1),
+        "id": tweet_id,
+        "created_at": format_twitter_date(epoch),
+        "favorited": False,
+        "full_text": text,
+        "lang": "ja",
+    }
+    if entities["user_mentions"]:
+        tweet["in_reply_to_screen_name"] = entities["user_mentions"][0]["screen_name"]
+        tweet["in_reply_to_user_id_str"] = entities["user_mentions"][0]["id_str"]
+    return tweet
+
+def iter_tweets(tweet_count, seed=0):
+    """
+    ツイートを新しい順（Twitterエクスポートと同じ順序）に生成するジェネレータ
+
+    日時は期間内でほぼ一様に分布し、ところどころ順序が前後する（パートをまたいだ結合やAPIの取得順を模擬）。
+    """
+    rnd = random.Random(seed)
+    span = END_EPOCH - START_EPOCH
+    for i in range(tweet_count):
+        # 新しい順に並べ、一部のツイートは前後にずらす
+        epoch = END_EPOCH - span * (i + 1) // (tweet_count + 1)
+        if rnd.random() < 0.05:
+            epoch += rnd.randrange(-86400, 86400)
+        yield generate_tweet(rnd, tweet_count - i, epoch)
+
+def write_archive(output_path, tweet_count, layout='js', seed=0):
+    """
+    アーカイブをファイルに書き出す
+
+    Returns:
+    - 書き出したバイト数
+    """
+    with open(output_path, 'w', encoding='utf-8', newline='\n') as f:
+        if layout == 'js':
+            f.write('window.YTD.tweets.part0 = [')
+        else:
+            f.write('[')
+        for i, tweet in enumerate(iter_tweets(tweet_count, seed)):
+            if i:
+                f.write(',')
+            if layout == 'js':
+                # エクスポートと同じく整形して書き出す
+                f.write('\n  ' + json.dumps({"tweet": tweet}, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+            else:
+                f.write(json.dumps(tweet, ensure_ascii=False, separators=(',', ':')))
+        f.write('\n]' if layout == 'js' else ']')
+    return os.path.getsize(output_path)
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    output_path = args[0]
+    tweet_count = int(args[1]) if len(args) > 1 else 10000
+    layout = options.get('layout', 'js')
+    if layout not in ('array', 'js'):
+        print(f"不明なレイアウトです: {layout}（array または js を指定してください）")
+        sys.exit(1)
+    seed = int(options.get('seed', 0))
+
+    start = time.perf_counter()
+    size = write_archive(output_path, tweet_count, layout, seed)
+    print(f"{output_path}: {tweet_count} ツイート, {size/1024/1024:.2f} MB ({layout}, seed={seed}, {time.perf_counter() - start:.2f}秒)")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
+import codecs
 import json
+import random
 import re
 import sys
+import time
+from collections import Counter
+
+import json_codec  # orjson/ujsonがあれば高速にパース
+import tweet_format  # 分割処理と同じ方法で入力と構造を判定
 
 def check_twitter_export_structure(file_path):
     """Twitterエクスポートデータの構造を確認する関数"""
@@ -22,7 +29,7 @@ def check_twitter_export_structure(file_path):
                         content = content[:-1]
         
         # JSONとしてパース
-        data = json.loads(content)
+        data = json_codec.loads(content)
         
         # 配列かどうかを確認
         if isinstance(data, list):
@@ -37,6 +44,10 @@ def check_twitter_export_structure(file_path):
                 # 日時情報を探す
                 print("\n日時情報の候補:")
                 find_date_fields(first_item)
+                
+                # 分割処理で使用する構造
+                print("\n分割処理で使用する構造:")
+                print_schema(first_item)
         else:
             print("データは配列ではありません。")
             print("\nルート要素の構造:")
@@ -68,6 +79,17 @@ def print_structure(obj, indent=0, max_depth=3, current_depth=0, path=""):
     else:
         print("  " * indent + str(obj))
 
+def print_schema(first_item):
+    """分割処理（twitter_log_splitter）が検出する構造を表示する関数"""
+    try:
+        schema = tweet_format.detect_tweet_schema(first_item)
+    except ValueError as e:
+        print(f"  {e}")
+        return
+    layout = '{"tweet": {...}} 形式' if schema.wrapper else "ツイートオブジェクトの配列"
+    print(f"  日時: {tweet_format.format_path(schema.date_path)} (フォーマット: {schema.time_format or '不明'})")
+    print(f"  形式: {layout}")
+
 def find_date_fields(obj, path="", found_dates=None):
     """オブジェクト内の日時情報の可能性があるフィールドを探す関数"""
     if found_dates is None:
@@ -92,10 +114,296 @@ def find_date_fields(obj, path="", found_dates=None):
     
     return found_dates
 
+# サンプリングモードで最初にデコードするバイト数（要素が収まらない場合は倍にして読み直す）
+SAMPLE_WINDOW_SIZE = 1024 * 1024
+# ランダムな位置の要素を読み込む際に最初にデコードするバイト数
+SAMPLE_ELEMENT_WINDOW_SIZE = 64 * 1024
+# 1つの要素を読み込む際にデコードする最大バイト数
+SAMPLE_MAX_WINDOW_SIZE = 64 * 1024 * 1024
+# フィールドの出現率を集計するネストの深さ
+SAMPLE_FIELD_DEPTH = 4
+
+def decode_window(buf, start, size, encoding):
+    """バイト列の start から size バイトをデコードする関数（末尾で途切れた文字は含めない）"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    return decoder.decode(buf[start:start + size])
+
+def decode_element(buf, start, encoding, decoder):
+    """
+    バイト位置 start から始まる1つの要素をパースする関数
+    
+    Returns:
+    - (要素, 要素のバイト数)
+    """
+    size = SAMPLE_ELEMENT_WINDOW_SIZE
+    while True:
+        text = decode_window(buf, start, size, encoding)
+        try:
+            element, end = decoder.raw_decode(text)
+            return element, len(text[:end].encode(encoding))
+        except json.JSONDecodeError:
+            if start + size >= len(buf) or size >= SAMPLE_MAX_WINDOW_SIZE:
+                raise
+            size *= 2
+
+def iter_head_elements(text, decoder):
+    """
+    デコードした先頭部分から、配列の要素を (要素, 開始位置, 終了位置)（文字単位）として順に返すジェネレータ
+    
+    ルートがオブジェクトの場合（{"data": {"tweets": [...]}} など）は最初に現れる配列の要素を返す。
+    要素が途中で切れている場合は json.JSONDecodeError、配列の終わりに達した場合は終了する。
+    """
+    match = tweet_format.JS_VAR_PATTERN.match(text)
+    pos = text.find('[', match.end() if match else 0)
+    if pos < 0:
+        raise ValueError("先頭部分にJSON配列が見つかりません")
+    pos += 1
+    while True:
+        pos = tweet_format.JSON_WHITESPACE.match(text, pos).end()
+        if text.startswith(']', pos):
+            return
+        if text.startswith(',', pos):
+            pos = tweet_format.JSON_WHITESPACE.match(text, pos + 1).end()
+        element, end = decoder.raw_decode(text, pos)
+        yield element, pos, end
+        pos = end
+
+def collect_field_paths(obj, paths, prefix="", depth=0):
+    """要素に含まれるフィールドのパス（リストは 'path[]'）とその値の型を paths に追加する関数"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            path = f"{prefix}.{key}" if prefix else key
+            paths.setdefault(path, set()).add(type(value).__name__)
+            if depth + 1 < SAMPLE_FIELD_DEPTH:
+                collect_field_paths(value, paths, path, depth + 1)
+    elif isinstance(obj, list):
+        for item in obj:
+            if isinstance(item, (dict, list)):
+                collect_field_paths(item, paths, f"{prefix}[]", depth)
+
+def is_array_element(element, first_element, buf, end):
+    """
+    ランダムな境界からパースした要素が、ネストした配列の要素ではなくアーカイブの配列の要素かを判定する関数
+    
+    先頭の要素と同じ型で、要素の後に区切りか配列の終わりが続き、オブジェクトの場合は
+    先頭の要素の日時のキー（{"tweet": {...}} 形式の場合は 'tweet'）を含むものを配列の要素とみなす。
+    
+    Parameters:
+    - element: パースした要素
+    - first_element: 配列の先頭の要素
+    - buf: 入力ファイルのバイト列
+    - end: 要素の終わりのバイト位置
+    """
+    if type(element) is not type(first_element):
+        return False
+    following = buf[end:end + 64].lstrip(b' \t\r\n')
+    if not following.startswith((b',', b']')):
+        return False
+    if isinstance(element, dict):
+        try:
+            date_key = tweet_format.detect_tweet_schema(first_element).date_path[0]
+        except ValueError:
+            # 日時のない形式では、先頭の要素とキーを共有するものを要素とみなす
+            return bool(element.keys() & first_element.keys())
+        return date_key in element
+    return True
+
+def sample_archive_structure(file_path, head_count=100, random_count=0, seed=0):
+    """
+    アーカイブ全体を読み込まずに、先頭の要素とランダムな位置の要素だけをパースして構造を調べる関数
+    
+    ファイルはメモリマップし、読み込むのはサンプルの要素の範囲のみのため、アーカイブのサイズによらず短時間で終わる。
+    ランダムサンプルは、先頭の2つの要素の境界（閉じ括弧・区切り・開き括弧、例: '},{' や '}, {'）を
+    バイト列として検索してランダムなバイト位置から次の境界を見つけ、その位置からパースした要素が
+    配列の要素として妥当な場合のみ採用する（大きい要素ほど選ばれやすい）。
+    
+    Parameters:
+    - file_path: 入力ファイルのパス
+    - head_count: 先頭から読み込む要素数
+    - random_count: ファイル全体からランダムに読み込む要素数（0の場合は先頭のみ）
+    - seed: ランダムサンプルの乱数のシード
+    
+    Returns:
+    - 集計結果の辞書
+    """
+    decoder = json_codec.make_decoder()
+    with tweet_format.open_input_buffer(file_path) as buf:
+        file_size = len(buf)
+        # 先頭部分をデコードできるエンコーディングを使用
+        size = min(SAMPLE_WINDOW_SIZE, len(buf))
+        for encoding in tweet_format.iter_candidate_encodings(buf):
+            try:
+                text = decode_window(buf, 0, size, encoding)
+                break
+            except (UnicodeDecodeError, LookupError):
+                continue
+        else:
+            raise ValueError("先頭部分をデコードできるエンコーディングが見つかりません")
+        
+        # 先頭の要素（途中で切れた場合は読み込む範囲を広げて読み直す）
+        while True:
+            head = []
+            complete = False
+            try:
+                for item in iter_head_elements(text, decoder):
+                    head.append(item)
+                    if len(head) > head_count:
+                        break
+                else:
+                    complete = True
+            except json.JSONDecodeError:
+                if size < len(buf) and size < SAMPLE_MAX_WINDOW_SIZE * 4:
+                    size = min(size * 2, len(buf))
+                    text = decode_window(buf, 0, size, encoding)
+                    continue
+                if not head:
+                    raise
+            break
+        if not head:
+            raise ValueError("配列に要素がありません")
+        
+        # 先頭の要素の間隔（バイト）からツイート数を推定
+        starts = [len(text[:start].encode(encoding)) for _, start, _ in head]
+        if complete:
+            estimated_count = len(head)
+        elif len(head) > 1:
+            stride = (starts[-1] - starts[0]) / (len(head) - 1)
+            array_end = len(buf)
+            while array_end > starts[0] and buf[array_end - 1:array_end] in (b' ', b'\t', b'\r', b'\n', b';', b']', b'\x00'):
+                array_end -= 1
+            estimated_count = max(len(head), round((array_end - starts[0]) / stride))
+        else:
+            estimated_count = None
+        elements = [element for element, _, _ in head[:head_count]]
+        
+        # ランダムな位置の要素
+        random_elements = []
+        if random_count and not complete and len(head) > 1 and not encoding.startswith(('utf-16', 'utf-32')):
+            _, _, first_end = head[0]
+            _, second_start, _ = head[1]
+            # 要素の内容によらない境界のみを検索する（ネストした配列内の境界は is_array_element で除外）
+            marker = text[first_end - 1:second_start + 1].encode(encoding)
+            skip = len(text[first_end - 1:second_start].encode(encoding))
+            rnd = random.Random(seed)
+            seen = set(starts)
+            for _ in range(random_count * 3):
+                if len(random_elements) >= random_count:
+                    break
+                found = buf.find(marker, rnd.randrange(starts[0], len(buf)))
+                if found < 0 or found + skip in seen:
+                    continue
+                seen.add(found + skip)
+                try:
+                    element, size = decode_element(buf, found + skip, encoding, decoder)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if is_array_element(element, elements[0], buf, found + skip + size):
+                    random_elements.append(element)
+    
+    # フィールドの出現率と日時のフォーマットを集計
+    samples = elements + random_elements
+    wrapped = isinstance(samples[0], dict) and isinstance(samples[0].get('tweet'), dict)
+    tweets = [element['tweet'] if wrapped and isinstance(element, dict) and 'tweet' in element else element for element in samples]
+    field_counts = Counter()
+    field_types = {}
+    for tweet in tweets:
+        paths = {}
+        collect_field_paths(tweet, paths)
+        field_counts.update(paths.keys())
+        for path, types in paths.items():
+            field_types.setdefault(path, set()).update(types)
+    
+    date_formats = Counter()
+    schema = None
+    try:
+        schema = tweet_format.detect_tweet_schema(tweets[0])
+        for tweet in tweets:
+            try:
+                value = schema.get_date(tweet)
+            except (KeyError, IndexError, TypeError):
+                date_formats['（日時なし）'] += 1
+                continue
+            date_formats[tweet_format.detect_time_format(value) or f"不明（例: {str(value)[:30]}）"] += 1
+    except ValueError:
+        pass
+    
+    return {
+        'encoding': encoding,
+        'file_size': file_size,
+        'wrapped': wrapped,
+        'head_count': len(elements),
+        'random_count': len(random_elements),
+        'estimated_count': estimated_count,
+        'exact_count': complete,
+        'sample_count': len(tweets),
+        'field_counts': field_counts,
+        'field_types': field_types,
+        'date_formats': date_formats,
+        'schema': schema,
+        'first_item': samples[0],
+    }
+
+def print_sample_report(report):
+    """sample_archive_structure の集計結果を表示する関数"""
+    print(f"ファイルサイズ: {report['file_size']/1024/1024:.2f} MB (エンコーディング: {report['encoding']})")
+    print(f"サンプル: 先頭 {report['head_count']} 件 + ランダム {report['random_count']} 件")
+    if report['exact_count']:
+        print(f"ツイート数: {report['estimated_count']} 件（配列全体を読み込みました）")
+    elif report['estimated_count'] is not None:
+        print(f"推定ツイート数: 約 {report['estimated_count']:,} 件（先頭の要素の間隔から推定）")
+    layout = '{"tweet": {...}} 形式' if report['wrapped'] else "ツイートオブジェクトの配列"
+    print(f"形式: {layout}")
+    
+    print("\nフィールド（出現率）:")
+    sample_count = report['sample_count']
+    for path, count in sorted(report['field_counts'].items(), key=lambda item: (-item[1], item[0])):
+        types = '/'.join(sorted(report['field_types'][path]))
+        print(f"  {count / sample_count * 100:5.1f}%  {path} ({types})")
+    
+    print("\n日時のフォーマット:")
+    if not report['date_formats']:
+        print("  日時情報が見つかりません")
+    for fmt, count in report['date_formats'].most_common():
+        print(f"  {fmt}: {count} 件")
+    
+    print("\n分割処理で使用する構造:")
+    print_schema(report['first_item'])
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使用方法: python check_structure.py <ファイルパス>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not args:
+        print("使用方法: python check_structure.py <ファイルパス> [--sample[=<N>]] [--random=<N>] [--seed=<N>]")
+        print("  --sample[=<N>]: ファイル全体を読み込まず、先頭のN件（デフォルト100）だけを読み込んで構造を集計")
+        print("  --random=<N>: サンプリングモードで、ファイル全体からランダムな位置のN件も読み込む")
+        print("  --seed=<N>: ランダムサンプルの乱数のシード（デフォルト0）")
         sys.exit(1)
     
-    file_path = sys.argv[1]
-    check_twitter_export_structure(file_path)
+    file_path = args[0]
+    head_count = None
+    random_count = 0
+    seed = 0
+    try:
+        for arg in sys.argv[1:]:
+            if arg == "--sample":
+                head_count = 100
+            elif arg.startswith("--sample="):
+                head_count = max(1, int(arg.split("=", 1)[1]))
+            elif arg.startswith("--random="):
+                random_count = max(0, int(arg.split("=", 1)[1]))
+                head_count = head_count or 100
+            elif arg.startswith("--seed="):
+                seed = int(arg.split("=", 1)[1])
+    except ValueError as e:
+        print(f"エラー: 無効なオプションです: {e}")
+        sys.exit(1)
+    
+    if head_count is None:
+        check_twitter_export_structure(file_path)
+    else:
+        start_time = time.time()
+        try:
+            print_sample_report(sample_archive_structure(file_path, head_count, random_count, seed))
+        except Exception as e:
+            print(f"エラー: {e}")
+            sys.exit(1)
+        print(f"\n処理時間: {time.time() - start_time:.2f}秒")
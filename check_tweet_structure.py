@@ -1,6 +1,8 @@
 import json
 import re
 
+import json_codec  # orjson/ujsonがあれば高速にパース
+
 # ファイルを読み込み
 with open('tweets.js', 'r', encoding='utf-8') as f:
     content = f.read()
@@ -20,7 +22,7 @@ if match:
             json_content = json_content[:-1]
 
         # JSONとしてパース
-        data = json.loads(json_content)
+        data = json_codec.loads(json_content)
         
         # 最初のツイートの構造を確認
         if data and len(data) > 0:
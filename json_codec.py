@@ -0,0 +1,217 @@
+"""
+JSONのパース・シリアライズを行うコーデック層
+
+orjson や ujson がインストールされていれば高速なライブラリを使用し、
+なければ標準ライブラリの json を使用する。
+どのバックエンドでも、シリアライズ結果は標準ライブラリの
+json.dumps(obj, ensure_ascii=False, separators=(",", ":")) をUTF-8でエンコードしたものと
+バイト単位で一致する（表記が異なりうる値は標準ライブラリで処理する）。
+"""
+import json
+
+# orjsonライブラリがインストールされているか確認
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# ujsonライブラリがインストールされているか確認
+try:
+    import ujson
+    HAS_UJSON = True
+except ImportError:
+    HAS_UJSON = False
+
+# 自動選択時の優先順位
+BACKENDS = ['orjson', 'ujson', 'json']
+
+class NonFiniteFloat(float):
+    """
+    JSON中の NaN・Infinity・-Infinity を表すfloat
+
+    高速なライブラリは NaN を null として出力するため、標準ライブラリでパースした値を
+    この型で保持し、シリアライズ時に標準ライブラリへフォールバックさせる
+    （高速なライブラリはfloatのサブクラスをシリアライズできずエラーになる）。
+    """
+
+def make_decoder():
+    """
+    標準ライブラリのJSONデコーダを作成する関数（NaN・Infinity は NonFiniteFloat として読み込む）
+    """
+    return json.JSONDecoder(parse_constant=NonFiniteFloat)
+
+_STDLIB_DECODER = make_decoder()
+
+# 数字を '0' に、'E' を 'e' に変換するテーブル（数値の表記を正規表現より高速に調べるため）
+_DIGIT_TABLE = bytes.maketrans(b'123456789E', b'000000000e')
+
+# 長い整数を探す際に一度に変換するバイト数
+_SCAN_CHUNK_SIZE = 1024 * 1024
+
+def has_unsafe_number(data):
+    """
+    標準ライブラリと高速なライブラリで表記が異なりうる数値
+    （指数表記、1e-4未満の小数）を含むかを調べる関数（文字列中の一致も含むため保守的）
+    """
+    return b'0.0000' in data or b'0e' in data.translate(_DIGIT_TABLE)
+
+def has_long_integer(data):
+    """
+    20桁以上の数字の並びを含むかを調べる関数（文字列中の一致も含むため保守的）
+
+    orjsonは64ビットを超える整数をfloatとしてパースするため、該当する入力は標準ライブラリで処理する。
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8', 'surrogatepass')
+    with memoryview(data) as view:
+        for start in range(0, len(view), _SCAN_CHUNK_SIZE):
+            # チャンクの境界をまたぐ並びも見つかるよう、19バイト重ねて調べる
+            chunk = bytes(view[start:start + _SCAN_CHUNK_SIZE + 19])
+            if b'0' * 20 in chunk.translate(_DIGIT_TABLE):
+                return True
+    return False
+
+def has_nonfinite(data):
+    """
+    NaN・Infinity を含むかを調べる関数（文字列中の一致も含むため保守的）
+    """
+    if isinstance(data, str):
+        return 'NaN' in data or 'Infinity' in data
+    return b'NaN' in data or b'Infinity' in data
+
+def stdlib_loads(data):
+    """
+    標準ライブラリでJSONをパースする関数（バイト列はUTF-8として、サロゲートを許容してデコード）
+    """
+    if not isinstance(data, str):
+        data = str(data, 'utf-8', 'surrogatepass')
+    return _STDLIB_DECODER.decode(data)
+
+def stdlib_dumps(obj, errors='strict'):
+    """
+    標準ライブラリでコンパクトなJSON（UTF-8バイト列）にシリアライズする関数
+    """
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode('utf-8', errors)
+
+def orjson_loads(data):
+    """
+    orjsonでJSONをパースする関数（orjsonで扱えない入力は標準ライブラリで処理）
+    """
+    if has_long_integer(data):
+        return stdlib_loads(data)
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # NaN、サロゲートを含む入力など
+        return stdlib_loads(data)
+
+def orjson_dumps(obj, errors='strict'):
+    """
+    orjsonでコンパクトなJSON（UTF-8バイト列）にシリアライズする関数
+    """
+    try:
+        data = orjson.dumps(obj)
+    except TypeError:
+        # 64ビットを超える整数、サロゲート、NonFiniteFloat など（JSONEncodeErrorはTypeErrorのサブクラス）
+        return stdlib_dumps(obj, errors)
+    if has_unsafe_number(data):
+        return stdlib_dumps(obj, errors)
+    return data
+
+def ujson_loads(data):
+    """
+    ujsonでJSONをパースする関数（ujsonで扱えない入力は標準ライブラリで処理）
+    """
+    if not isinstance(data, (str, bytes)):
+        data = bytes(data)
+    if has_nonfinite(data) or has_long_integer(data):
+        # ujsonは NaN を通常のfloatとして読み込むため、NonFiniteFloatとして読み込む標準ライブラリで処理
+        return stdlib_loads(data)
+    try:
+        return ujson.loads(data)
+    except (ValueError, TypeError):
+        return stdlib_loads(data)
+
+def ujson_dumps(obj, errors='strict'):
+    """
+    ujsonでコンパクトなJSON（UTF-8バイト列）にシリアライズする関数
+    """
+    try:
+        text = ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+    except (TypeError, ValueError, OverflowError):
+        return stdlib_dumps(obj, errors)
+    data = text.encode('utf-8', errors)
+    if has_unsafe_number(data):
+        return stdlib_dumps(obj, errors)
+    return data
+
+_BACKEND_FUNCTIONS = {
+    'orjson': (HAS_ORJSON, orjson_loads, orjson_dumps),
+    'ujson': (HAS_UJSON, ujson_loads, ujson_dumps),
+    'json': (True, stdlib_loads, stdlib_dumps),
+}
+
+# バックエンドの出力が標準ライブラリと一致することを確認するための値
+COMPATIBILITY_PROBE = [
+    {"id_str": "1050118621198921728", "id": 1050118621198921728, "full_text": "日本語のテキスト😀 \"引用\" \\ /  \x7f",
+     "entities": {"hashtags": [], "urls": [{"url": "https://t.co/abc", "indices": ["0", "23"]}]},
+     "favorited": False, "retweeted": True, "in_reply_to_status_id": None},
+    "\x00\x1f\b\f\n\r\t\x0b", 0.1, 1.5, -0.0, 123456789012345.0, 2 ** 63 - 1, -2 ** 63,
+    1e16, 9e-05, 1.7976931348623157e308, NonFiniteFloat('NaN'), NonFiniteFloat('-Infinity'),
+]
+
+def is_compatible(dumps):
+    """
+    シリアライズ関数の出力が標準ライブラリとバイト単位で一致するかを確認する関数
+    """
+    try:
+        return all(dumps(value) == stdlib_dumps(value) for value in COMPATIBILITY_PROBE)
+    except Exception:
+        return False
+
+def available_backends():
+    """
+    インストールされているバックエンド名のリストを優先順位順に返す関数
+    """
+    return [name for name in BACKENDS if _BACKEND_FUNCTIONS[name][0]]
+
+_backend = None
+loads = stdlib_loads
+dumps = stdlib_dumps
+
+def select_backend(name='auto'):
+    """
+    使用するJSONバックエンドを選択する関数
+
+    Parameters:
+    - name: 'auto'（インストールされている最速のライブラリ）、'orjson'、'ujson'、'json'
+
+    Returns:
+    - 選択したバックエンド名
+
+    Raises:
+    - ValueError: 不明なバックエンド、またはインストールされていない場合
+    """
+    global _backend, loads, dumps
+    if name in (None, 'auto'):
+        name = available_backends()[0]
+    if name not in _BACKEND_FUNCTIONS:
+        raise ValueError(f"不明なJSONバックエンドです: {name}（{', '.join(['auto'] + BACKENDS)} のいずれかを指定してください）")
+    installed, backend_loads, backend_dumps = _BACKEND_FUNCTIONS[name]
+    if not installed:
+        raise ValueError(f"JSONバックエンド {name} がインストールされていません（pip install {name}）")
+    if not is_compatible(backend_dumps):
+        # 出力が一致しないバージョンの場合、シリアライズは標準ライブラリで行う
+        print(f"警告: {name} の出力が標準ライブラリと一致しないため、シリアライズには json を使用します")
+        backend_dumps = stdlib_dumps
+    _backend, loads, dumps = name, backend_loads, backend_dumps
+    return name
+
+def backend_name():
+    """
+    選択されているバックエンド名を返す関数
+    """
+    return _backend
+
+select_backend()
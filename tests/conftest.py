@@ -0,0 +1,5 @@
+import os
+import sys
+
+# リポジトリのルートの twitter_log_splitter を参照できるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
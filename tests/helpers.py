@@ -0,0 +1,60 @@
+"""
+テスト用のアーカイブの作成と出力の読み込み
+"""
+import glob
+import json
+import os
+import re
+import time
+
+import twitter_log_splitter as tls
+
+# 2018-01-01 00:00:00 UTC
+BASE_EPOCH = 1514764800
+
+def format_twitter_date(epoch):
+    """エポック秒をTwitter API形式の日時文字列に変換する"""
+    return time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime(epoch))
+
+def make_tweet(number, epoch=None, text=None, **fields):
+    """Twitterエクスポート形式（{"tweet": {...}}）のツイートを1件作成する"""
+    if epoch is None:
+        epoch = BASE_EPOCH + number * 3600
+    tweet = {
+        'id_str': str(1000000000000000000 + number),
+        'created_at': format_twitter_date(epoch),
+        'full_text': text if text is not None else f"ツイート {number} です",
+        'entities': {'hashtags': [], 'urls': []},
+        'display_text_range': ['0', '10'],
+    }
+    tweet.update(fields)
+    return {'tweet': tweet}
+
+def write_archive(path, tweets, encoding='utf-8'):
+    """ツイートをTwitterエクスポートの tweets.js 形式で書き出す"""
+    content = 'window.YTD.tweets.part0 = ' + json.dumps(tweets, ensure_ascii=False, indent=1)
+    with open(path, 'wb') as f:
+        f.write(content.encode(encoding))
+    return str(path)
+
+def read_parts(output_dir):
+    """出力ディレクトリのパートファイルの {ファイル名: 内容} を返す（マニフェストとインデックスを除く）"""
+    parts = {}
+    for path in glob.glob(os.path.join(str(output_dir), '*')):
+        name = os.path.basename(path)
+        if name in (tls.MANIFEST_FILENAME, tls.INDEX_FILENAME):
+            continue
+        with open(path, 'rb') as f:
+            parts[name] = f.read()
+    return parts
+
+def part_order(name):
+    """パートのファイル名の並び順のキー（期間、パート番号の順）"""
+    return [int(text) if text.isdigit() else text for text in re.split(r'(\d+)', name)]
+
+def read_json_tweets(output_dir):
+    """JSONモードの出力のツイートを期間・パート番号の順に返す"""
+    tweets = []
+    for name, content in sorted(read_parts(output_dir).items(), key=lambda item: part_order(item[0])):
+        tweets.extend(json.loads(content.decode('utf-8')))
+    return tweets
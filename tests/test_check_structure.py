@@ -0,0 +1,32 @@
+"""
+check_structure.py のサンプリングモードで、ランダムな位置の要素を偏りなく読み込むテスト
+"""
+import json
+
+import check_structure
+from helpers import BASE_EPOCH, format_twitter_date
+
+def write_mixed_archive(path):
+    """キーの順序が異なる2種類のツイートを混ぜ、ネストした配列にもオブジェクトを含むアーカイブ"""
+    tweets = []
+    for i in range(2000):
+        media = [{'id_str': str(i * 10 + j), 'indices': [0, 5]} for j in range(3)]
+        created_at = format_twitter_date(BASE_EPOCH + i * 60)
+        if i % 3 == 2:
+            tweets.append({'created_at': created_at, 'place': {'name': '東京'}, 'id_str': str(i), 'full_text': f"場所つき {i}"})
+        else:
+            tweets.append({'id_str': str(i), 'created_at': created_at, 'full_text': f"ツイート {i}", 'extended_entities': {'media': media}})
+    path.write_text(json.dumps(tweets, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    return str(path)
+
+def test_random_samples_include_differently_shaped_elements(tmp_path):
+    report = check_structure.sample_archive_structure(write_mixed_archive(tmp_path / 'tweets.json'), head_count=2, random_count=40, seed=1)
+    assert report['random_count'] == 40
+    # ネストした media の要素ではなく、配列の要素だけを読み込む
+    assert report['date_formats'] == {check_structure.tweet_format.TWITTER_DATE_FORMAT: report['sample_count']}
+    # 先頭の要素と書き出しの異なる要素も読み込む
+    assert report['field_counts']['place'] > 5
+    assert report['field_counts']['extended_entities'] > 5
+
+def test_check_structure_does_not_import_splitter():
+    assert 'twitter_log_splitter' not in vars(check_structure)
@@ -0,0 +1,38 @@
+"""
+列指向の形式（--format=parquet|arrow）の出力と pyarrow の遅延読み込みのテスト
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import twitter_log_splitter as tls
+from helpers import make_tweet, write_archive
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_import_does_not_load_pyarrow():
+    code = "import sys, twitter_log_splitter; print('pyarrow' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == 'False'
+
+def test_columnar_format_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(tls, 'pyarrow', None)
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    with pytest.raises(ValueError, match='pyarrow'):
+        tls.ColumnarEncoder('parquet')
+
+def test_arrow_output_contains_all_tweets(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    tweets = [make_tweet(i) for i in range(50)]
+    archive = write_archive(tmp_path / 'tweets.js', tweets)
+    output_dir = tmp_path / 'out'
+    tls.split_twitter_log_by_time(archive, str(output_dir), output_format='arrow')
+    ids = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith('.arrow'):
+            with pyarrow.memory_map(str(output_dir / name)) as source:
+                ids.extend(pyarrow.ipc.open_file(source).read_all().column('id').to_pylist())
+    assert sorted(ids) == [int(tweet['tweet']['id_str']) for tweet in tweets]
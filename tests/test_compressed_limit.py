@@ -0,0 +1,65 @@
+"""
+--size-limit=compressed（圧縮後のサイズによる分割）のテスト
+"""
+import gzip
+import lzma
+import random
+
+import pytest
+
+import twitter_log_splitter as tls
+from helpers import make_tweet, read_parts, write_archive
+
+DECOMPRESSORS = {'gzip': gzip.decompress, 'xz': lzma.decompress}
+if tls.HAS_ZSTANDARD:
+    DECOMPRESSORS['zstd'] = lambda data: tls.zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+def random_items(rnd, count):
+    """圧縮しやすい要素と圧縮しにくい要素を混ぜた (番号, バイト列) のリスト"""
+    items = []
+    for i in range(count):
+        if rnd.random() < 0.5:
+            data = (f"tweet {i} " + ''.join(rnd.choice('abcdef') for _ in range(rnd.randrange(10, 200)))).encode()
+        else:
+            data = bytes(rnd.randrange(256) for _ in range(rnd.randrange(10, 200)))
+        items.append((i, data))
+    return items
+
+@pytest.mark.parametrize('compression', sorted(DECOMPRESSORS))
+@pytest.mark.parametrize('seed', range(40))
+def test_every_part_fits_compressed_limit(compression, seed):
+    rnd = random.Random(seed)
+    max_size_bytes = rnd.randrange(2000, 20000)
+    items = random_items(rnd, rnd.randrange(1, 400))
+    prefix, separator, suffix = rnd.choice([(b'[', b',', b']'), (b'', b'\n', b'\n')])
+    restored = []
+    for batch, content in tls.iter_compressed_batches(items, max_size_bytes, compression, prefix, separator, suffix):
+        # 1要素だけで上限を超える場合のみ、上限を超えるバッチになる
+        assert len(content) <= max_size_bytes or len(batch) == 1
+        assert DECOMPRESSORS[compression](content) == prefix + separator.join(data for _, data in batch) + suffix
+        restored.extend(batch)
+    assert restored == items
+
+def test_last_part_fits_compressed_limit():
+    # 予測で入力を進めた最後のバッチが上限を超えていた入力（修正前は最後のパートが 11116 バイトになった）
+    rnd = random.Random(27)
+    assert rnd.choice(['gzip', 'xz']) == 'xz'
+    max_size_bytes = rnd.randrange(2000, 20000)
+    items = random_items(rnd, rnd.randrange(1, 400))
+    batches = list(tls.iter_compressed_batches(items, max_size_bytes, 'xz', b'[', b',', b']'))
+    assert all(len(content) <= max_size_bytes for _, content in batches)
+    assert [item for batch, _ in batches for item in batch] == items
+
+@pytest.mark.parametrize('compression', ['gzip', 'xz'])
+def test_split_with_compressed_limit(tmp_path, compression):
+    rnd = random.Random(1)
+    tweets = [make_tweet(i, text=''.join(rnd.choice('あいうえおかきくけこ😀abc') for _ in range(rnd.randrange(5, 120))))
+              for i in range(2000)]
+    input_path = write_archive(tmp_path / 'tweets.js', tweets)
+    max_size_bytes = 8 * 1024
+    output_dir = tmp_path / 'out'
+    tls.split_twitter_log_by_time(input_path, str(output_dir), max_size_bytes, group_by='year',
+                                  compression=compression, compressed_limit=True)
+    parts = read_parts(output_dir)
+    assert len(parts) > 1
+    assert all(len(content) <= max_size_bytes for content in parts.values())
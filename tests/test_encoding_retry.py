@@ -0,0 +1,51 @@
+"""
+外部ソートモードで、UTF-8として途中まで読めるファイルを別のエンコーディングで読み直す場合のテスト
+"""
+import json
+import os
+
+import pytest
+
+import twitter_log_splitter as tls
+from helpers import make_tweet, read_json_tweets, read_parts, write_archive
+
+TWEET_COUNT = 12100
+
+@pytest.fixture
+def cp932_archive(tmp_path):
+    """先頭の1MB以上がASCIIのみで、後半に日本語を含むcp932のアーカイブ"""
+    tweets = [make_tweet(i, text=f"hello world {i} " + 'x' * 60) for i in range(9000)]
+    tweets += [make_tweet(i, text=f"こんにちは {i}") for i in range(9000, TWEET_COUNT)]
+    path = write_archive(tmp_path / 'tweets.js', tweets, encoding='cp932')
+    assert os.path.getsize(path) > 1024 * 1024
+    return path
+
+def written_ids(output_dir):
+    return [tweet['id_str'] for tweet in read_json_tweets(output_dir)]
+
+def test_dedup_keeps_all_tweets_after_encoding_retry(cp932_archive, tmp_path):
+    output_dir = tmp_path / 'out'
+    tls.split_twitter_log_by_time(cp932_archive, str(output_dir), memory_limit=64 * 1024 * 1024, dedup=True, write_threads=0)
+    ids = written_ids(output_dir)
+    assert len(ids) == TWEET_COUNT
+    assert len(set(ids)) == TWEET_COUNT
+    assert tls.metrics.snapshot()['counters']['tweets_filtered'] == 0
+
+def test_dedup_matches_in_memory_output(cp932_archive, tmp_path):
+    tls.split_twitter_log_by_time(cp932_archive, str(tmp_path / 'memory'), dedup=True)
+    tls.split_twitter_log_by_time(cp932_archive, str(tmp_path / 'external'), memory_limit=64 * 1024 * 1024, dedup=True)
+    assert written_ids(tmp_path / 'external') == written_ids(tmp_path / 'memory')
+
+def test_incremental_manifest_records_all_tweets_after_encoding_retry(cp932_archive, tmp_path):
+    output_dir = tmp_path / 'out'
+    tls.split_twitter_log_by_time(cp932_archive, str(output_dir), memory_limit=64 * 1024 * 1024, incremental=True)
+    assert len(written_ids(output_dir)) == TWEET_COUNT
+    with open(output_dir / tls.MANIFEST_FILENAME, encoding='utf-8') as f:
+        assert len(json.load(f)['tweet_ids']) == TWEET_COUNT
+
+def test_adaptive_estimates_after_encoding_retry(cp932_archive, tmp_path):
+    # 期間ごとのサイズの見積もりに読み直す前のツイートが含まれると、まとめ方がメモリ上で処理した場合と異なる
+    options = dict(max_size_bytes=64 * 1024, group_by='day', adaptive=True)
+    tls.split_twitter_log_by_time(cp932_archive, str(tmp_path / 'memory'), **options)
+    tls.split_twitter_log_by_time(cp932_archive, str(tmp_path / 'external'), memory_limit=64 * 1024 * 1024, **options)
+    assert read_parts(tmp_path / 'external') == read_parts(tmp_path / 'memory')
@@ -0,0 +1,42 @@
+"""
+インクリメンタルモードで書き込みに失敗したツイートを次回の実行で書き直すテスト
+"""
+import json
+
+import pytest
+
+import twitter_log_splitter as tls
+from helpers import make_tweet, read_json_tweets, write_archive
+
+def load_manifest_file(output_dir):
+    with open(output_dir / tls.MANIFEST_FILENAME, encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.mark.parametrize('write_threads', [0, 2])
+def test_failed_write_is_retried_on_next_run(tmp_path, monkeypatch, write_threads):
+    old_tweets = [make_tweet(i) for i in range(5)]
+    new_tweets = [make_tweet(i) for i in range(5, 10)]
+    output_dir = tmp_path / 'out'
+    tls.split_twitter_log_by_time(write_archive(tmp_path / 'old.js', old_tweets), str(output_dir), incremental=True, write_threads=write_threads)
+    
+    # 追記先のパートの書き込みを失敗させる
+    part_path = output_dir / '2018-01_part_1.txt'
+    before = part_path.read_bytes()
+    write_bytes_atomic = tls.write_bytes_atomic
+    
+    def failing_write(file_path, data):
+        if file_path == str(part_path):
+            raise OSError("書き込みエラー（テスト）")
+        write_bytes_atomic(file_path, data)
+    monkeypatch.setattr(tls, 'write_bytes_atomic', failing_write)
+    archive = write_archive(tmp_path / 'all.js', old_tweets + new_tweets)
+    tls.split_twitter_log_by_time(archive, str(output_dir), incremental=True, write_threads=write_threads)
+    assert part_path.read_bytes() == before
+    manifest = load_manifest_file(output_dir)
+    assert len(manifest['tweet_ids']) == len(old_tweets)
+    assert manifest['periods']['2018-01'][0]['size'] == len(before)
+    
+    monkeypatch.setattr(tls, 'write_bytes_atomic', write_bytes_atomic)
+    tls.split_twitter_log_by_time(archive, str(output_dir), incremental=True, write_threads=write_threads)
+    assert read_json_tweets(output_dir) == [tweet['tweet'] for tweet in old_tweets + new_tweets]
+    assert len(load_manifest_file(output_dir)['tweet_ids']) == len(old_tweets) + len(new_tweets)
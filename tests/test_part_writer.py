@@ -0,0 +1,38 @@
+"""
+バックグラウンドの書き込み（PartWriter）で、書き込みが成功したパートだけをマニフェストに記録するテスト
+"""
+import os
+
+import twitter_log_splitter as tls
+from helpers import make_tweet
+
+def test_on_written_is_called_in_order_only_for_successful_writes(tmp_path):
+    blocked = tmp_path / 'blocked.json'
+    blocked.mkdir()
+    written = []
+    writer = tls.PartWriter(threads=2)
+    for name in ['a.json', 'blocked.json', 'c.json']:
+        writer.submit(str(tmp_path / name), [{'name': name}], on_written=lambda size, name=name: written.append((name, size)))
+    writer.close()
+    assert [name for name, _ in written] == ['a.json', 'c.json']
+    assert all(size == os.path.getsize(tmp_path / name) for name, size in written)
+    assert writer.failed_count == 1
+
+def test_manifest_stops_at_part_whose_write_failed(tmp_path):
+    tweets = [make_tweet(i) for i in range(30)]
+    max_size_bytes = len(tls.json_codec.dumps([tweet for tweet in tweets[:10]]))
+    # 2番目のパートの書き込み先をディレクトリにして書き込みを失敗させる
+    (tmp_path / '2018-01_part_2.txt').mkdir()
+    manifest = {'options': {}, 'max_timestamp': None, 'tweet_ids': set(), 'periods': {}}
+    writer = tls.PartWriter(threads=2)
+    try:
+        file_count = tls.write_period_parts('2018-01', tweets, len(tweets), str(tmp_path), max_size_bytes, False, manifest=manifest, writer=writer)
+    finally:
+        writer.close()
+    assert file_count >= 3
+    assert writer.failed_count == 1
+    # 失敗したパート以降は記録せず、次回その位置から書き直す
+    parts = manifest['periods']['2018-01']
+    assert [part['file'] for part in parts] == ['2018-01_part_1.txt']
+    assert parts[0]['size'] == os.path.getsize(tmp_path / '2018-01_part_1.txt')
+    assert manifest['tweet_ids'] == {tweet['tweet']['id_str'] for tweet in tweets[:parts[0]['tweets']]}
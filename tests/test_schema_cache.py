@@ -0,0 +1,25 @@
+"""
+構造のキャッシュファイルはコマンドラインでのみ既定で使用するテスト
+"""
+import os
+import sys
+
+import twitter_log_splitter as tls
+from helpers import make_tweet, write_archive
+
+def test_library_does_not_write_schema_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('TWITTER_LOG_SPLITTER_CACHE_DIR', str(tmp_path / 'cache'))
+    archive = write_archive(tmp_path / 'tweets.js', [make_tweet(i) for i in range(10)])
+    assert tls.schema_cache_path is None
+    tls.split_twitter_log_by_time(archive, str(tmp_path / 'out'))
+    assert list(tls.iter_sorted(tls.load_tweets(archive)))
+    assert not (tmp_path / 'cache').exists()
+
+def test_command_line_writes_schema_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('TWITTER_LOG_SPLITTER_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(tls, '_schema_memo', {})
+    monkeypatch.setattr(tls, 'schema_cache_path', None)
+    archive = write_archive(tmp_path / 'tweets.js', [make_tweet(i) for i in range(10)])
+    monkeypatch.setattr(sys, 'argv', ['twitter-log-splitter.py', archive, str(tmp_path / 'out')])
+    tls.main()
+    assert os.path.exists(tmp_path / 'cache' / 'schema-cache.json')
@@ -0,0 +1,96 @@
+"""
+外部ソート・インクリメンタルモード・フィールドの取り出し・インデックスの検索の出力を、
+メモリ上で全件を処理した結果と比べるテスト
+"""
+import json
+import random
+
+import pytest
+
+import twitter_log_splitter as tls
+from helpers import BASE_EPOCH, make_tweet, read_json_tweets, read_parts, write_archive
+
+MAX_SIZE_BYTES = 4096
+
+@pytest.fixture
+def tweets():
+    """3か月にわたる順不同のツイート（1か月あたり複数のパートになる量）"""
+    rnd = random.Random(1)
+    tweets = [make_tweet(i, epoch=BASE_EPOCH + rnd.randrange(90 * 86400), text='あ' * rnd.randrange(1, 80),
+                         user={'screen_name': f"user{i % 7}", 'id_str': str(i % 7)})
+              for i in range(600)]
+    rnd.shuffle(tweets)
+    return tweets
+
+def split(archive, output_dir, **options):
+    options.setdefault('write_threads', 0)
+    tls.split_twitter_log_by_time(archive, str(output_dir), max_size_bytes=MAX_SIZE_BYTES, **options)
+    return read_parts(output_dir)
+
+@pytest.mark.parametrize('text_only', [False, True])
+def test_external_sort_matches_in_memory(tweets, tmp_path, text_only):
+    archive = write_archive(tmp_path / 'tweets.js', tweets)
+    expected = split(archive, tmp_path / 'memory', text_only=text_only)
+    assert len(expected) > 3
+    assert split(archive, tmp_path / 'external', text_only=text_only, memory_limit=16 * 1024) == expected
+
+@pytest.fixture
+def tweets_with_bad_dates(tweets):
+    """日時をパースできないツイートが混ざったツイート"""
+    for i, tweet in enumerate(tweets[::37]):
+        tweet['tweet']['created_at'] = f"不明な日時 {i}"
+    return tweets
+
+@pytest.mark.parametrize('text_only', [False, True])
+def test_external_sort_matches_in_memory_with_bad_dates(tweets_with_bad_dates, tmp_path, text_only):
+    archive = write_archive(tmp_path / 'tweets.js', tweets_with_bad_dates)
+    expected = split(archive, tmp_path / 'memory', text_only=text_only)
+    assert tls.metrics.snapshot()['counters']['parse_failures'] == len(tweets_with_bad_dates[::37])
+    assert split(archive, tmp_path / 'external', text_only=text_only, memory_limit=16 * 1024) == expected
+    if not text_only:
+        # 日時をパースできないツイートを除いて時系列順に並ぶ
+        parse = tls.make_date_parser()
+        epochs = [parse(tweet['created_at']) for tweet in read_json_tweets(tmp_path / 'memory')]
+        assert epochs == sorted(epochs)
+        assert len(epochs) == len(tweets_with_bad_dates) - len(tweets_with_bad_dates[::37])
+
+def test_incremental_matches_full_rebuild(tweets, tmp_path):
+    tweets.sort(key=lambda tweet: tls.make_date_parser()(tweet['tweet']['created_at']))
+    full_archive = write_archive(tmp_path / 'full.js', tweets)
+    expected = split(full_archive, tmp_path / 'full')
+    
+    output_dir = tmp_path / 'incremental'
+    for count in (200, 450, len(tweets)):
+        archive = write_archive(tmp_path / f"tweets_{count}.js", tweets[:count])
+        parts = split(archive, output_dir, incremental=True)
+    assert parts == expected
+    manifest = json.loads((output_dir / tls.MANIFEST_FILENAME).read_text(encoding='utf-8'))
+    assert sum(part['tweets'] for parts in manifest['periods'].values() for part in parts) == len(tweets)
+
+def test_fields_projection(tweets, tmp_path):
+    archive = write_archive(tmp_path / 'tweets.js', tweets)
+    fields = ['id_str', 'tweet.created_at', 'user.screen_name', 'user']
+    split(archive, tmp_path / 'projected', fields=fields)
+    split(archive, tmp_path / 'full')
+    projected = read_json_tweets(tmp_path / 'projected')
+    full = read_json_tweets(tmp_path / 'full')
+    # 親のフィールドを含める場合、子のパスは重複して取り出さない
+    assert projected == [{'id_str': tweet['id_str'], 'created_at': tweet['created_at'], 'user': tweet['user']} for tweet in full]
+    assert all(len(content) <= MAX_SIZE_BYTES for content in read_parts(tmp_path / 'projected').values())
+
+def test_index_query_matches_output(tweets, tmp_path):
+    archive = write_archive(tmp_path / 'tweets.js', tweets)
+    output_dir = tmp_path / 'out'
+    split(archive, output_dir, build_index=True)
+    written = read_json_tweets(output_dir)
+    parse = tls.make_date_parser()
+    since = parse(written[100]['created_at'])
+    until = parse(written[250]['created_at'])
+    
+    found = [json.loads(content) for content in tls.query_index(str(output_dir), since, until)]
+    assert found == [tweet for tweet in written if since <= parse(tweet['created_at']) < until]
+    assert found
+    
+    target = written[321]
+    assert [json.loads(content) for content in tls.query_index(str(output_dir), tweet_id=int(target['id_str']))] == [target]
+    assert list(tls.query_index(str(output_dir), tweet_id=1)) == []
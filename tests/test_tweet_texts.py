@@ -0,0 +1,31 @@
+"""
+テキスト整形をプロセスプールで行う場合の先読みのテスト
+"""
+from concurrent.futures import Future
+
+import twitter_log_splitter as tls
+from helpers import make_tweet
+
+class RecordingExecutor:
+    """submit した時点で結果を返し、結果を受け取る前に投入されたチャンク数の最大値を記録する"""
+    def __init__(self):
+        self.submitted = 0
+        self.received = 0
+        self.max_in_flight = 0
+    
+    def submit(self, fn, *args):
+        self.submitted += 1
+        self.max_in_flight = max(self.max_in_flight, self.submitted - self.received)
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+def test_prefetch_is_bounded_by_workers():
+    tweets = [make_tweet(i) for i in range(100)]
+    executor = RecordingExecutor()
+    results = []
+    for tweet, data in tls.iter_tweet_texts(tweets, executor, chunk_size=5, workers=3):
+        results.append(data)
+        executor.received = len(results) // 5
+    assert executor.max_in_flight == 6
+    assert results == [tls.clean_tweet_text_bytes(tweet) for tweet in tweets]
@@ -0,0 +1,342 @@
+"""
+Twitterエクスポートの形式（入力ファイルのエンコーディング・配列の位置、ツイートの構造、日時のフォーマット）を扱うモジュール
+
+分割処理（twitter_log_splitter）と構造の確認（check_structure.py）で共通に使用する。
+分割処理の依存ライブラリ（tqdm など）を読み込まずに import できる。
+"""
+import codecs
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from operator import itemgetter
+
+# chardetライブラリがインストールされているか確認（インストールされていない場合は日本語エンコーディングの候補のみ）
+try:
+    import chardet
+    HAS_CHARDET = True
+except ImportError:
+    HAS_CHARDET = False
+
+# JavaScript形式のTwitterエクスポートの変数宣言部分（window.YTD.tweets.part0 = ）
+JS_VAR_PATTERN = re.compile(r'^\s*window\.YTD\.[^=]+=\s*')
+# JSONの空白文字
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+@contextmanager
+def open_input_buffer(input_file):
+    """
+    入力ファイルを読み取り専用でメモリマップするコンテキストマネージャ
+    
+    ファイルの内容はページキャッシュから必要な部分だけ参照されるため、
+    ファイル全体をPythonのバイト列・文字列として複製しない。
+    空のファイル（メモリマップできない）の場合は空のバイト列を返す。
+    """
+    with open(input_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buf
+        finally:
+            buf.close()
+
+# BOMとそれに対応するエンコーディング（長いBOMを先に判定）
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+def iter_candidate_encodings(buf):
+    """
+    マップしたバイト列に対して試行するエンコーディングを順に返すジェネレータ
+    
+    BOMがある場合はそのエンコーディングのみを返す。BOMがない場合はまずUTF-8を返し、
+    UTF-8として読めなかった場合にのみchardetによる検出と日本語エンコーディングの候補を返す。
+    """
+    for bom, encoding in BOM_ENCODINGS:
+        if buf[:len(bom)] == bom:
+            print(f"BOMを検出しました: {encoding}")
+            yield encoding
+            return
+    
+    yield 'utf-8'
+    
+    # UTF-8で読めなかった場合のみ、先頭1MBからエンコーディングを自動検出
+    encodings = ['cp932', 'shift_jis', 'euc_jp', 'iso-2022-jp']
+    if HAS_CHARDET:
+        try:
+            result = chardet.detect(buf[:1024*1024])
+            detected_encoding = result['encoding']
+            confidence = result['confidence']
+            if detected_encoding and confidence > 0.7:
+                print(f"検出されたエンコーディング: {detected_encoding} (信頼度: {confidence:.2f})")
+                if detected_encoding.lower() not in ['utf-8', 'ascii'] + encodings:
+                    encodings.insert(0, detected_encoding)
+        except Exception as e:
+            print(f"エンコーディング自動検出中にエラーが発生しました: {e}")
+    yield from encodings
+
+# 日時情報のキーの候補
+DATE_KEYS = ['created_at', 'timestamp', 'time', 'date']
+
+def compile_accessor(path):
+    """
+    パス（キーとリストの添字のタプル）の値を取り出す関数を組み立てる関数
+    
+    ツイートごとにパスの文字列を解析せず、キーを順にたどるだけの関数を返す。
+    """
+    if len(path) == 1:
+        return itemgetter(path[0])
+    if len(path) == 2:
+        first, second = path
+        return lambda obj: obj[first][second]
+    def get_value(obj):
+        for key in path:
+            obj = obj[key]
+        return obj
+    return get_value
+
+def format_path(path):
+    """
+    パスを 'user.created_at' や 'items[0].date' の形式の文字列にする関数
+    """
+    text = ''
+    for key in path:
+        if isinstance(key, int):
+            text += f"[{key}]"
+        else:
+            text += f".{key}" if text else key
+    return text
+
+def find_key_path(obj, target_keys, path=()):
+    """
+    オブジェクトを深さ優先で探索し、target_keys のいずれかのキーまでのパスを返す関数
+    （リストは先頭の要素のみ探索し、見つからない場合はNone）
+    """
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in target_keys:
+                return path + (key,)
+            if isinstance(value, (dict, list)):
+                result = find_key_path(value, target_keys, path + (key,))
+                if result:
+                    return result
+    elif isinstance(obj, list) and obj:
+        return find_key_path(obj[0], target_keys, path + (0,))
+    return None
+
+def detect_time_format(date_value):
+    """
+    日時の値に一致する DATE_FORMATS のフォーマットを返す関数（一致しない場合はNone）
+    """
+    if isinstance(date_value, str):
+        for fmt in DATE_FORMATS:
+            if strptime_decoder(fmt)(date_value) is not None:
+                return fmt
+    return None
+
+class TweetSchema:
+    """
+    ツイートの構造（日時のパス、{"tweet": {...}} 形式かどうか、日時のフォーマット）
+    
+    パスはキーとリストの添字のタプルで、値を取り出す関数は作成時に一度だけ組み立てる。
+    """
+    def __init__(self, date_path, wrapper=None, time_format=None):
+        if not date_path:
+            raise ValueError("日時情報のパスが空です")
+        self.date_path = tuple(date_path)
+        self.wrapper = wrapper
+        self.time_format = time_format
+        self.get_date = compile_accessor(self.date_path)
+    
+    def date_value(self, tweet):
+        """
+        警告の表示用に日時の値を返す（取り出せない場合は 'キーなし'）
+        """
+        try:
+            return self.get_date(tweet)
+        except (KeyError, IndexError, TypeError):
+            return 'キーなし'
+    
+    def matches(self, tweet):
+        """
+        ツイートの日時をこの構造のパスで取り出し、検出したフォーマットでパースできるかを返す
+        """
+        try:
+            value = self.get_date(tweet)
+        except (KeyError, IndexError, TypeError):
+            return False
+        if self.time_format is None:
+            return True
+        return isinstance(value, str) and strptime_decoder(self.time_format)(value) is not None
+    
+    def to_dict(self):
+        return {
+            'date_path': list(self.date_path),
+            'wrapper': self.wrapper,
+            'time_format': self.time_format,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['date_path'], data.get('wrapper'), data.get('time_format'))
+
+def detect_tweet_schema(first_tweet):
+    """
+    ツイートの構造を検出する関数
+    
+    日時情報は DATE_KEYS の直接のキーを優先し、なければネストされた構造を探索する。
+    
+    Parameters:
+    - first_tweet: 構造の判定に使用するツイート（先頭のツイート）
+    
+    Returns:
+    - TweetSchema
+    
+    Raises:
+    - ValueError: 日時情報が見つからない場合
+    """
+    date_path = next(((key,) for key in DATE_KEYS if key in first_tweet), None) or find_key_path(first_tweet, DATE_KEYS)
+    if not date_path:
+        raise ValueError("投稿内に日時情報が見つかりません")
+    wrapper = 'tweet' if isinstance(first_tweet, dict) and isinstance(first_tweet.get('tweet'), dict) else None
+    time_format = detect_time_format(compile_accessor(date_path)(first_tweet))
+    return TweetSchema(date_path, wrapper, time_format)
+
+# Twitter API形式の日時フォーマット
+TWITTER_DATE_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
+# 試行する日時フォーマットのリスト
+DATE_FORMATS = [
+    TWITTER_DATE_FORMAT,           # Twitter API形式
+    '%Y-%m-%dT%H:%M:%S.%fZ',       # ISO形式
+    '%Y-%m-%d %H:%M:%S',           # 標準形式
+]
+# 1日のマイクロ秒数
+DAY_MICROSECONDS = 86400 * 1000000
+
+_MONTHS = {name: i for i, name in enumerate(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+_WEEKDAYS = frozenset(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+_ASCII_DIGITS = frozenset('0123456789')
+
+def days_from_civil(year, month, day):
+    """
+    グレゴリオ暦の日付を1970-01-01からの日数に変換する関数（整数演算のみ）
+    """
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def civil_from_days(days):
+    """
+    1970-01-01からの日数を (年, 月, 日) に変換する関数（整数演算のみ）
+    """
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    return yoe + era * 400 + (month <= 2), month, day
+
+def datetime_to_epoch(dt):
+    """
+    datetimeをエポックマイクロ秒（UTC）に変換する関数（タイムゾーンなしの場合はUTCとみなす）
+    """
+    offset = dt.utcoffset()
+    if offset is not None:
+        dt = dt.replace(tzinfo=None) - offset
+    days = days_from_civil(dt.year, dt.month, dt.day)
+    return (((days * 24 + dt.hour) * 60 + dt.minute) * 60 + dt.second) * 1000000 + dt.microsecond
+
+def decode_twitter_date(date_str):
+    """
+    固定長のTwitter API形式（'Wed Oct 10 20:19:24 +0000 2018'）の日時を
+    strptimeを使わずにエポックマイクロ秒に変換する関数
+    
+    Returns:
+    - エポックマイクロ秒（形式が一致しない場合はNone）
+    """
+    if (len(date_str) != 30 or date_str[19:26] != ' +0000 ' or date_str[3] != ' ' or date_str[7] != ' '
+            or date_str[10] != ' ' or date_str[13] != ':' or date_str[16] != ':'):
+        return None
+    month = _MONTHS.get(date_str[4:7])
+    if month is None or date_str[:3] not in _WEEKDAYS:
+        return None
+    digits = date_str[8:10] + date_str[11:13] + date_str[14:16] + date_str[17:19] + date_str[26:30]
+    if not _ASCII_DIGITS.issuperset(digits):
+        return None
+    day = int(date_str[8:10])
+    hour = int(date_str[11:13])
+    minute = int(date_str[14:16])
+    second = int(date_str[17:19])
+    year = int(date_str[26:30])
+    days_in_month = _DAYS_IN_MONTH[month]
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        days_in_month = 29
+    if year < 1 or not 1 <= day <= days_in_month or hour > 23 or minute > 59 or second > 59:
+        return None
+    return (((days_from_civil(year, month, day) * 24 + hour) * 60 + minute) * 60 + second) * 1000000
+
+def strptime_decoder(fmt):
+    """
+    指定フォーマットの日時をエポックマイクロ秒に変換する関数を返す（一致しない場合はNone）
+    """
+    def decode(date_str):
+        try:
+            return datetime_to_epoch(datetime.strptime(date_str, fmt))
+        except ValueError:
+            return None
+    
+    if fmt == TWITTER_DATE_FORMAT:
+        # 固定長の高速デコーダを優先し、一致しない表記のみstrptimeで処理
+        def decode_twitter(date_str):
+            result = decode_twitter_date(date_str)
+            return result if result is not None else decode(date_str)
+        return decode_twitter
+    return decode
+
+# 日時形式の検出とパース
+def make_date_parser(time_format=None):
+    """
+    日時文字列をエポックマイクロ秒に変換する関数を生成する関数
+    
+    最初に成功したフォーマットを固定して以降は最優先で試行し、
+    一致しない場合のみフォーマットのリストを順に試行する。
+    
+    Parameters:
+    - time_format: 日時情報のフォーマット（指定時は最優先で試行）
+    
+    Returns:
+    - 日時文字列を受け取りエポックマイクロ秒を返す関数（認識できない場合はValueError）
+    """
+    formats = ([time_format] if time_format else []) + DATE_FORMATS
+    decoders = [strptime_decoder(fmt) for fmt in formats]
+    pinned = None
+    
+    def parse(date_str):
+        nonlocal pinned
+        if pinned is not None:
+            result = pinned(date_str)
+            if result is not None:
+                return result
+        for decoder in decoders:
+            result = decoder(date_str)
+            if result is not None:
+                if pinned is None:
+                    pinned = decoder
+                return result
+        raise ValueError(f"日付形式を認識できません: {date_str}")
+    
+    return parse
@@ -0,0 +1,3647 @@
+"""
+Twitter投稿ログを時系列順・ファイルサイズ上限ごとに分割するモジュール
+
+コマンドラインからは python twitter_log_splitter.py（または twitter-log-splitter.py）として実行する。
+ライブラリとして使用する場合は split_twitter_log_by_time で一括処理するか、
+load_tweets → iter_sorted → iter_groups → iter_parts を組み合わせて、
+分割したパートをファイルに書き出さずに受け取る。
+"""
+import json
+import os
+import sys
+import re
+import heapq
+import bisect
+import itertools
+import tempfile
+import glob
+import mmap
+import codecs
+import threading
+import struct
+import hashlib
+import zlib
+import lzma
+import cProfile
+import pstats
+import tracemalloc
+from array import array
+from contextlib import contextmanager
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+import time
+from operator import itemgetter
+import unicodedata  # Unicode正規化のためのモジュールを追加
+import json_codec  # JSONのパース・シリアライズ（orjson/ujsonがあれば使用）
+from tweet_format import (  # 入力・ツイートの構造・日時の形式（check_structure.py と共通）
+    JS_VAR_PATTERN, JSON_WHITESPACE, BOM_ENCODINGS, open_input_buffer, iter_candidate_encodings,
+    compile_accessor, format_path, TweetSchema, detect_tweet_schema,
+    DAY_MICROSECONDS, days_from_civil, civil_from_days, datetime_to_epoch, make_date_parser,
+)
+# tqdmライブラリがインストールされているか確認し、なければ警告を表示
+try:
+    from tqdm import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+    print("警告: tqdmライブラリがインストールされていません。進捗表示機能が制限されます。")
+    print("pip install tqdm でインストールすることをお勧めします。")
+    # ダミーのtqdm（進捗バーなしでイテレータをそのまま返す）
+    def tqdm(iterable, *args, **kwargs):
+        return iterable
+
+# resourceモジュール（ピークRSSの取得に使用）はUnix系のみ
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# chardetライブラリがインストールされているか確認し、なければ警告を表示
+try:
+    import chardet
+    HAS_CHARDET = True
+except ImportError:
+    HAS_CHARDET = False
+    print("警告: chardetライブラリがインストールされていません。エンコーディング自動検出機能が制限されます。")
+    print("pip install chardet でインストールすることをお勧めします。")
+
+# zstandardライブラリがインストールされているか確認（--compress=zstd で使用）
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+# pyarrowライブラリ（--format=parquet|arrow の場合のみ load_pyarrow で読み込む）
+pyarrow = None
+
+def load_pyarrow():
+    """
+    pyarrowライブラリを読み込む関数（読み込み済みの場合は何もしない）
+    
+    pyarrow の読み込みには時間がかかるため、列指向の形式で出力する場合のみ読み込む。
+    
+    Returns:
+    - 読み込めた場合はTrue、インストールされていない場合はFalse
+    """
+    global pyarrow
+    if pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            pyarrow = None
+            return False
+    return True
+
+def split_twitter_log_by_time(input_file, output_dir, max_size_bytes=5*1024*1024, time_format=None, text_only=False, group_by='month', memory_limit=None, workers=1, incremental=False, write_threads=2, build_index=False, adaptive=False, compression=None, compressed_limit=False, output_format='json', metrics_path=None, parallel_periods=False, dedup=False, exclude_retweets=False, exclude_replies=False, since=None, until=None, fields=None):
+    """
+    Twitter投稿ログを時系列順に分割する関数
+    
+    Parameters:
+    - input_file: 入力JSONファイルのパス（エクスポートのディレクトリまたはglobパターンも指定可能）
+    - output_dir: 出力ディレクトリのパス
+    - max_size_bytes: 各出力ファイルの最大サイズ（バイト）
+    - time_format: 日時情報のフォーマット（Noneの場合は自動検出）
+    - text_only: Trueの場合、ツイートのテキストのみを抽出
+    - group_by: グループ化の単位（'year', 'quarter', 'month', 'week'（ISO週）, 'day', 'hour', 'all'（全期間）、
+      または '6h' のような期間の長さ）
+    - memory_limit: 指定した場合、メモリ使用量をこのバイト数程度に抑える外部ソートモードで処理
+    - workers: 複数パートの読み込みとテキスト抽出モードのテキスト整形に使用するプロセス数
+    - incremental: Trueの場合、出力ディレクトリのマニフェストを使って前回以降の新しいツイートのみを追加
+    - write_threads: ファイル書き込みに使用するバックグラウンドスレッド数（0の場合は同期書き込み）
+    - build_index: Trueの場合、日時・ツイートIDで検索するためのインデックスファイルを出力ディレクトリに作成
+    - adaptive: Trueの場合、隣り合う小さな期間をサイズ上限に達するまで1つの期間にまとめる
+    - compression: 出力ファイルの圧縮形式（'gzip', 'zstd', 'xz'、Noneの場合は圧縮しない）
+    - compressed_limit: Trueの場合、最大ファイルサイズを圧縮後のサイズに適用（Falseの場合は圧縮前のサイズ）
+    - output_format: 出力形式（'json'、列指向の 'parquet' または 'arrow'（Arrow IPC））
+    - metrics_path: 指定した場合、処理段階ごとの時間とカウンタをこのファイルに出力
+      （拡張子が .prom の場合はPrometheusのテキスト形式、それ以外はJSON Lines）
+    - parallel_periods: Trueの場合、期間ごとの分割・シリアライズ・書き込みを workers のプロセスで並列に行う
+    - dedup: Trueの場合、同じIDのツイートは最初の1件のみを出力（インクリメンタルモードでは常に除外）
+    - exclude_retweets: Trueの場合、リツイートを出力しない
+    - exclude_replies: Trueの場合、リプライを出力しない
+    - since: この日時（エポックマイクロ秒）以降のツイートのみを出力（Noneの場合は制限なし）
+    - until: この日時（エポックマイクロ秒）より前のツイートのみを出力（Noneの場合は制限なし）
+    - fields: 出力するフィールドのパスのリスト（例: ['id', 'created_at', 'full_text', 'user.screen_name']）
+      指定した場合、各ツイートをこれらのフィールドだけのレコードにしてから分割する（サイズ上限はレコードのバイト数に適用）
+    """
+    # グループ化の単位と圧縮形式を確認（不正な場合はValueError）
+    make_period_key(group_by)
+    if compression is not None:
+        StreamingCompressor(compression)
+    
+    # 出力するフィールドの指定（JSONモードのみ）
+    project = None
+    if fields is not None and text_only:
+        print("警告: --fields はテキスト抽出モードでは使用できません。テキストで出力します。")
+    elif fields is not None:
+        project = FieldProjector(fields)
+    
+    # 列指向の出力形式（JSONモードのみ）
+    columnar = None
+    if output_format != 'json' and text_only:
+        print(f"警告: --format={output_format} はテキスト抽出モードでは使用できません。テキストで出力します。")
+    elif output_format != 'json':
+        columnar = ColumnarEncoder(output_format, time_format, project)
+        if incremental:
+            raise ValueError(f"--incremental は --format={output_format} と同時に使用できません")
+        if compression is not None:
+            # Parquet・Arrow のファイルは列ごとに圧縮する
+            print(f"警告: --compress は --format={output_format} と同時に使用できません。圧縮せずに出力します。")
+            compression = None
+    
+    # 開始時間を記録
+    start_time = time.time()
+    metrics.reset()
+    
+    # 入力ファイル（複数パートの場合はパート順）を特定
+    input_files = resolve_input_files(input_file)
+    metrics.count('bytes_in', sum(os.path.getsize(path) for path in input_files))
+    
+    # 出力ディレクトリの作成
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # インクリメンタルモードでは前回の処理結果をマニフェストから読み込む
+    manifest = None
+    if incremental:
+        options = {'text_only': text_only, 'group_by': group_by, 'max_size_bytes': max_size_bytes}
+        # 書き込んだツイートの日時をマニフェストに記録する際に同じフォーマットでパースする
+        if time_format is not None:
+            options.update(time_format=time_format)
+        if compression is not None:
+            options.update(compression=compression, compressed_limit=compressed_limit)
+        # 除外の条件が前回と異なると、期間ごとに出力の内容が混在するため記録する
+        if exclude_retweets:
+            options.update(exclude_retweets=True)
+        if exclude_replies:
+            options.update(exclude_replies=True)
+        if since is not None or until is not None:
+            options.update(since=since, until=until)
+        if project is not None:
+            options.update(fields=['.'.join(path) for path in project.paths])
+        manifest = load_manifest(output_dir, options)
+    
+    # ソートの前に適用するフィルタ（インクリメンタルモードではマニフェストで重複を除外する）
+    tweet_filter = TweetFilter(exclude_retweets, exclude_replies, since, until, dedup and not incremental) or None
+    
+    # 書き込んだパートのインデックス（インクリメンタルモードでは以前のパートを含められないため作成しない）
+    index = None
+    if build_index and incremental:
+        print("警告: --index は --incremental と同時に使用できません。インデックスは作成しません。")
+    elif build_index and compression is not None:
+        # 圧縮したファイル内のバイト位置では部分的に読み込めない
+        print("警告: --index は --compress と同時に使用できません。インデックスは作成しません。")
+    elif build_index and columnar is not None:
+        print(f"警告: --index は --format={output_format} と同時に使用できません。インデックスは作成しません。")
+    elif build_index:
+        index = TweetIndexBuilder(time_format)
+    
+    # 期間のまとめ方は追加するツイートによって変わるため、インクリメンタルモードでは使用しない
+    if adaptive and incremental:
+        print("警告: --adaptive は --incremental と同時に使用できません。期間をまとめずに処理します。")
+        adaptive = False
+    
+    # 期間ごとの並列処理には複数のワーカープロセスが必要
+    if parallel_periods and workers <= 1:
+        print("警告: --parallel-periods には --workers=2 以上が必要です。期間を順に処理します。")
+        parallel_periods = False
+    
+    # パートの読み込みとテキスト整形（または期間ごとの処理）を複数プロセスで並列化
+    use_executor = workers > 1 and (text_only or len(input_files) > 1 or parallel_periods)
+    executor = ProcessPoolExecutor(max_workers=workers) if use_executor else None
+    # 分割処理とファイル書き込みを並行して行う（期間ごとの並列処理ではワーカーが書き込む）
+    writer = PartWriter(write_threads) if write_threads > 0 and not parallel_periods else None
+    parallel_workers = workers if parallel_periods else 0
+    # 出力ファイルの圧縮設定（Noneの場合は圧縮しない）
+    output_compression = (compression, compressed_limit) if compression is not None else None
+    try:
+        if memory_limit:
+            # 外部ソートモード（ディスク上のランファイルを使用）
+            tweet_count, file_count = split_with_external_sort(input_files, output_dir, max_size_bytes, time_format, text_only, group_by, memory_limit, executor, manifest, writer, index, adaptive, output_compression, columnar, parallel_workers, tweet_filter, project, workers)
+        else:
+            tweet_count, file_count = split_in_memory(input_files, output_dir, max_size_bytes, time_format, text_only, group_by, executor, manifest, writer, index, adaptive, output_compression, columnar, parallel_workers, tweet_filter, project, workers)
+    finally:
+        if writer is not None:
+            writer.close()
+        if executor is not None:
+            executor.shutdown()
+    
+    if manifest is not None:
+        save_manifest(output_dir, manifest)
+    if index is not None:
+        index.write(output_dir)
+    
+    # 処理時間を計算
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"処理完了: {tweet_count} ツイートを処理しました (処理時間: {elapsed_time:.2f}秒)")
+    
+    if metrics_path:
+        metrics.count('tweets_processed', tweet_count)
+        metrics.add_time('total', elapsed_time)
+        details = {'input': input_file, 'output_dir': output_dir, 'group_by': group_by, 'text_only': text_only,
+                   'external_sort': bool(memory_limit), 'json_backend': json_codec.backend_name()}
+        write_metrics(metrics_path, metrics.snapshot(), details)
+        print(f"メトリクスを出力しました: {metrics_path}")
+    return file_count
+
+def split_in_memory(input_files, output_dir, max_size_bytes, time_format, text_only, group_by, executor=None, manifest=None, writer=None, index=None, adaptive=False, compression=None, columnar=None, parallel_workers=0, tweet_filter=None, project=None, workers=1):
+    """
+    全ツイートをメモリ上に読み込み、時系列順にソートして分割する関数
+    
+    Parameters:
+    - input_files: 入力ファイルのパスのリスト（パート順）
+    - executor: パートの読み込みとテキスト整形に使用するプロセスプール（Noneの場合は逐次処理）
+    - manifest: インクリメンタルモードのマニフェスト（Noneの場合は全ツイートを処理）
+    - writer: ファイル書き込みに使用する PartWriter（Noneの場合は同期書き込み）
+    - index: 書き込んだツイートを登録する TweetIndexBuilder（Noneの場合はインデックスを作成しない）
+    - adaptive: Trueの場合、隣り合う小さな期間をサイズ上限に達するまでまとめる
+    - compression: (圧縮形式, 圧縮後のサイズに上限を適用するか) のタプル（Noneの場合は圧縮しない）
+    - columnar: 列指向の形式で出力する ColumnarEncoder（Noneの場合はJSONまたはテキスト）
+    - parallel_workers: 1以上の場合、executor のこの数のワーカーで期間ごとに並列に分割・書き込み
+    - tweet_filter: ソートの前に適用する TweetFilter（Noneの場合は全件）
+    - project: 出力するフィールドを取り出す FieldProjector（Noneの場合はツイート全体）
+    - workers: executor のワーカー数（テキスト整形で先読みするチャンク数の上限に使用）
+    - その他: split_twitter_log_by_time と同じ
+    
+    Returns:
+    - (処理したツイート数, 作成したファイル数)
+    """
+    # ファイルを開いて構造を確認
+    with metrics.stage('load'):
+        tweets = read_tweet_parts(input_files, executor)
+    
+    if not tweets:
+        raise ValueError("入力ファイル内にTwitter投稿の配列が見つかりません")
+    
+    # 空のツイートリストの処理
+    if len(tweets) == 0:
+        print("警告: ツイートリストが空です。処理するデータがありません。")
+        return 0, 0
+    
+    print(f"処理対象ツイート数: {len(tweets)}")
+    metrics.count('tweets_read', len(tweets))
+    
+    with metrics.stage('detect'):
+        # 日時のパスとフォーマットを特定（同じ構造の入力で検出済みの場合はキャッシュを使用）
+        schema = get_tweet_schema(tweets[0])
+        get_value = schema.get_date
+        parse = make_date_parser(time_format or schema.time_format)
+    
+    # 各ツイートの日時を一度だけパースしてエポック値に変換
+    is_new_tweet = make_new_tweet_filter(manifest) if manifest is not None else None
+    keyed_tweets = []
+    parse_failures = 0
+    skipped_count = 0
+    with metrics.stage('parse_dates'):
+        for tweet in tweets:
+            try:
+                epoch = parse(get_value(tweet))
+            except Exception as e:
+                # 日時をパースできないツイートは外部ソートモードと同じく警告を表示して除外する
+                print(f"警告: 日時パースエラー {schema.date_value(tweet)}: {e}")
+                parse_failures += 1
+                continue
+            # 条件に合わないツイートはソートの前に除外
+            if tweet_filter is not None and not tweet_filter(tweet, epoch):
+                continue
+            # インクリメンタルモードでは処理済みのツイートを除外
+            if is_new_tweet is not None and not is_new_tweet(tweet, epoch):
+                skipped_count += 1
+                continue
+            keyed_tweets.append((epoch, tweet))
+    # 除外したツイートはここで解放する
+    tweets = None
+    metrics.count('parse_failures', parse_failures)
+    if tweet_filter is not None:
+        tweet_filter.report()
+    if is_new_tweet is not None:
+        print(f"処理済みのためスキップ: {skipped_count} ツイート")
+    
+    # 投稿を日時でソート
+    print("ツイートを時系列順にソート中...")
+    with metrics.stage('sort'):
+        keyed_tweets.sort(key=itemgetter(0))
+    print("ソート完了")
+    
+    # 時間単位でグループ化
+    print("ツイートを時間単位でグループ化中...")
+    group_start = time.perf_counter()
+    period_key = make_period_key(group_by)
+    grouped_tweets = {}
+    period_sizes = {} if adaptive else None
+    # tqdmで進捗バーを表示
+    for epoch, tweet in tqdm(keyed_tweets, desc="グループ化", unit="tweet"):
+        key = period_key(epoch)
+        if key not in grouped_tweets:
+            grouped_tweets[key] = []
+        grouped_tweets[key].append(tweet)
+        if period_sizes is not None:
+            period_sizes[key] = period_sizes.get(key, 0) + estimate_output_size(tweet, text_only, project)
+    print(f"グループ化完了: {len(grouped_tweets)} 期間に分類")
+    
+    if period_sizes is not None:
+        # 小さな期間をまとめる（各期間のツイートは時系列順のため、連結しても時系列順になる）
+        grouped_tweets = {
+            merged_period: [tweet for period in periods for tweet in grouped_tweets[period]]
+            for merged_period, periods in merge_small_periods(sorted(grouped_tweets), period_sizes, max_size_bytes)
+        }
+        print(f"小さな期間をまとめました: {len(grouped_tweets)} 期間")
+    metrics.add_time('group', time.perf_counter() - group_start)
+    
+    # 各時間グループをファイルサイズ制限に従って分割
+    file_count = 0
+    print("ファイル分割処理を開始...")
+    if parallel_workers:
+        period_jobs = ((period, period_tweets, len(period_tweets)) for period, period_tweets in sorted(grouped_tweets.items()))
+        file_count = write_periods_in_parallel(executor, parallel_workers, tqdm(period_jobs, total=len(grouped_tweets), desc="ファイル分割", unit="期間"),
+                                               output_dir, max_size_bytes, text_only, manifest, index, compression, columnar, project)
+        return len(keyed_tweets), file_count
+    # tqdmで進捗バーを表示
+    for period, period_tweets in tqdm(sorted(grouped_tweets.items()), desc="ファイル分割", unit="期間"):
+        print(f"期間 {period} の処理中... ({len(period_tweets)} ツイート)")
+        file_count += write_period_parts(period, period_tweets, len(period_tweets), output_dir, max_size_bytes, text_only, executor, manifest, writer, index, compression, columnar, project, workers)
+    return len(keyed_tweets), file_count
+
+# ---- ライブラリとして使用するための段階ごとのジェネレータ ----
+# load_tweets → iter_sorted → iter_groups → iter_parts の順に組み合わせ、
+# 分割したパートをファイルに書き出さずにプロセス内で受け取る。
+
+def iter_file_tweets(input_file, stats=None):
+    """
+    1つの入力ファイルのツイートをストリーミング読み込みで1件ずつ返すジェネレータ
+    
+    ツイートを返し始めた後はエンコーディングを切り替えられないため、エンコーディングの候補ごとに
+    ファイル全体をデコードできるかを先に確認する（デコード結果は保持しない）。
+    JSON配列ではない場合（ルートがオブジェクトの場合など）はファイル全体を読み込んでから返す。
+    
+    Parameters:
+    - input_file: 入力ファイルのパス
+    - stats: 読み込んだバイト数を 'bytes_read' に加算する辞書
+    """
+    with open_input_buffer(input_file) as buf:
+        for encoding in iter_candidate_encodings(buf):
+            if can_decode_buffer(buf, encoding):
+                break
+        else:
+            raise ValueError("ファイルを読み込めませんでした。すべてのエンコーディングが失敗しました。")
+        
+        chunks = iter_decoded_chunks(buf, encoding, stats=stats)
+        tweet_stream = iter_tweets(iter_json_array(chunks))
+        try:
+            try:
+                first_tweet = next(tweet_stream, None)
+            except json.JSONDecodeError:
+                raise
+            except ValueError:
+                tweets = decode_json_buffer(buf, encoding, stats)
+                if tweets is None:
+                    metrics.count('encoding_fallbacks')
+                    tweets = extract_tweets(load_json_data(input_file, detect_encodings(input_file)))
+                yield from tweets
+                return
+            if first_tweet is None:
+                return
+            yield first_tweet
+            yield from tweet_stream
+        finally:
+            # メモリマップを閉じる前にデコード中のバッファの参照を解放する
+            tweet_stream.close()
+            chunks.close()
+
+def load_tweets(input_path):
+    """
+    入力からツイートを1件ずつ返すジェネレータ（入力順）
+    
+    Parameters:
+    - input_path: 入力ファイル、Twitterエクスポートのディレクトリ、またはglobパターン
+      （split_twitter_log_by_time の input_file と同じ）
+    
+    Yields:
+    - ツイート（{"tweet": {...}} 形式の場合はtweet内のデータ）
+    """
+    for input_file in resolve_input_files(input_path):
+        yield from iter_file_tweets(input_file)
+
+def iter_sorted(tweets, time_format=None, memory_limit=None, tweet_filter=None):
+    """
+    ツイートを日時でソートし、(エポック値, ツイート) を時系列順に返すジェネレータ
+    
+    同時刻のツイートは入力順を保つ。日時をパースできないツイートは警告を表示して除外する。
+    
+    Parameters:
+    - tweets: ツイートのイテラブル（load_tweets の結果など）
+    - time_format: 日時情報のフォーマット（Noneの場合は自動検出）
+    - memory_limit: 指定した場合、メモリ使用量をこのバイト数程度に抑えるため、
+      ディスク上のランファイルを使って外部ソートする
+    - tweet_filter: (ツイート, エポック値) を受け取り、処理対象ならTrueを返す関数（TweetFilter など）
+      日時のパース直後に適用するため、除外したツイートは保持もソートもされない
+    
+    Yields:
+    - (エポック値（マイクロ秒）, ツイート)
+    """
+    if memory_limit:
+        with tempfile.TemporaryDirectory(prefix='twitter-log-splitter-') as run_dir:
+            with metrics.stage('spill'):
+                # 全期間を1つの期間として振り分けると、ランファイルは全体で時系列順になる
+                buckets = spill_tweets_by_period(tweets, run_dir, memory_limit, time_format, 'all', tweet_filter=tweet_filter)
+            for _, runs, buffer in buckets.values():
+                yield from iter_merged_records(runs, buffer, run_dir)
+        return
+    
+    tweets = iter(tweets)
+    first_tweet = next(tweets, None)
+    if first_tweet is None:
+        return
+    with metrics.stage('detect'):
+        # 先頭のツイートで日時のパスとフォーマットを特定
+        schema = get_tweet_schema(first_tweet)
+        get_value = schema.get_date
+        parse = make_date_parser(time_format or schema.time_format)
+    keyed_tweets = []
+    with metrics.stage('parse_dates'):
+        for tweet in itertools.chain([first_tweet], tweets):
+            try:
+                epoch = parse(get_value(tweet))
+            except Exception as e:
+                print(f"警告: 日時パースエラー {schema.date_value(tweet)}: {e}")
+                metrics.count('parse_failures')
+                continue
+            if tweet_filter is None or tweet_filter(tweet, epoch):
+                keyed_tweets.append((epoch, tweet))
+    with metrics.stage('sort'):
+        keyed_tweets.sort(key=itemgetter(0))
+    yield from keyed_tweets
+
+def iter_groups(sorted_tweets, group_by='month'):
+    """
+    時系列順の (エポック値, ツイート) を期間ごとにまとめて返すジェネレータ
+    
+    Parameters:
+    - sorted_tweets: iter_sorted の結果
+    - group_by: グループ化の単位（split_twitter_log_by_time と同じ）
+    
+    Yields:
+    - (期間のキー, 期間内のツイートのイテレータ)
+      itertools.groupby と同様に、次の期間に進む前に期間内のツイートを読み終える必要がある
+    """
+    period_key = make_period_key(group_by)
+    for period, items in itertools.groupby(sorted_tweets, key=lambda item: period_key(item[0])):
+        yield period, map(itemgetter(1), items)
+
+def iter_parts(groups, max_size_bytes=5*1024*1024, text_only=False, compression=None, compressed_limit=False, output_format='json', time_format=None, fields=None):
+    """
+    期間ごとのツイートをファイルサイズ制限に従って分割し、各パートの内容を返すジェネレータ
+    
+    パートの内容は split_twitter_log_by_time が書き込むファイルの内容と同じバイト列。
+    
+    Parameters:
+    - groups: iter_groups の結果（(期間のキー, 時系列順のツイートのイテラブル) のイテラブル）
+    - max_size_bytes: 各パートの最大サイズ（バイト）
+    - text_only: Trueの場合、ツイートのテキストのみを抽出
+    - compression: パートの圧縮形式（'gzip', 'zstd', 'xz'、Noneの場合は圧縮しない）
+    - compressed_limit: Trueの場合、最大サイズを圧縮後のサイズに適用
+    - output_format: 出力形式（'json'、'parquet'、'arrow'。テキスト抽出モードでは 'json' のみ）
+    - time_format: 列指向の形式で created_at 列に変換する日時のフォーマット（Noneの場合は自動検出）
+    - fields: 出力するフィールドのパスのリスト（Noneの場合はツイート全体、テキスト抽出モードでは使用できない）
+    
+    Yields:
+    - (期間のキー, パート番号（1から）, パートの内容のバイト列)
+    """
+    project = None
+    if fields is not None:
+        if text_only:
+            raise ValueError("fields はテキスト抽出モードでは使用できません")
+        project = FieldProjector(fields)
+    columnar = None
+    if output_format != 'json':
+        if text_only:
+            raise ValueError(f"output_format={output_format} はテキスト抽出モードでは使用できません")
+        if compression is not None:
+            raise ValueError(f"output_format={output_format} は圧縮と同時に使用できません")
+        columnar = ColumnarEncoder(output_format, time_format, project)
+    if compression is not None:
+        StreamingCompressor(compression)
+    output_compression = (compression, compressed_limit) if compression is not None else None
+    for period, period_tweets in groups:
+        for part_number, (_, content) in enumerate(iter_part_contents(period_tweets, max_size_bytes, text_only, compression=output_compression, columnar=columnar, project=project), 1):
+            yield period, part_number, content
+
+# Twitterエクスポート内のツイートのパートファイル（tweets.js, tweets-part1.js, ...）
+# 古いエクスポートでは tweet.js, tweet-part1.js という名前になっている
+TWEET_PART_PATTERNS = ['tweets.js', 'tweets-part*.js', 'tweet.js', 'tweet-part*.js']
+
+PART_NUMBER_PATTERN = re.compile(r'part(\d+)\D*$')
+
+def part_sort_key(path):
+    """
+    パートファイルをパート番号順（tweets.js が先頭）に並べるためのキーを返す関数
+    """
+    match = PART_NUMBER_PATTERN.search(os.path.basename(path))
+    return (int(match.group(1)) + 1 if match else 0, path)
+
+def resolve_input_files(input_path):
+    """
+    入力の指定から、読み込むファイルのリストをパート順に返す関数
+    
+    Parameters:
+    - input_path: 入力ファイル、Twitterエクスポートのディレクトリ（またはその data ディレクトリ）、
+      あるいはglobパターン（例: "data/tweets*.js"）
+    
+    Returns:
+    - 入力ファイルのパスのリスト
+    """
+    if os.path.isdir(input_path):
+        # エクスポートのルートが指定された場合は data ディレクトリを探す
+        for directory in [input_path, os.path.join(input_path, 'data')]:
+            paths = set()
+            for pattern in TWEET_PART_PATTERNS:
+                paths.update(glob.glob(os.path.join(glob.escape(directory), pattern)))
+            if paths:
+                break
+        if not paths:
+            raise FileNotFoundError(f"ディレクトリ内にツイートのファイル（tweets.js など）が見つかりません: {input_path}")
+    elif not os.path.exists(input_path) and glob.has_magic(input_path):
+        paths = [path for path in glob.glob(input_path) if os.path.isfile(path)]
+        if not paths:
+            raise FileNotFoundError(f"パターンに一致するファイルが見つかりません: {input_path}")
+    else:
+        return [input_path]
+    
+    input_files = sorted(paths, key=part_sort_key)
+    print(f"{len(input_files)} 個のパートファイルを検出しました: {', '.join(os.path.basename(path) for path in input_files)}")
+    return input_files
+
+def read_tweet_parts(input_files, executor=None):
+    """
+    複数のパートファイルからツイートを読み込み、パート順に連結して返す関数
+    
+    各パートの読み込み（デコードとJSONパース）は executor がある場合ワーカープロセスで並列に行う。
+    時系列順への並べ替えは後段のソートで行う。
+    
+    Parameters:
+    - input_files: 入力ファイルのパスのリスト（パート順）
+    - executor: パートの読み込みに使用するプロセスプール（Noneの場合は逐次処理）
+    
+    Returns:
+    - ツイートのリスト
+    """
+    if len(input_files) == 1:
+        return read_tweets(input_files[0])
+    
+    part_tweets = executor.map(read_tweets, input_files) if executor is not None else map(read_tweets, input_files)
+    tweets = []
+    for input_file, part in zip(input_files, part_tweets):
+        print(f"{os.path.basename(input_file)}: {len(part)} ツイート")
+        tweets.extend(part)
+    return tweets
+
+def read_tweets(input_file):
+    """
+    入力ファイルからツイートのリストを読み込む関数
+    
+    ファイルを一度だけメモリマップし、エンコーディングの判定とストリーミングパースを
+    マップしたバイト列に対して行う。JSON配列として読めない場合（ルートがオブジェクトの場合など）は
+    判定したエンコーディングで一度だけデコードしてパースし、それでも失敗した場合は
+    従来の読み込み方法にフォールバックする。
+    
+    Parameters:
+    - input_file: 入力JSONファイルのパス
+    
+    Returns:
+    - ツイートのリスト
+    """
+    try:
+        stats = {'bytes_read': 0}
+        tweets = None
+        with open_input_buffer(input_file) as buf:
+            # 高速なJSONライブラリがあれば、UTF-8のままマップしたバイト列を一括パース
+            tweets = load_tweets_from_buffer(buf, stats)
+            # 各エンコーディングでストリーミング読み込みを試行
+            for encoding in iter_candidate_encodings(buf) if tweets is None else []:
+                # パースの時間は、ストリーミング読み込み全体からデコードの時間を除いたもの
+                decode_time = metrics.elapsed('decode')
+                parse_start = time.perf_counter()
+                try:
+                    tweets = list(iter_tweets(iter_json_array(iter_decoded_chunks(buf, encoding, stats=stats))))
+                    print(f"ファイル読み込み完了: {len(buf)/1024/1024:.2f} MB (エンコーディング: {encoding})")
+                    break
+                except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                    print(f"{encoding}エンコーディングでストリーミング読み込み失敗: {e}")
+                    metrics.count('encoding_fallbacks')
+                except ValueError:
+                    # JSON配列ではない場合は、判定したエンコーディングで一度だけデコードしてパース
+                    tweets = decode_json_buffer(buf, encoding, stats)
+                    break
+                except LookupError as e:
+                    print(f"{encoding}エンコーディングで読み込み失敗: {e}")
+                    metrics.count('encoding_fallbacks')
+                finally:
+                    metrics.add_time('parse', time.perf_counter() - parse_start - (metrics.elapsed('decode') - decode_time))
+        report_load_stats(stats)
+        
+        # ストリーミング読み込みに失敗した場合、従来の方法でファイル全体を読み込んで構造を確認
+        if tweets is None:
+            metrics.count('encoding_fallbacks')
+            data = load_json_data(input_file, detect_encodings(input_file))
+            tweets = extract_tweets(data)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"ファイルが見つかりません: {input_file}")
+    except PermissionError:
+        raise PermissionError(f"ファイルを開く権限がありません: {input_file}")
+    return tweets
+
+def can_decode_buffer(buf, encoding):
+    """
+    マップしたバイト列全体を指定したエンコーディングでデコードできるかを返す関数（デコード結果は保持しない）
+    """
+    try:
+        for _ in iter_decoded_chunks(buf, encoding):
+            pass
+        return True
+    except (UnicodeDecodeError, LookupError) as e:
+        print(f"{encoding}エンコーディングで読み込み失敗: {e}")
+        metrics.count('encoding_fallbacks')
+        return False
+
+def iter_decoded_chunks(buf, encoding='utf-8', chunk_size=1024*1024, stats=None):
+    """
+    バイト列をチャンクごとにインクリメンタルデコードして文字列を返すジェネレータ
+    
+    UTF-8の検証もデコードと同時に行われるため、事前に全体を検証・複製する必要がない。
+    
+    Parameters:
+    - buf: 入力のバイト列（メモリマップ）
+    - encoding: エンコーディング
+    - chunk_size: 1回にデコードするバイト数
+    - stats: 読み込んだバイト数を 'bytes_read' に加算する辞書
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    view = memoryview(buf)
+    # デコードにかかった時間（パースの時間と分けて計測する）
+    decode_time = 0.0
+    try:
+        for start in range(0, len(view), chunk_size):
+            chunk = view[start:start + chunk_size]
+            if stats is not None:
+                stats['bytes_read'] += len(chunk)
+            decode_start = time.perf_counter()
+            text = decoder.decode(chunk)
+            decode_time += time.perf_counter() - decode_start
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+    finally:
+        view.release()
+        metrics.add_time('decode', decode_time)
+
+def decode_json_buffer(buf, encoding, stats=None):
+    """
+    バイト列全体を一度だけデコードしてJSONとしてパースし、ツイートの配列を返す関数
+    （JSON配列ではないファイル用。パースできない場合はNone）
+    """
+    if stats is not None:
+        stats['bytes_read'] += len(buf)
+    try:
+        with metrics.stage('decode'):
+            content = codecs.decode(buf, encoding)
+        match = JS_VAR_PATTERN.match(content)
+        if match:
+            content = content[match.end():].strip().rstrip(';')
+        with metrics.stage('parse'):
+            tweets = extract_tweets(json_codec.loads(content))
+        print(f"ファイル読み込み完了: {len(buf)/1024/1024:.2f} MB (エンコーディング: {encoding})")
+        return tweets
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        print(f"{encoding}エンコーディングでJSONデコードエラー: {e}")
+        return None
+
+# バイト列中の変数宣言部分（window.YTD.tweets.part0 = ）
+JS_VAR_BYTES_PATTERN = re.compile(rb'\s*window\.YTD\.[^=]+=\s*')
+
+def load_tweets_from_buffer(buf, stats=None):
+    """
+    UTF-8の入力を、デコードせずにマップしたバイト列のまま高速なJSONライブラリで一括パースする関数
+    
+    UTF-8の検証はJSONライブラリがパースと同時に行う。標準ライブラリのみの場合、
+    UTF-8以外のBOMがある場合、パースできない場合（UTF-8以外のエンコーディングなど）はNoneを返す。
+    
+    Parameters:
+    - buf: 入力のバイト列（メモリマップ）
+    - stats: 読み込んだバイト数を 'bytes_read' に加算する辞書
+    
+    Returns:
+    - ツイートのリスト、またはNone
+    """
+    if json_codec.backend_name() == 'json' or not buf:
+        return None
+    start = 0
+    for bom, encoding in BOM_ENCODINGS:
+        if buf[:len(bom)] == bom:
+            if encoding != 'utf-8-sig':
+                return None
+            start = len(bom)
+            break
+    match = JS_VAR_BYTES_PATTERN.match(buf, start)
+    if match:
+        start = match.end()
+    # 末尾の空白と ';' を除く
+    end = len(buf)
+    while end > start and buf[end - 1] in b' \t\r\n;':
+        end -= 1
+    
+    # UTF-8の検証とパースを同時に行うため、時間はすべてパースとして計測する
+    with memoryview(buf) as view, metrics.stage('parse'):
+        try:
+            data = json_codec.loads(view[start:end])
+        except ValueError:
+            return None
+    if stats is not None:
+        stats['bytes_read'] += end - start
+    tweets = extract_tweets(data)
+    print(f"ファイル読み込み完了: {len(buf)/1024/1024:.2f} MB (エンコーディング: utf-8, JSONバックエンド: {json_codec.backend_name()})")
+    return tweets
+
+def get_peak_rss():
+    """
+    プロセスのピークRSS（バイト）を返す関数（取得できない環境ではNone）
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxではKB単位、macOSではバイト単位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def report_load_stats(stats):
+    """
+    読み込んだバイト数とピークRSSを表示する関数
+    """
+    peak_rss = get_peak_rss()
+    peak_text = f"{peak_rss/1024/1024:.1f} MB" if peak_rss is not None else "不明"
+    print(f"読み込みバイト数: {stats['bytes_read']/1024/1024:.2f} MB, ピークRSS: {peak_text}")
+
+# 計測する処理段階（出力する順序）
+METRIC_STAGES = ['load', 'decode', 'parse', 'detect', 'parse_dates', 'sort', 'group', 'spill', 'batch', 'encode', 'write', 'total']
+
+# 集計するカウンタ
+METRIC_COUNTERS = [
+    'tweets_read', 'tweets_filtered', 'tweets_processed', 'tweets_written', 'bytes_in', 'bytes_out', 'files_written',
+    'parse_failures', 'encoding_fallbacks', 'write_failures',
+]
+
+# Prometheus形式で出力するメトリクス名の接頭辞
+METRICS_PREFIX = 'twitter_log_splitter'
+
+class Metrics:
+    """
+    処理段階ごとの時間とカウンタを集計するクラス
+    
+    同じ段階を複数回計測した場合は時間を合計する。バックグラウンドの書き込みスレッドからも
+    記録するため、更新はロックで保護する。ワーカープロセス（--workers）内で行った
+    デコード・パース・テキスト整形の時間は集計されない（呼び出し側の load・batch に含まれる）。
+    期間ごとの並列処理（--parallel-periods）では、各ワーカーの集計を merge で合計する
+    （段階の時間は各プロセスの時間の合計のため、経過時間より長くなる場合がある）。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """
+        集計をすべて0に戻す
+        """
+        with self.lock:
+            self.stages = {}
+            self.counters = dict.fromkeys(METRIC_COUNTERS, 0)
+    
+    @contextmanager
+    def stage(self, name):
+        """
+        with ブロックの処理時間を段階の時間に加算するコンテキストマネージャ
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+    
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def elapsed(self, name):
+        """
+        段階のこれまでの合計時間（秒）を返す
+        """
+        with self.lock:
+            return self.stages.get(name, 0.0)
+    
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def timed_iter(self, name, iterable):
+        """
+        イテラブルから要素を取り出す時間を段階の時間として計測するジェネレータ
+        （遅延評価されるバッチの生成時間を、書き込みの時間と分けて計測するため）
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+    
+    def merge(self, snapshot):
+        """
+        別のプロセスで集計した snapshot() の結果を加算する（ピークのメモリ使用量は加算しない）
+        """
+        with self.lock:
+            for name, seconds in snapshot['stages'].items():
+                self.stages[name] = self.stages.get(name, 0.0) + seconds
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+    
+    def snapshot(self):
+        """
+        現在の集計結果を辞書で返す
+        """
+        with self.lock:
+            stages = {name: self.stages[name] for name in METRIC_STAGES if name in self.stages}
+            stages.update((name, seconds) for name, seconds in self.stages.items() if name not in stages)
+            return {
+                'stages': stages,
+                'counters': dict(self.counters),
+                'peak_rss_bytes': get_peak_rss(),
+            }
+
+# 実行中の処理のメトリクス（split_twitter_log_by_time の開始時に0に戻す）
+metrics = Metrics()
+
+def format_prometheus_metrics(snapshot, timestamp):
+    """
+    メトリクスをPrometheusのテキスト形式（node_exporter の textfile コレクタ用）に変換する関数
+    
+    値はすべて直近の実行の値のため gauge として出力する。
+    """
+    lines = [
+        f"# HELP {METRICS_PREFIX}_stage_seconds 処理段階ごとの時間（秒）",
+        f"# TYPE {METRICS_PREFIX}_stage_seconds gauge",
+    ]
+    for name, seconds in snapshot['stages'].items():
+        lines.append(f'{METRICS_PREFIX}_stage_seconds{{stage="{name}"}} {seconds:.6f}')
+    for name, value in snapshot['counters'].items():
+        lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+        lines.append(f"{METRICS_PREFIX}_{name} {value}")
+    if snapshot['peak_rss_bytes'] is not None:
+        lines.append(f"# TYPE {METRICS_PREFIX}_peak_rss_bytes gauge")
+        lines.append(f"{METRICS_PREFIX}_peak_rss_bytes {snapshot['peak_rss_bytes']}")
+    lines.append(f"# TYPE {METRICS_PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{METRICS_PREFIX}_last_run_timestamp_seconds {timestamp:.3f}")
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+def write_metrics(metrics_path, snapshot, details=None):
+    """
+    メトリクスをファイルに出力する関数
+    
+    拡張子が .prom の場合はPrometheusのテキスト形式で上書きし（一時ファイルからの置き換えのため、
+    textfile コレクタが書き込み途中の内容を読むことはない）、それ以外の場合は
+    1回の実行を1行のJSONとして追記する（JSON Lines）。
+    
+    Parameters:
+    - metrics_path: 出力ファイルのパス
+    - snapshot: Metrics.snapshot() の結果
+    - details: JSON Lines の行に含める実行条件の辞書
+    """
+    timestamp = time.time()
+    if metrics_path.endswith('.prom'):
+        write_bytes_atomic(metrics_path, format_prometheus_metrics(snapshot, timestamp))
+        return
+    record = {'timestamp': datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='seconds')}
+    record.update(details or {})
+    record.update(snapshot)
+    with open(metrics_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+# --profile=memory で記録するスタックの深さ
+PROFILE_TRACE_FRAMES = 10
+
+# プロファイル結果として表示する上位の件数
+PROFILE_TOP_COUNT = 20
+
+PROFILE_MODES = ['cpu', 'memory']
+
+def run_with_profile(mode, output_path, func, *args, **kwargs):
+    """
+    関数をプロファイラの下で実行し、結果をファイルに保存して上位の項目を表示する関数
+    
+    Parameters:
+    - mode: 'cpu'（cProfile）または 'memory'（tracemalloc）
+    - output_path: 結果の出力先（Noneの場合は twitter-log-splitter.prof または twitter-log-splitter-memory.txt）
+      cpu の結果は pstats 形式（python -m pstats や snakeviz で表示可能）、memory の結果はテキスト
+    - func, args, kwargs: 実行する関数と引数
+    
+    Returns:
+    - 関数の戻り値
+    """
+    if mode == 'cpu':
+        output_path = output_path or 'twitter-log-splitter.prof'
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            profiler.dump_stats(output_path)
+            print(f"プロファイル結果を保存しました: {output_path}")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_TOP_COUNT)
+    elif mode == 'memory':
+        output_path = output_path or 'twitter-log-splitter-memory.txt'
+        tracemalloc.start(PROFILE_TRACE_FRAMES)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            statistics = snapshot.statistics('traceback')
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(f"ピーク時の割り当て: {peak/1024/1024:.1f} MB\n")
+                for stat in statistics:
+                    f.write(f"\n{stat.size/1024:.1f} KB, {stat.count} ブロック\n")
+                    f.write('\n'.join(stat.traceback.format()) + '\n')
+            print(f"メモリプロファイル結果を保存しました: {output_path}")
+            print(f"ピーク時の割り当て: {peak/1024/1024:.1f} MB（終了時に残っている割り当ての上位）")
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP_COUNT]:
+                print(f"  {stat}")
+    else:
+        raise ValueError(f"不明なプロファイルの種類です: {mode}（{', '.join(PROFILE_MODES)} のいずれかを指定してください）")
+
+def detect_encodings(input_file):
+    """
+    試行するエンコーディングのリストを返す関数（chardetで検出したエンコーディングを優先）
+    """
+    encodings = ['utf-8', 'utf-8-sig', 'cp932', 'shift_jis', 'euc_jp', 'iso-2022-jp']
+    
+    # まずchardetでエンコーディングを自動検出
+    if HAS_CHARDET:
+        try:
+            with open(input_file, 'rb') as f_detect:
+                raw_data = f_detect.read(1024*1024)  # 最初の1MBを読み込み
+                result = chardet.detect(raw_data)
+                detected_encoding = result['encoding']
+                confidence = result['confidence']
+                if detected_encoding and confidence > 0.7:
+                    print(f"検出されたエンコーディング: {detected_encoding} (信頼度: {confidence:.2f})")
+                    if detected_encoding.lower() not in [e.lower() for e in encodings]:
+                        encodings.insert(0, detected_encoding)
+        except Exception as e:
+            print(f"エンコーディング自動検出中にエラーが発生しました: {e}")
+    return encodings
+
+def iter_json_array(chunks):
+    """
+    JSON配列（.js形式のTwitterエクスポートを含む）の要素を1つずつ読み込むジェネレータ
+    
+    ファイル全体を文字列にせずチャンク単位で読み進めるため、
+    メモリ使用量はアーカイブ全体ではなく最大の要素のサイズに依存する。
+    
+    Parameters:
+    - chunks: デコード済みの文字列チャンクのイテラブル（iter_decoded_chunks の結果など）
+    
+    Yields:
+    - 配列の各要素
+    
+    Raises:
+    - ValueError: ルートがJSON配列ではない場合
+    - json.JSONDecodeError: JSONとして不正な場合
+    """
+    decoder = json_codec.make_decoder()
+    chunks = iter(chunks)
+    buf = ''
+    eof = False
+    # 配列またはオブジェクトの開始位置まで読み込む
+    while not eof and '[' not in buf and '{' not in buf:
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buf += chunk or ''
+    buf = buf.lstrip('\ufeff')
+    
+    # 変数宣言部分（window.YTD.tweets.part0 = ）を読み飛ばす
+    match = JS_VAR_PATTERN.match(buf)
+    pos = JSON_WHITESPACE.match(buf, match.end() if match else 0).end()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError("入力がJSON配列ではありません")
+    pos += 1
+    expect_value = True  # 次に要素（または空配列の']'）が来るかどうか
+    first = True
+    
+    while True:
+        pos = JSON_WHITESPACE.match(buf, pos).end()
+        need_more = pos >= len(buf)
+        if not need_more:
+            ch = buf[pos]
+            if ch == ']' and (first or not expect_value):
+                return
+            if not expect_value:
+                if ch != ',':
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+                pos += 1
+                expect_value = True
+                continue
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                # バッファ末尾で終わった値（数値など）は途中で切れている可能性がある
+                need_more = end >= len(buf) and not eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                need_more = True
+            if not need_more:
+                yield obj
+                pos = end
+                expect_value = False
+                first = False
+                continue
+        
+        # 追加のデータを読み込む（処理済み部分は破棄）
+        if eof:
+            raise json.JSONDecodeError("Unterminated array", buf, pos)
+        buf = buf[pos:]
+        pos = 0
+        # 巨大な要素の場合は残りのバッファと同じ量以上を読み足し、再パース回数を抑える
+        pending = [buf]
+        added = 0
+        while added <= len(buf):
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+                break
+            pending.append(chunk)
+            added += len(chunk)
+        buf = ''.join(pending)
+
+def iter_tweets(items):
+    """
+    JSON配列の要素からツイートを1件ずつ取り出すジェネレータ
+    
+    最初の要素が {"tweet": {...}} 形式の場合はtweet内のデータを返し、
+    そうでない場合は配列の要素をそのまま返す。
+    """
+    items = iter(items)
+    first_item = next(items, None)
+    if first_item is None:
+        return
+    if isinstance(first_item, dict) and 'tweet' in first_item:
+        # {"tweet": {...}} 形式の場合、tweet内のデータを使用
+        print("Twitterエクスポート形式（{\"tweet\": {...}}）を検出しました")
+        yield first_item['tweet']
+        for item in items:
+            if 'tweet' in item:
+                yield item['tweet']
+    else:
+        yield first_item
+        yield from items
+
+def load_json_data(input_file, encodings):
+    """
+    ファイル全体を読み込んでJSONとしてパースする関数（各エンコーディング・抽出方法を順に試行）
+    """
+    data = None
+    last_error = None
+    raw_content = None
+    
+    # 入力ファイルが.jsファイルかどうかを確認
+    is_js_file = input_file.lower().endswith('.js')
+    
+    # 各エンコーディングを試行
+    for encoding in encodings:
+        try:
+            # ファイルを読み込み
+            with open(input_file, 'r', encoding=encoding) as f:
+                raw_content = f.read()
+                
+                # .jsファイルの場合、JavaScript変数宣言部分を削除
+                if is_js_file:
+                    # JavaScript変数宣言部分を削除（window.YTD.tweets.part0 = ...）
+                    js_var_pattern = r'^\s*window\.YTD\.[^=]+=\s*'
+                    match = re.search(js_var_pattern, raw_content)
+                    if match:
+                        # 変数宣言部分を削除してJSON配列部分を抽出
+                        print("Twitter投稿ログ（JavaScript形式）を処理中...（変数宣言部分を削除）")
+                        json_start = match.end()
+                        # 最初の'['を探す
+                        bracket_pos = raw_content.find('[', json_start)
+                        if bracket_pos != -1:
+                            # '['から始まる部分を抽出
+                            raw_content = raw_content[bracket_pos:].strip()
+                            # 最後の';'を削除
+                            if raw_content.endswith(';'):
+                                raw_content = raw_content[:-1]
+                
+                # JSONとしてパース
+                try:
+                    data = json_codec.loads(raw_content)
+                    print(f"ファイル読み込み完了: {os.path.getsize(input_file)/1024/1024:.2f} MB (エンコーディング: {encoding})")
+                    break  # 成功したらループを抜ける
+                except json.JSONDecodeError as json_err:
+                    last_error = json_err
+                    print(f"{encoding}エンコーディングでJSONデコードエラー: {json_err}")
+        except Exception as e:
+            last_error = e
+            print(f"{encoding}エンコーディングで読み込み失敗: {e}")
+    
+    # すべてのエンコーディングが失敗した場合、バイナリモードで読み込みを試行
+    if data is None and raw_content is not None:
+        # JavaScript形式の場合、別の方法でJSON部分を抽出
+        if is_js_file:
+            try:
+                # ブラケット内を抽出
+                print("別の方法でJavaScript形式のJSON部分を抽出中...")
+                # 最初の'['と最後の']'を探す
+                bracket_start = raw_content.find('[')
+                bracket_end = raw_content.rfind(']')
+                
+                if bracket_start != -1 and bracket_end != -1 and bracket_end > bracket_start:
+                    json_content = raw_content[bracket_start:bracket_end+1]
+                    try:
+                        data = json_codec.loads(json_content)
+                        print("ブラケット内を抽出してJSONとしてパース成功")
+                    except json.JSONDecodeError:
+                        # 別の方法を試す
+                        pass
+            except Exception as e:
+                print(f"別の方法でJSON抽出中にエラーが発生しました: {e}")
+    
+    # それでも失敗した場合、バイナリモードで読み込みを試行
+    if data is None:
+        try:
+            with open(input_file, 'rb') as f_bin:
+                raw_data = f_bin.read()
+                # BOMを確認
+                if raw_data.startswith(b'\xef\xbb\xbf'):  # UTF-8 with BOM
+                    raw_data = raw_data[3:]
+                
+                # .jsファイルの場合、JavaScript変数宣言部分を削除
+                if is_js_file:
+                    # バイナリデータをテキストにデコード
+                    for encoding in ['utf-8', 'cp932', 'shift_jis', 'euc_jp']:
+                        try:
+                            text_data = raw_data.decode(encoding)
+                            # ブラケット内を抽出
+                            bracket_start = text_data.find('[')
+                            bracket_end = text_data.rfind(']')
+                            
+                            if bracket_start != -1 and bracket_end != -1 and bracket_end > bracket_start:
+                                json_content = text_data[bracket_start:bracket_end+1]
+                                try:
+                                    data = json_codec.loads(json_content)
+                                    print(f"バイナリモードで読み込み成功: {encoding}")
+                                    break
+                                except json.JSONDecodeError:
+                                    continue
+                        except UnicodeDecodeError:
+                            continue
+                else:
+                    # 通常のJSONファイルの場合
+                    try:
+                        # 様々なエンコーディングでデコードを試行
+                        for encoding in ['utf-8', 'cp932', 'shift_jis', 'euc_jp']:
+                            try:
+                                decoded_data = raw_data.decode(encoding)
+                                data = json_codec.loads(decoded_data)
+                                print(f"バイナリモードで読み込み成功: {encoding}")
+                                break
+                            except (UnicodeDecodeError, json.JSONDecodeError):
+                                continue
+                    except Exception as e:
+                        last_error = e
+        except Exception as e:
+            last_error = e
+            print(f"バイナリモードでの読み込みに失敗しました: {e}")
+    
+    # それでも失敗した場合、エラーを発生
+    if data is None:
+        raise ValueError(f"ファイルを読み込めませんでした。すべてのエンコーディングが失敗しました。最後のエラー: {last_error}")
+    return data
+
+def extract_tweets(data):
+    """
+    パース済みのJSONデータからツイートの配列を取り出す関数
+    """
+    tweets = []
+    if isinstance(data, list):
+        # データが直接投稿の配列である場合
+        # Twitterエクスポートデータの場合、各要素が {"tweet": {...}} 形式になっている
+        if len(data) > 0 and isinstance(data[0], dict):
+            if 'tweet' in data[0]:
+                # {"tweet": {...}} 形式の場合、tweet内のデータを使用
+                print("Twitterエクスポート形式（{\"tweet\": {...}}）を検出しました")
+                tweets = [item['tweet'] for item in data if 'tweet' in item]
+            else:
+                tweets = data  # 通常の配列形式
+        else:
+            tweets = data
+    elif isinstance(data, dict):
+        # 一般的なTwitterエクスポート形式を検索
+        for key in ['tweet', 'tweets', 'data']:
+            if key in data and isinstance(data[key], list):
+                tweets = data[key]
+                break
+        
+        # さらに深い階層も検索
+        if not tweets and 'data' in data:
+            data_obj = data['data']
+            if isinstance(data_obj, dict):
+                for key in ['tweet', 'tweets']:
+                    if key in data_obj and isinstance(data_obj[key], list):
+                        tweets = data_obj[key]
+                        break
+    return tweets
+
+# 構造のフィンガープリントに含めるネストの深さ
+STRUCTURE_MAX_DEPTH = 8
+
+def structure_signature(obj, depth=0):
+    """
+    キーの構造（キー名とその順序、値の型）を返す関数（リストは先頭の要素のみ）
+    """
+    if depth < STRUCTURE_MAX_DEPTH:
+        if isinstance(obj, dict):
+            return {key: structure_signature(value, depth + 1) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [structure_signature(obj[0], depth + 1)] if obj else []
+    return type(obj).__name__
+
+def schema_fingerprint(first_tweet):
+    """
+    ツイートのキーの構造のフィンガープリント（構造のキャッシュのキー）を返す関数
+    """
+    signature = json.dumps(structure_signature(first_tweet), ensure_ascii=False)
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+# 構造のキャッシュファイルの形式のバージョン
+SCHEMA_CACHE_VERSION = 1
+# キャッシュする構造の最大数（超えた場合は古いものから削除）
+SCHEMA_CACHE_MAX_ENTRIES = 64
+
+def default_schema_cache_path():
+    """
+    構造のキャッシュファイルのデフォルトのパスを返す関数
+    （環境変数 TWITTER_LOG_SPLITTER_CACHE_DIR、XDG_CACHE_HOME、~/.cache の順に使用）
+    """
+    cache_dir = os.environ.get('TWITTER_LOG_SPLITTER_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'twitter-log-splitter'
+    )
+    return os.path.join(cache_dir, 'schema-cache.json')
+
+# 構造のキャッシュファイルのパス（Noneの場合はディスクにキャッシュしない）
+# ライブラリとして使用する場合はメモリ上のみで、コマンドライン（main）では default_schema_cache_path() を使用する
+schema_cache_path = None
+# 実行中に検出・読み込みした構造（フィンガープリント → TweetSchema）
+_schema_memo = {}
+
+def set_schema_cache(path):
+    """
+    構造のキャッシュファイルのパスを設定する関数（Noneの場合はディスクにキャッシュしない）
+    """
+    global schema_cache_path
+    schema_cache_path = path
+
+def load_schema_cache():
+    """
+    キャッシュファイルから {フィンガープリント: 構造の辞書} を読み込む関数（読み込めない場合は空の辞書）
+    """
+    if schema_cache_path is None:
+        return {}
+    try:
+        with open(schema_cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != SCHEMA_CACHE_VERSION or not isinstance(data.get('schemas'), dict):
+        return {}
+    return data['schemas']
+
+def save_schema_cache(fingerprint, schema):
+    """
+    検出した構造をキャッシュファイルに追加する関数（保存できない場合は警告のみ）
+    """
+    if schema_cache_path is None:
+        return
+    schemas = load_schema_cache()
+    schemas.pop(fingerprint, None)
+    schemas[fingerprint] = schema.to_dict()
+    while len(schemas) > SCHEMA_CACHE_MAX_ENTRIES:
+        del schemas[next(iter(schemas))]
+    content = json.dumps({'version': SCHEMA_CACHE_VERSION, 'schemas': schemas}, ensure_ascii=False, indent=1)
+    try:
+        os.makedirs(os.path.dirname(schema_cache_path) or '.', exist_ok=True)
+        write_bytes_atomic(schema_cache_path, content.encode('utf-8'))
+    except OSError as e:
+        print(f"警告: 構造のキャッシュを保存できませんでした: {e}")
+
+def get_tweet_schema(first_tweet):
+    """
+    ツイートの構造を返す関数（同じ構造のツイートで検出済みの場合はキャッシュを使用）
+    
+    構造はキーの構造のフィンガープリントごとに、実行中はメモリ上に、実行をまたいでキャッシュファイルに保存する。
+    複数パートの入力や同じアーカイブの再実行では検出を省略する。キャッシュした構造で
+    先頭のツイートの日時を取り出せない（またはパースできない）場合は検出し直す。
+    
+    Parameters:
+    - first_tweet: 構造の判定に使用するツイート（先頭のツイート）
+    
+    Returns:
+    - TweetSchema
+    """
+    fingerprint = schema_fingerprint(first_tweet)
+    schema = _schema_memo.get(fingerprint)
+    if schema is None:
+        cached = load_schema_cache().get(fingerprint)
+        if cached is not None:
+            try:
+                schema = TweetSchema.from_dict(cached)
+            except (KeyError, TypeError, ValueError):
+                schema = None
+    if schema is None or not schema.matches(first_tweet):
+        schema = detect_tweet_schema(first_tweet)
+        if len(schema.date_path) > 1:
+            print(f"ネストされた日時情報を検出しました: {format_path(schema.date_path)} = {schema.get_date(first_tweet)}")
+        save_schema_cache(fingerprint, schema)
+    _schema_memo[fingerprint] = schema
+    return schema
+
+# 期間の長さの単位（秒）
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+DURATION_PATTERN = re.compile(r'^(\d+)([smhdw])$')
+
+# 暦に基づくグループ化の単位（日付からキーを生成）
+CALENDAR_GROUPS = ['year', 'quarter', 'month', 'week']
+
+# 一定の長さで区切るグループ化の単位
+FIXED_GROUPS = {'day': '1d', 'hour': '1h'}
+
+GROUP_BY_CHOICES = CALENDAR_GROUPS + list(FIXED_GROUPS) + ['all']
+
+def parse_duration(value):
+    """
+    '6h', '30m', '2d' のような期間の長さを秒数に変換する関数（単位: s, m, h, d, w）
+    """
+    match = DURATION_PATTERN.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"期間の長さを認識できません: {value}（例: 6h, 30m, 2d）")
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+def iso_week(days):
+    """
+    1970-01-01からの日数を ISO 8601 の (年, 週番号) に変換する関数（整数演算のみ）
+    """
+    # 1970-01-01 は木曜日。ISO週の年は、その週の木曜日が属する年になる
+    thursday = days - (days + 3) % 7 + 3
+    year = civil_from_days(thursday)[0]
+    return year, (thursday - days_from_civil(year, 1, 1)) // 7 + 1
+
+def calendar_key(days, group_by):
+    """
+    1970-01-01からの日数から暦に基づく期間のキーを生成する関数
+    """
+    if group_by == 'week':
+        year, week = iso_week(days)
+        return f"{year}-W{week:02d}"
+    year, month, _ = civil_from_days(days)
+    if group_by == 'month':
+        return f"{year}-{month:02d}"   # 年月をキーとして使用
+    if group_by == 'quarter':
+        return f"{year}-Q{(month - 1) // 3 + 1}"
+    return str(year)                  # 年をキーとして使用
+
+def duration_key(start_seconds, seconds):
+    """
+    区切りの開始時刻（エポック秒）から期間のキーを生成する関数（期間の長さに応じて日・時・分・秒まで含める）
+    """
+    days, second_of_day = divmod(start_seconds, 86400)
+    year, month, day = civil_from_days(days)
+    key = f"{year}-{month:02d}-{day:02d}"
+    if seconds % 86400 == 0:
+        return key
+    hour, rest = divmod(second_of_day, 3600)
+    if seconds % 3600 == 0:
+        return f"{key}_{hour:02d}"
+    minute, second = divmod(rest, 60)
+    if seconds % 60 == 0:
+        return f"{key}_{hour:02d}{minute:02d}"
+    return f"{key}_{hour:02d}{minute:02d}{second:02d}"
+
+def make_period_key(group_by):
+    """
+    エポックマイクロ秒から期間のキーを生成する関数を返す関数
+    
+    キーはstrftimeを使わず整数演算で求め、文字列として並べると時系列順になる。
+    暦に基づく単位は日ごとにキーをキャッシュし、同じ日のツイートでは再計算しない。
+    
+    Parameters:
+    - group_by: グループ化の単位（'year', 'quarter', 'month', 'week', 'day', 'hour', 'all'、
+      または '6h' のような期間の長さ。期間の長さはUTCの1970-01-01 00:00を起点に区切る）
+    
+    Raises:
+    - ValueError: 不明なグループ化の単位の場合
+    """
+    if group_by == 'all':
+        return lambda epoch: 'all_tweets'  # すべてのツイートを一つのグループに
+    
+    if group_by in CALENDAR_GROUPS:
+        cache = {}
+        
+        def calendar_period_key(epoch):
+            days = epoch // DAY_MICROSECONDS
+            key = cache.get(days)
+            if key is None:
+                key = cache[days] = calendar_key(days, group_by)
+            return key
+        return calendar_period_key
+    
+    seconds = parse_duration(FIXED_GROUPS.get(group_by, group_by))
+    step = seconds * 1000000
+    
+    def duration_period_key(epoch):
+        return duration_key(epoch // step * seconds, seconds)
+    return duration_period_key
+
+def get_period_key(epoch, group_by):
+    """
+    グループ化の単位に応じて期間のキーを生成する関数
+    
+    Parameters:
+    - epoch: エポックマイクロ秒
+    - group_by: グループ化の単位（make_period_key と同じ）
+    """
+    return make_period_key(group_by)(epoch)
+
+def estimate_output_size(tweet, text_only, project=None):
+    """
+    ツイートが出力ファイルに占めるバイト数を見積もる関数（期間をまとめる際に使用）
+    
+    JSONモードはシリアライズ後のバイト数（project を指定した場合は取り出したレコードのバイト数）、
+    テキスト抽出モードは整形前のテキストのバイト数（区切り文字を含む）。
+    """
+    if text_only:
+        tweet_data = tweet['tweet'] if isinstance(tweet.get('tweet'), dict) else tweet
+        text_content = tweet_data.get('full_text') or tweet_data.get('text')
+        return len(text_content.encode('utf-8', 'surrogatepass')) + 1 if text_content else 0
+    if project is not None:
+        tweet = project(tweet)
+    return len(json_codec.dumps(tweet, errors='surrogatepass')) + 1
+
+def merge_small_periods(periods, period_sizes, max_size_bytes):
+    """
+    隣り合う期間を、見積もりサイズの合計がサイズ上限を超えない範囲でまとめる関数
+    
+    Parameters:
+    - periods: 時系列順に並んだ期間のキーのリスト
+    - period_sizes: {期間: 出力サイズの見積もり（バイト）}
+    - max_size_bytes: 各出力ファイルの最大サイズ（バイト）
+    
+    Returns:
+    - (まとめた期間のキー, 元の期間のキーのリスト) のリスト
+      複数の期間をまとめた場合のキーは '<最初の期間>_<最後の期間>'
+    """
+    merged = []
+    group = []
+    group_size = 0
+    for period in periods:
+        size = period_sizes.get(period, 0)
+        if group and group_size + size > max_size_bytes:
+            merged.append(group)
+            group = []
+            group_size = 0
+        group.append(period)
+        group_size += size
+    if group:
+        merged.append(group)
+    return [(group[0] if len(group) == 1 else f"{group[0]}_{group[-1]}", group) for group in merged]
+
+# サイズ上限付きバッチ分割エンジン
+def iter_size_bounded_batches(sized_items, max_size_bytes, empty_size=2, separator_size=1):
+    """
+    要素ごとのバイト数を累積し、サイズ上限を超えない範囲でバッチを生成する関数
+
+    バッチ全体を毎回シリアライズし直すのではなく、要素のバイト数・区切り文字・
+    括弧のバイト数を足し合わせて分割位置を決定する（要素数に対して線形時間）。
+    JSON配列の場合、'[' + ','.join(要素) + ']' のバイト数と一致する。
+
+    Parameters:
+    - sized_items: (要素, バイト数) のタプルのイテラブル
+      バイト数がNoneの要素は出力に現れない要素として扱う（テキストのないツイートなど）
+    - max_size_bytes: 各バッチの最大サイズ（バイト）
+    - empty_size: 空のバッチのサイズ（JSON配列の場合は '[]' の2バイト）
+    - separator_size: 要素間の区切り文字のサイズ（JSON配列の場合は ',' の1バイト）
+
+    Yields:
+    - 要素のリスト（1要素だけでサイズ超過する場合は1要素のみのバッチ）
+    """
+    batch = []
+    batch_size = empty_size
+    has_sized_item = False
+    for item, item_size in sized_items:
+        if item_size is None:
+            new_size = batch_size
+        else:
+            new_size = batch_size + item_size + (separator_size if has_sized_item else 0)
+        if new_size > max_size_bytes and batch:
+            yield batch  # 直前のバッチで出力
+            batch = []
+            has_sized_item = False
+            new_size = empty_size + (item_size or 0)
+        batch.append(item)
+        batch_size = new_size
+        has_sized_item = has_sized_item or item_size is not None
+    if batch:
+        yield batch
+
+def serialize_tweet(tweet):
+    """
+    ツイートをコンパクトなJSON（UTF-8バイト列）にシリアライズする関数
+    
+    このバイト列はサイズ計算とファイルへの書き込みの両方で使用されるため、
+    各ツイートのシリアライズは一度だけになり、サイズ上限は書き込むバイト数に対して正確に適用される。
+    """
+    try:
+        return json_codec.dumps(tweet)
+    except UnicodeEncodeError:
+        # UTF-8でエンコードできない文字（孤立したサロゲートなど）は置換する
+        print("警告: ツイートの書き込み時にUnicodeエンコードエラーが発生しました。一部の文字が置換されています。")
+        return json_codec.dumps(tweet, errors='replace')
+
+class FieldProjector:
+    """
+    ツイートから指定したフィールドだけを取り出した軽量なレコードを作成するクラス（--fields）
+    
+    フィールドは 'id' や 'user.screen_name' のようなドット区切りのパスで、{"tweet": {...}} 形式の場合は
+    内側のデータからたどる（先頭の 'tweet.' は省略できる）。ネストしたフィールドは元と同じ階層で出力し、
+    存在しないフィールドは出力しない。各パスの値を取り出す関数は作成時に一度だけ組み立てる。
+    
+    Parameters:
+    - fields: フィールドのパスのリスト（'id,created_at,full_text' のようなカンマ区切りの文字列も可）
+    """
+    def __init__(self, fields):
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        paths = []
+        for field in fields:
+            path = tuple(key for key in field.strip().split('.') if key)
+            if path[:1] == ('tweet',) and len(path) > 1:
+                path = path[1:]
+            if path and path not in paths:
+                paths.append(path)
+        if not paths:
+            raise ValueError("出力するフィールドが指定されていません")
+        # 親のフィールドを丸ごと出力する場合、その下のパスは不要（親の値を書き換えないため除外する）
+        self.paths = [path for path in paths if not any(path[:len(other)] == other for other in paths if other != path)]
+        self.accessors = [(path, compile_accessor(path)) for path in self.paths]
+    
+    def __reduce__(self):
+        # 値を取り出す関数はワーカープロセスで組み立て直す
+        return (FieldProjector, (['.'.join(path) for path in self.paths],))
+    
+    def __call__(self, tweet):
+        tweet_data = tweet['tweet'] if isinstance(tweet.get('tweet'), dict) else tweet
+        record = {}
+        for path, get_value in self.accessors:
+            try:
+                value = get_value(tweet_data)
+            except (KeyError, IndexError, TypeError):
+                continue
+            target = record
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        return record
+
+def iter_serialized_tweets(tweets, project=None):
+    """
+    ツイートとシリアライズ済みのバイト列の組を返すジェネレータ
+    
+    project を指定した場合は、ツイートの代わりに project(ツイート) のレコードをシリアライズする
+    （組のツイートは元のまま）。
+    """
+    if project is None:
+        for tweet in tweets:
+            yield tweet, serialize_tweet(tweet)
+    else:
+        for tweet in tweets:
+            yield tweet, serialize_tweet(project(tweet))
+
+def join_json_part(batch):
+    """
+    JSONモードのバッチ（(ツイート, シリアライズ済みのバイト列) のリスト）を1つのJSON配列（バイト列）に結合する関数
+    """
+    return b'[' + b','.join(data for _, data in batch) + b']'
+
+def clean_tweet_text(tweet):
+    """
+    ツイートのテキスト部分を抽出して整形する関数
+    
+    Returns:
+    - 整形後のテキスト（テキストがない場合はNone）
+    """
+    tweet_data = tweet
+    if 'tweet' in tweet and isinstance(tweet['tweet'], dict):
+        tweet_data = tweet['tweet']
+    text_content = tweet_data.get('full_text') or tweet_data.get('text')
+    if not text_content:
+        return None
+    text_content = unicodedata.normalize('NFKC', text_content)
+    text_content = text_content.replace('\n', ' ').replace('\r', ' ')
+    text_content = ' '.join(text_content.split())
+    return strip_control_and_emojis(text_content)
+
+def clean_tweet_text_bytes(tweet):
+    """
+    ツイートのテキストを整形し、UTF-8のバイト列で返す関数（テキストがない場合はNone）
+    """
+    text_content = clean_tweet_text(tweet)
+    return None if text_content is None else text_content.encode('utf-8')
+
+def clean_text_chunk(tweets):
+    """
+    ツイートのリストのテキストをまとめて整形・エンコードする関数（ワーカープロセスで実行）
+    """
+    return [clean_tweet_text_bytes(tweet) for tweet in tweets]
+
+# 並列処理時に1つのワーカーへまとめて送るツイート数
+TEXT_CHUNK_SIZE = 1000
+
+def iter_tweet_texts(tweets, executor=None, chunk_size=TEXT_CHUNK_SIZE, workers=1):
+    """
+    ツイートと整形後のテキスト（UTF-8バイト列）の組を入力順に返すジェネレータ
+    
+    各ツイートのテキストは一度だけ整形・エンコードされ、サイズ計算と書き込みの両方で再利用される。
+    executorを指定した場合、ツイートをチャンクに分けてワーカープロセスで整形する。
+    先読みするチャンク数を制限するため、イテレータ入力でも全件をメモリに展開しない。
+    
+    Parameters:
+    - tweets: ツイートのイテラブル
+    - executor: テキスト整形に使用するプロセスプール（Noneの場合は逐次処理）
+    - chunk_size: 1チャンクあたりのツイート数
+    - workers: executor のワーカー数（先読みするチャンクはこの2倍まで）
+    
+    Yields:
+    - (ツイート, 整形後のテキストのバイト列またはNone)
+    """
+    if executor is None:
+        for tweet in tweets:
+            yield tweet, clean_tweet_text_bytes(tweet)
+        return
+    
+    max_pending = max(workers, 1) * 2
+    pending = deque()
+    iterator = iter(tweets)
+    while True:
+        # ワーカー数の2倍までチャンクを先読みして投入
+        while len(pending) < max_pending:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            pending.append((chunk, executor.submit(clean_text_chunk, chunk)))
+        if not pending:
+            return
+        chunk, future = pending.popleft()
+        yield from zip(chunk, future.result())
+
+def iter_text_batches(tweet_texts, max_size_bytes):
+    """
+    テキスト抽出モードでツイートをサイズ上限ごとのバッチに分割する関数
+    
+    出力は b'\\n'.join(テキスト) + b'\\n' となるため、空のバッチは1バイト、
+    テキスト間の区切りは1バイトとしてキャッシュ済みのバイト数を累積する。
+
+    Parameters:
+    - tweet_texts: (ツイート, テキストのバイト列またはNone) のイテラブル
+    - max_size_bytes: 各バッチの最大サイズ（バイト）
+
+    Yields:
+    - (ツイート, テキストのバイト列) のリスト
+    """
+    return iter_size_bounded_batches(
+        (((tweet, data), None if data is None else len(data)) for tweet, data in tweet_texts),
+        max_size_bytes, empty_size=1, separator_size=1
+    )
+
+def join_text_part(batch):
+    """
+    テキスト抽出モードのバッチを1つのファイル内容（バイト列）に結合する関数
+    """
+    return b'\n'.join(data for _, data in batch if data is not None) + b'\n'
+
+def iter_part_contents(period_tweets, max_size_bytes, text_only, executor=None, existing_items=(), compression=None, columnar=None, project=None, workers=1):
+    """
+    1つの期間のツイートをファイルサイズ制限に従って分割し、各パートの内容を順に返すジェネレータ
+    
+    Parameters:
+    - period_tweets: 時系列順に並んだ期間内のツイートのイテラブル
+    - max_size_bytes: 各パートの最大サイズ（バイト）
+    - text_only: Trueの場合、ツイートのテキストのみを抽出
+    - executor: テキスト整形に使用するプロセスプール（Noneの場合は逐次処理）
+    - existing_items: パートの先頭に並べる既存の要素（インクリメンタルモードで追記する最後のパートの内容）
+    - compression: (圧縮形式, 圧縮後のサイズに上限を適用するか) のタプル（Noneの場合は圧縮しない）
+    - columnar: 列指向の形式で出力する ColumnarEncoder（Noneの場合はJSONまたはテキスト）
+      各パートはJSONモードと同じサイズ上限で分割し、1つの行グループとして出力する
+    - project: JSONモードで各ツイートの代わりに出力するレコードを作成する FieldProjector（Noneの場合はツイート全体）
+      サイズ上限は取り出したレコードのバイト数に適用する
+    - workers: executor のワーカー数
+    
+    Yields:
+    - (パートの要素のリスト, パートの内容のバイト列)
+      要素はJSONモードでは (ツイート, シリアライズ済みのバイト列)、テキスト抽出モードでは (ツイート, 整形済みの行)
+    """
+    compression_format, compressed_limit = compression or (None, False)
+    if text_only:
+        tweet_texts = iter_tweet_texts(period_tweets, executor, workers=workers)
+        if existing_items:
+            # 既存のパートの行は整形済みのため、そのまま先頭に並べる
+            tweet_texts = itertools.chain(((None, data) for data in existing_items), tweet_texts)
+        if compressed_limit:
+            # 圧縮後のサイズで分割位置を決定（圧縮済みの内容をそのまま書き込む）
+            batches = iter_compressed_batches(tweet_texts, max_size_bytes, compression_format, b'', b'\n', b'\n')
+        else:
+            batches = iter_text_batches(tweet_texts, max_size_bytes)
+    else:
+        # JSONモード: 各ツイートを一度だけシリアライズし、累積バイト数で分割位置を決定
+        serialized_tweets = iter_serialized_tweets(itertools.chain(existing_items, period_tweets), project)
+        if compressed_limit:
+            batches = iter_compressed_batches(serialized_tweets, max_size_bytes, compression_format, b'[', b',', b']')
+        else:
+            batches = iter_size_bounded_batches(
+                (((tweet, data), len(data)) for tweet, data in serialized_tweets),
+                max_size_bytes
+            )
+    # バッチの生成（シリアライズ・テキスト整形・圧縮後のサイズでの分割を含む）の時間を計測
+    for current_batch in metrics.timed_iter('batch', batches):
+        if compressed_limit:
+            current_batch, content = current_batch
+        elif columnar is not None:
+            with metrics.stage('encode'):
+                content = columnar.encode([tweet for tweet, _ in current_batch])
+        else:
+            # シリアライズ済みのバイト列を結合してそのまま書き込む
+            with metrics.stage('encode'):
+                content = join_text_part(current_batch) if text_only else join_json_part(current_batch)
+                if compression_format is not None:
+                    content = compress_bytes(content, compression_format)
+        yield current_batch, content
+
+def record_written_part(manifest, period, part_number, file_name, batch, size, get_epoch=None):
+    """
+    書き込みに成功したパートをメトリクスとマニフェストに記録する関数
+    
+    マニフェストには期間のパートを記録し、パートのツイートのIDと最新の日時を処理済みとして追加する。
+    書き込みに失敗したパートのツイートは処理済みにならないため、次回の実行で書き直される。
+    同じ期間の前のパートの書き込みに失敗していた場合は、パート番号が連続しないため記録しない。
+    
+    Parameters:
+    - manifest: インクリメンタルモードのマニフェスト（Noneの場合はメトリクスのみ記録）
+    - period: 期間のキー
+    - part_number: 期間内のパート番号（1から）
+    - file_name: パートのファイル名
+    - batch: パートに書き込んだ (ツイート, バイト列) のリスト（既存のパートのテキストの行はツイートがNone）
+    - size: 書き込んだバイト数
+    - get_epoch: ツイートの日時をエポックマイクロ秒で返す関数（マニフェストの最新の日時に使用）
+    """
+    metrics.count('files_written')
+    metrics.count('bytes_out', size)
+    metrics.count('tweets_written', len(batch))
+    if manifest is None:
+        return
+    parts = manifest['periods'][period]
+    if len(parts) < part_number - 1:
+        return
+    # 追記のために読み込んだ最後のパートは、書き込んだパートで置き換える
+    del parts[part_number - 1:]
+    parts.append({'file': file_name, 'size': size, 'tweets': len(batch)})
+    for tweet, _ in batch:
+        if tweet is None:
+            continue
+        tweet_id = get_tweet_id(tweet)
+        if tweet_id is not None:
+            manifest['tweet_ids'].add(tweet_id)
+        try:
+            epoch = get_epoch(tweet)
+        except Exception:
+            continue
+        if epoch is not None and (manifest['max_timestamp'] is None or epoch > manifest['max_timestamp']):
+            manifest['max_timestamp'] = epoch
+
+def write_period_parts(period, period_tweets, tweet_count, output_dir, max_size_bytes, text_only, executor=None, manifest=None, writer=None, index=None, compression=None, columnar=None, project=None, workers=1):
+    """
+    1つの期間のツイートをファイルサイズ制限に従って分割して書き込む関数
+    
+    Parameters:
+    - period: 期間のキー（ファイル名の接頭辞）
+    - period_tweets: 時系列順に並んだ期間内のツイートのイテラブル
+    - tweet_count: 期間内のツイート数（進捗表示用）
+    - output_dir: 出力ディレクトリのパス
+    - max_size_bytes: 各出力ファイルの最大サイズ（バイト）
+    - text_only: Trueの場合、ツイートのテキストのみを抽出
+    - executor: テキスト整形に使用するプロセスプール（Noneの場合は逐次処理）
+    - manifest: インクリメンタルモードのマニフェスト
+      指定した場合、期間の最後のパートの内容に続けて追記し、書き込んだパートをマニフェストに記録する
+    - writer: ファイル書き込みに使用する PartWriter（Noneの場合は同期書き込み）
+    - index: 書き込んだツイートを登録する TweetIndexBuilder（Noneの場合はインデックスを作成しない）
+    - compression: (圧縮形式, 圧縮後のサイズに上限を適用するか) のタプル（Noneの場合は圧縮しない）
+    - columnar: 列指向の形式で出力する ColumnarEncoder（Noneの場合はJSONまたはテキスト）
+    - project: 出力するフィールドを取り出す FieldProjector（Noneの場合はツイート全体）
+    - workers: executor のワーカー数
+    
+    Returns:
+    - 作成（または更新）したファイル数
+    """
+    compression_format = compression[0] if compression else None
+    extension = '.txt' + COMPRESSION_EXTENSIONS.get(compression_format, '')
+    if columnar is not None:
+        extension = columnar.extension
+    file_count_in_period = 1
+    parts = None
+    existing_items = []
+    get_epoch = None
+    if manifest is not None:
+        parts = manifest['periods'].setdefault(period, [])
+        existing_items = reopen_last_part(parts, output_dir, text_only)
+        # 最後のパートに追記する場合は同じパート番号で書き直す
+        file_count_in_period = len(parts) + 1 if existing_items is None else len(parts)
+        existing_items = existing_items or []
+        get_epoch = make_epoch_getter(manifest['options'].get('time_format'))
+    with tqdm(total=tweet_count + len(existing_items), desc=f"{period} ツイート分割", unit="tweet") as pbar:
+        for current_batch, content in iter_part_contents(period_tweets, max_size_bytes, text_only, executor, existing_items, compression, columnar, project, workers):
+            output_filename = f"{period}_part_{file_count_in_period}{extension}"
+            if parts is None:
+                output_path = get_unique_filename(os.path.join(output_dir, output_filename))
+            else:
+                # マニフェストで管理しているパートは同じファイル名で上書きする
+                output_path = os.path.join(output_dir, output_filename)
+            if writer is not None:
+                # エンコード済みのバッファをキューに渡し、書き込みの完了を待たずに次のパートへ進む
+                # （マニフェストへの記録は書き込みが成功した後に行う）
+                writer.submit(output_path, content, is_text=text_only,
+                              on_written=partial(record_written_part, manifest, period, file_count_in_period, output_filename, current_batch, get_epoch=get_epoch))
+            else:
+                with metrics.stage('write'):
+                    write_success = write_to_file(output_path, content, is_text=text_only)
+                if write_success:
+                    record_written_part(manifest, period, file_count_in_period, output_filename, current_batch, os.path.getsize(output_path), get_epoch)
+                else:
+                    print(f"警告: {output_path} への書き込みに失敗しました")
+                    metrics.count('write_failures')
+            if index is not None:
+                index.add_part(os.path.basename(output_path), current_batch, text_only)
+            file_count_in_period += 1
+            pbar.update(len(current_batch))
+    return file_count_in_period - 1
+
+def split_period_in_worker(period, period_tweets, tweet_count, output_dir, max_size_bytes, text_only, manifest=None, index_time_format=None, build_index=False, compression=None, columnar=None, project=None):
+    """
+    ワーカープロセスで1つの期間を分割・シリアライズして書き込む関数（write_periods_in_parallel から呼び出す）
+    
+    Parameters:
+    - manifest: インクリメンタルモードでのこの期間のマニフェスト（make_period_manifest の結果、Noneの場合は使用しない）
+    - index_time_format: インデックスに記録する日時のフォーマット
+    - build_index: Trueの場合、書き込んだツイートのインデックスを作成して返す
+    - その他: write_period_parts と同じ
+    
+    Returns:
+    - (作成したファイル数, 書き込みを記録した期間のマニフェスト（使用しない場合はNone）,
+       期間の TweetIndexBuilder（作成しない場合はNone）, ワーカー内のメトリクス)
+    """
+    metrics.reset()
+    index = TweetIndexBuilder(index_time_format) if build_index else None
+    file_count = write_period_parts(period, period_tweets, tweet_count, output_dir, max_size_bytes, text_only, None, manifest, None, index, compression, columnar, project)
+    return file_count, manifest, index, metrics.snapshot()
+
+def make_period_manifest(manifest, period):
+    """
+    ワーカープロセスに送る、1つの期間のパートのみを含むマニフェストを作成する関数
+    
+    書き込んだツイートのIDと最新の日時は空の状態から記録し、merge_period_manifest で元のマニフェストに反映する。
+    """
+    return {'options': manifest['options'], 'max_timestamp': None, 'tweet_ids': set(),
+            'periods': {period: manifest['periods'].get(period, [])}}
+
+def merge_period_manifest(manifest, period, period_manifest):
+    """
+    ワーカープロセスで書き込みを記録した期間のマニフェストを元のマニフェストに反映する関数
+    """
+    manifest['periods'][period] = period_manifest['periods'][period]
+    manifest['tweet_ids'].update(period_manifest['tweet_ids'])
+    epoch = period_manifest['max_timestamp']
+    if epoch is not None and (manifest['max_timestamp'] is None or epoch > manifest['max_timestamp']):
+        manifest['max_timestamp'] = epoch
+
+def write_periods_in_parallel(executor, workers, period_jobs, output_dir, max_size_bytes, text_only, manifest=None, index=None, compression=None, columnar=None, project=None):
+    """
+    期間ごとの分割・シリアライズ・書き込みをプロセスプールで並列に行う関数
+    
+    期間は互いに独立しており、パート番号も期間ごとに1から振るため、期間単位でワーカープロセスに送る。
+    結果は送った順（期間順）に受け取ってマニフェスト・インデックス・メトリクスに反映するため、
+    ファイル名と作成したファイル数は逐次処理の場合と同じになる。
+    ワーカーに送ったツイートを保持しすぎないよう、同時に処理する期間はワーカー数の2倍までとする。
+    
+    Parameters:
+    - executor: 期間の処理に使用するプロセスプール
+    - workers: プロセスプールのワーカー数
+    - period_jobs: (期間のキー, 期間内のツイート, ツイート数) のイテラブル（期間順）
+      ツイートはワーカープロセスに送るため、リストまたは MergedRunSource とする
+    - その他: write_period_parts と同じ
+    
+    Returns:
+    - 作成（または更新）したファイル数
+    """
+    file_count = 0
+    pending = deque()
+    
+    def collect():
+        nonlocal file_count
+        period, future = pending.popleft()
+        count, period_manifest, period_index, snapshot = future.result()
+        file_count += count
+        if manifest is not None:
+            merge_period_manifest(manifest, period, period_manifest)
+        if index is not None:
+            index.merge(period_index)
+        metrics.merge(snapshot)
+    
+    for period, period_tweets, tweet_count in period_jobs:
+        print(f"期間 {period} の処理中... ({tweet_count} ツイート)")
+        period_manifest = make_period_manifest(manifest, period) if manifest is not None else None
+        index_time_format = index.time_format if index is not None else None
+        future = executor.submit(split_period_in_worker, period, period_tweets, tweet_count, output_dir, max_size_bytes, text_only,
+                                 period_manifest, index_time_format, index is not None, compression, columnar, project)
+        pending.append((period, future))
+        if len(pending) >= workers * 2:
+            collect()
+    while pending:
+        collect()
+    return file_count
+
+# インクリメンタルモードのマニフェストのファイル名（出力ディレクトリに保存）
+MANIFEST_FILENAME = '.twitter-log-splitter-manifest.json'
+
+MANIFEST_VERSION = 1
+
+def load_manifest(output_dir, options):
+    """
+    出力ディレクトリのマニフェストを読み込む関数（存在しない場合は空のマニフェストを返す）
+    
+    マニフェストには処理済みのツイートID、最新の日時（エポックマイクロ秒）、
+    期間ごとのパートファイルとそのバイト数が記録される。
+    
+    Parameters:
+    - output_dir: 出力ディレクトリのパス
+    - options: 出力内容に影響するオプションの辞書（前回と異なる場合はエラー）
+    
+    Returns:
+    - マニフェストの辞書（tweet_ids はセット）
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        print("マニフェストが見つからないため、新規に作成します")
+        return {'version': MANIFEST_VERSION, 'options': options, 'max_timestamp': None, 'tweet_ids': set(), 'periods': {}}
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"対応していないマニフェストのバージョンです: {manifest.get('version')}")
+    if manifest['options'] != options:
+        raise ValueError(f"前回の出力とオプションが異なります（前回: {manifest['options']}, 今回: {options}）")
+    manifest['tweet_ids'] = set(manifest['tweet_ids'])
+    print(f"マニフェストを読み込みました: 処理済み {len(manifest['tweet_ids'])} ツイート")
+    return manifest
+
+def save_manifest(output_dir, manifest):
+    """
+    マニフェストを出力ディレクトリに保存する関数（一時ファイルに書き込んでから置き換える）
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(manifest, tweet_ids=sorted(manifest['tweet_ids'])), f, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+
+def get_tweet_id(tweet):
+    """
+    ツイートのIDを文字列で返す関数（IDがない場合はNone）
+    """
+    if 'tweet' in tweet and isinstance(tweet['tweet'], dict):
+        tweet = tweet['tweet']
+    tweet_id = tweet.get('id_str') or tweet.get('id')
+    return None if tweet_id is None else str(tweet_id)
+
+def make_new_tweet_filter(manifest):
+    """
+    マニフェストに記録されていない新しいツイートかどうかを判定する関数を返す
+    
+    同じ入力内の重複も除外する。新しいツイートのIDと日時は、そのツイートを含むパートの
+    書き込みが成功した時点でマニフェストに追加する（record_written_part）。
+    IDのないツイートは、前回の最新日時より新しい場合のみ新しいツイートとして扱う。
+    """
+    seen_ids = manifest['tweet_ids']
+    previous_max = manifest['max_timestamp']
+    new_ids = set()
+    
+    def is_new_tweet(tweet, epoch):
+        tweet_id = get_tweet_id(tweet)
+        if tweet_id is None:
+            return previous_max is None or (epoch is not None and epoch > previous_max)
+        if tweet_id in seen_ids or tweet_id in new_ids:
+            return False
+        new_ids.add(tweet_id)
+        return True
+    return is_new_tweet
+
+# TweetIdSet のハッシュ表の初期の大きさ（要素数、2の累乗）
+TWEET_ID_SET_INITIAL_CAPACITY = 1 << 16
+
+# フィボナッチハッシュの乗数（2^64 / 黄金比）
+FIBONACCI_MULTIPLIER = 0x9E3779B97F4A7C15
+
+class TweetIdSet:
+    """
+    ツイートIDの集合をコンパクトに保持するクラス（重複の除外に使用）
+    
+    数値のIDは int64 の型付き配列を使ったオープンアドレス法のハッシュ表に保持するため、
+    IDの文字列をセットに保持する場合（1件あたり100バイト程度）と比べて1件あたり16〜24バイトで済む。
+    数値でないID（と 0、int64 の範囲外のID）は文字列のままセットに保持する。
+    """
+    def __init__(self, capacity=TWEET_ID_SET_INITIAL_CAPACITY):
+        # 0 を空きスロットとして使用する
+        self.slots = array('q', bytes(8 * capacity))
+        self.mask = capacity - 1
+        self.shift = 64 - (capacity.bit_length() - 1)
+        self.count = 0
+        self.other_ids = set()
+    
+    def __len__(self):
+        return self.count + len(self.other_ids)
+    
+    def add(self, tweet_id):
+        """
+        IDを追加し、新しいIDの場合はTrue、既に追加済みの場合はFalseを返す
+        
+        Parameters:
+        - tweet_id: ツイートIDの文字列（get_tweet_id の結果）
+        """
+        if not (tweet_id.isascii() and tweet_id.isdigit() and len(tweet_id) <= 19) or not 0 < int(tweet_id) <= INT64_MAX:
+            if tweet_id in self.other_ids:
+                return False
+            self.other_ids.add(tweet_id)
+            return True
+        return self.add_number(int(tweet_id))
+    
+    def add_number(self, number):
+        """
+        数値のID（1以上 int64 の範囲）を追加し、新しいIDの場合はTrueを返す
+        """
+        slots = self.slots
+        mask = self.mask
+        position = ((number * FIBONACCI_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.shift
+        value = slots[position]
+        while value:
+            if value == number:
+                return False
+            position = (position + 1) & mask
+            value = slots[position]
+        slots[position] = number
+        self.count += 1
+        # 使用率が2/3を超えたら倍の大きさのハッシュ表に入れ直す
+        if self.count * 3 > len(slots) * 2:
+            self.resize(len(slots) * 2)
+        return True
+    
+    def resize(self, capacity):
+        old_slots = self.slots
+        self.slots = array('q', bytes(8 * capacity))
+        self.mask = capacity - 1
+        self.shift = 64 - (capacity.bit_length() - 1)
+        self.count = 0
+        for number in old_slots:
+            if number:
+                self.add_number(number)
+
+# リプライであることを示すフィールド（いずれかに値があればリプライとする）
+REPLY_KEYS = ['in_reply_to_status_id_str', 'in_reply_to_status_id', 'in_reply_to_user_id_str', 'in_reply_to_user_id']
+
+def is_retweet(tweet):
+    """
+    リツイートかどうかを返す関数（retweeted_status があるか、本文が 'RT @' で始まる場合）
+    """
+    tweet_data = tweet['tweet'] if isinstance(tweet.get('tweet'), dict) else tweet
+    if tweet_data.get('retweeted_status'):
+        return True
+    text = tweet_data.get('full_text') or tweet_data.get('text')
+    return isinstance(text, str) and text.startswith('RT @')
+
+def is_reply(tweet):
+    """
+    リプライかどうかを返す関数
+    """
+    tweet_data = tweet['tweet'] if isinstance(tweet.get('tweet'), dict) else tweet
+    return any(tweet_data.get(key) for key in REPLY_KEYS)
+
+class TweetFilter:
+    """
+    読み込み中のツイートを条件で除外するフィルタ
+    
+    (ツイート, エポック値) を受け取り、処理対象ならTrueを返す。日時をパースした直後、
+    ソートやランファイルへの書き出しの前に適用するため、除外したツイートは保持もソートもされない。
+    条件は軽いものから順に判定し、条件ごとの除外数を記録する。
+    
+    Parameters:
+    - exclude_retweets: Trueの場合、リツイートを除外
+    - exclude_replies: Trueの場合、リプライを除外
+    - since: この日時（エポックマイクロ秒）より前のツイートを除外（Noneの場合は制限なし）
+    - until: この日時（エポックマイクロ秒）以降のツイートを除外（Noneの場合は制限なし）
+    - dedup: Trueの場合、同じIDのツイートは最初の1件のみを残す
+    """
+    def __init__(self, exclude_retweets=False, exclude_replies=False, since=None, until=None, dedup=False):
+        self.checks = []
+        if since is not None or until is not None:
+            self.checks.append(('期間外', lambda tweet, epoch: epoch is not None and (
+                (since is not None and epoch < since) or (until is not None and epoch >= until))))
+        if exclude_retweets:
+            self.checks.append(('リツイート', lambda tweet, epoch: is_retweet(tweet)))
+        if exclude_replies:
+            self.checks.append(('リプライ', lambda tweet, epoch: is_reply(tweet)))
+        if dedup:
+            self.seen_ids = TweetIdSet()
+            self.checks.append(('重複', self.is_duplicate))
+        self.dropped = {name: 0 for name, _ in self.checks}
+    
+    def __bool__(self):
+        return bool(self.checks)
+    
+    def __call__(self, tweet, epoch):
+        for name, check in self.checks:
+            if check(tweet, epoch):
+                self.dropped[name] += 1
+                return False
+        return True
+    
+    def is_duplicate(self, tweet, epoch):
+        tweet_id = get_tweet_id(tweet)
+        return tweet_id is not None and not self.seen_ids.add(tweet_id)
+    
+    def report(self):
+        """
+        条件ごとの除外数を表示し、メトリクスに記録する
+        """
+        total = sum(self.dropped.values())
+        metrics.count('tweets_filtered', total)
+        details = ', '.join(f"{name}: {count}" for name, count in self.dropped.items())
+        print(f"フィルタで除外: {total} ツイート ({details})")
+
+def reopen_last_part(parts, output_dir, text_only):
+    """
+    期間の最後のパートを追記できるように読み込む関数
+    
+    マニフェストの記録は、追記したパートの書き込みが成功した時点で置き換える（record_written_part）。
+    ファイルが存在しないか、サイズがマニフェストと異なる（手動で変更された）場合は
+    既存のパートを変更せず、新しいパートから書き込む。
+    
+    Returns:
+    - 最後のパートの要素のリスト（JSONモードはツイート、テキストモードは各行のバイト列）
+      追記できるパートがない場合はNone
+    """
+    if not parts:
+        return None
+    last_part = parts[-1]
+    part_path = os.path.join(output_dir, last_part['file'])
+    if not os.path.exists(part_path) or os.path.getsize(part_path) != last_part['size']:
+        print(f"警告: {part_path} がマニフェストの記録と一致しないため、新しいパートに書き込みます")
+        return None
+    content = read_part_file(part_path)
+    if text_only:
+        # テキストは b'\n'.join(行) + b'\n' の形式で書き込まれている
+        return content[:-1].split(b'\n') if len(content) > 1 else []
+    return json_codec.loads(content)
+
+# インデックスファイルのファイル名（出力ディレクトリに保存）
+INDEX_FILENAME = 'tweet_index.idx'
+
+INDEX_MAGIC = b'TLSIDX01'
+
+# インデックスのレコード: エポックマイクロ秒, ツイートID, パートファイル番号, バイトオフセット, バイト数
+INDEX_RECORD = struct.Struct('<qQIQI')
+
+# IDによる検索用の並び順（日時順のレコード番号）
+INDEX_POSITION = struct.Struct('<I')
+
+def make_epoch_getter(time_format=None):
+    """
+    ツイートの日時をエポックマイクロ秒で返す関数を生成する関数（日時のパスは最初のツイートで特定）
+    """
+    get_value = parse = None
+    
+    def get_epoch(tweet):
+        nonlocal get_value, parse
+        if get_value is None:
+            schema = get_tweet_schema(tweet)
+            get_value = schema.get_date
+            parse = make_date_parser(time_format or schema.time_format)
+        return parse(get_value(tweet))
+    
+    return get_epoch
+
+def tweet_id_number(tweet):
+    """
+    インデックスに記録するツイートIDを整数で返す関数（数値のIDがない場合は0）
+    """
+    tweet_id = get_tweet_id(tweet)
+    if tweet_id is None or not tweet_id.isdigit() or len(tweet_id) > 20:
+        return 0
+    number = int(tweet_id)
+    return number if number < 2 ** 64 else 0
+
+class TweetIndexBuilder:
+    """
+    書き込んだパートからツイートのインデックスを作成するクラス
+    
+    パートを書き込むたびに各ツイートの (日時, ID, パートファイル番号, バイトオフセット, バイト数) を記録し、
+    最後に日時順に並べたレコードとID順の並び順をインデックスファイルに書き込む。
+    レコードは型付き配列で保持するため、1ツイートあたり32バイト程度のメモリで済む。
+    """
+    def __init__(self, time_format=None):
+        self.time_format = time_format
+        self.get_epoch = make_epoch_getter(time_format)
+        self.files = []
+        self.epochs = array('q')
+        self.ids = array('Q')
+        self.file_numbers = array('I')
+        self.offsets = array('Q')
+        self.lengths = array('I')
+    
+    def add_part(self, file_name, batch, text_only):
+        """
+        1つのパートのツイートを登録する
+        
+        Parameters:
+        - file_name: パートのファイル名
+        - batch: パートに書き込んだ (ツイート, バイト列) のリスト
+        - text_only: Trueの場合はテキスト（改行区切り）、Falseの場合はJSON配列として書き込まれている
+        """
+        file_number = len(self.files)
+        self.files.append(file_name)
+        # JSON配列は '[' の後に ',' 区切り、テキストは改行区切りで書き込まれている
+        offset = 0 if text_only else 1
+        for tweet, data in batch:
+            if data is None:
+                continue  # テキストのないツイートは出力に含まれない
+            self.epochs.append(self.get_epoch(tweet))
+            self.ids.append(tweet_id_number(tweet))
+            self.file_numbers.append(file_number)
+            self.offsets.append(offset)
+            self.lengths.append(len(data))
+            offset += len(data) + 1
+    
+    def merge(self, other):
+        """
+        別の TweetIndexBuilder（ワーカープロセスで作成したもの）のパートとレコードを後ろに追加する
+        """
+        file_offset = len(self.files)
+        self.files.extend(other.files)
+        self.epochs.extend(other.epochs)
+        self.ids.extend(other.ids)
+        self.file_numbers.extend(array('I', (number + file_offset for number in other.file_numbers)))
+        self.offsets.extend(other.offsets)
+        self.lengths.extend(other.lengths)
+    
+    def __getstate__(self):
+        # 日時を求める関数はクロージャのため pickle できない（ワーカープロセスとの受け渡し用）
+        state = self.__dict__.copy()
+        del state['get_epoch']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.get_epoch = make_epoch_getter(self.time_format)
+    
+    def write(self, output_dir):
+        """
+        インデックスファイルを出力ディレクトリに書き込む
+        """
+        count = len(self.epochs)
+        # 期間ごとに時系列順で書き込むため通常は既に日時順だが、そうでない場合は並べ替える
+        order = range(count)
+        if any(self.epochs[i] > self.epochs[i + 1] for i in range(count - 1)):
+            order = sorted(order, key=self.epochs.__getitem__)
+        records = bytearray()
+        for i in order:
+            records += INDEX_RECORD.pack(self.epochs[i], self.ids[i], self.file_numbers[i], self.offsets[i], self.lengths[i])
+        # ID順の並び順（日時順のレコード番号）
+        ids = [self.ids[i] for i in order]
+        id_order = array('I', sorted(range(count), key=ids.__getitem__))
+        if sys.byteorder != 'little':
+            id_order.byteswap()
+        
+        header = json.dumps({'version': 1, 'count': count, 'files': self.files}, ensure_ascii=False).encode('utf-8')
+        content = INDEX_MAGIC + struct.pack('<I', len(header)) + header + bytes(records) + id_order.tobytes()
+        index_path = os.path.join(output_dir, INDEX_FILENAME)
+        write_bytes_atomic(index_path, content)
+        print(f"インデックスを作成しました: {index_path} ({count} ツイート)")
+
+class KeyedSequence:
+    """
+    位置からキーを求める関数をシーケンスとして扱い、bisect で二分探索できるようにするクラス
+    """
+    def __init__(self, length, key_at):
+        self.length = length
+        self.key_at = key_at
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, position):
+        return self.key_at(position)
+
+class TweetIndex:
+    """
+    インデックスファイルを読み込み、日時の範囲やツイートIDで二分探索するクラス
+    
+    インデックスファイルはメモリマップで参照し、探索で比較するレコードだけを読み込む。
+    """
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        index_path = os.path.join(output_dir, INDEX_FILENAME)
+        with open(index_path, 'rb') as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buf[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.buf.close()
+            raise ValueError(f"インデックスファイルの形式が正しくありません: {index_path}")
+        header_size, = struct.unpack_from('<I', self.buf, len(INDEX_MAGIC))
+        header_start = len(INDEX_MAGIC) + 4
+        header = json.loads(self.buf[header_start:header_start + header_size].decode('utf-8'))
+        self.files = header['files']
+        self.count = header['count']
+        self.records_start = header_start + header_size
+        self.id_order_start = self.records_start + self.count * INDEX_RECORD.size
+    
+    def close(self):
+        self.buf.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def record(self, position):
+        """
+        日時順で position 番目のレコード (エポック, ID, ファイル番号, オフセット, バイト数) を返す
+        """
+        return INDEX_RECORD.unpack_from(self.buf, self.records_start + position * INDEX_RECORD.size)
+    
+    def id_position(self, id_rank):
+        """
+        ID順で id_rank 番目のレコードの、日時順での位置を返す
+        """
+        return INDEX_POSITION.unpack_from(self.buf, self.id_order_start + id_rank * INDEX_POSITION.size)[0]
+    
+    def find_range(self, since=None, until=None):
+        """
+        since 以上 until 未満の日時のレコードを日時順に返す（Noneの場合は制限なし）
+        """
+        epochs = KeyedSequence(self.count, lambda position: self.record(position)[0])
+        start = bisect.bisect_left(epochs, since) if since is not None else 0
+        end = bisect.bisect_left(epochs, until) if until is not None else self.count
+        return [self.record(position) for position in range(start, end)]
+    
+    def find_id(self, tweet_id):
+        """
+        指定したIDのレコードを返す（同じIDが複数ある場合はすべて）
+        """
+        ids = KeyedSequence(self.count, lambda id_rank: self.record(self.id_position(id_rank))[1])
+        id_rank = bisect.bisect_left(ids, tweet_id)
+        records = []
+        while id_rank < self.count and ids[id_rank] == tweet_id:
+            records.append(self.record(self.id_position(id_rank)))
+            id_rank += 1
+        return records
+    
+    def iter_contents(self, records):
+        """
+        レコードが指すバイト範囲だけをパートファイルから読み込んで返すジェネレータ
+        """
+        handles = {}
+        try:
+            for _, _, file_number, offset, length in records:
+                f = handles.get(file_number)
+                if f is None:
+                    f = handles[file_number] = open(os.path.join(self.output_dir, self.files[file_number]), 'rb')
+                f.seek(offset)
+                yield f.read(length)
+        finally:
+            for f in handles.values():
+                f.close()
+
+def parse_query_time(value):
+    """
+    検索条件の日時（'YYYY-MM-DD' または日時の各形式）をエポックマイクロ秒に変換する関数
+    """
+    try:
+        return datetime_to_epoch(datetime.strptime(value, '%Y-%m-%d'))
+    except ValueError:
+        return make_date_parser()(value)
+
+def query_index(output_dir, since=None, until=None, tweet_id=None):
+    """
+    インデックスを使って出力ディレクトリからツイートを検索する関数
+    
+    Parameters:
+    - output_dir: 分割結果（とインデックスファイル）のディレクトリ
+    - since: この日時以降（エポックマイクロ秒、含む）
+    - until: この日時より前（エポックマイクロ秒、含まない）
+    - tweet_id: ツイートID（指定した場合は日時の条件と組み合わせて絞り込む）
+    
+    Yields:
+    - 一致したツイートのバイト列（JSONモードはJSON、テキストモードは整形済みテキスト）
+    """
+    with TweetIndex(output_dir) as index:
+        if tweet_id is not None:
+            records = [record for record in index.find_id(tweet_id)
+                       if (since is None or record[0] >= since) and (until is None or record[0] < until)]
+        else:
+            records = index.find_range(since, until)
+        yield from index.iter_contents(records)
+
+# 列指向の出力形式ごとの拡張子
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+OUTPUT_FORMATS = ['json'] + list(COLUMNAR_FORMATS)
+
+# 列指向の出力で先頭に置く列（ツイートから求めるため、同名のフィールドは出力しない）
+COLUMNAR_KEY_COLUMNS = ['id', 'created_at', 'text']
+
+# 列指向の出力で扱える整数の範囲（int64）
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+def flatten_fields(data, prefix='', fields=None):
+    """
+    ネストした辞書を '親.子' の形式のキーを持つ1階層の辞書に展開する関数（リストはそのまま値とする）
+    """
+    if fields is None:
+        fields = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flatten_fields(value, f"{name}.", fields)
+        else:
+            fields[name] = value
+    return fields
+
+def string_array(values):
+    """
+    文字列の列を作成する関数（UTF-8にエンコードできない文字（孤立したサロゲートなど）は置換する）
+    """
+    try:
+        return pyarrow.array(values, pyarrow.string())
+    except UnicodeEncodeError:
+        return pyarrow.array([value if value is None else value.encode('utf-8', 'replace').decode('utf-8')
+                              for value in values], pyarrow.string())
+
+def column_array(values):
+    """
+    値のリストから列を作成する関数
+    
+    すべての値が同じ型（真偽値・int64の範囲の整数・数値・文字列）の場合はその型の列とし、
+    型が混在する場合やリスト・辞書を含む場合は、各値をJSON文字列にした文字列の列とする。
+    """
+    kinds = {type(value) for value in values if value is not None}
+    if kinds == {bool}:
+        return pyarrow.array(values, pyarrow.bool_())
+    if kinds == {int} and all(value is None or INT64_MIN <= value <= INT64_MAX for value in values):
+        return pyarrow.array(values, pyarrow.int64())
+    if kinds and kinds <= {int, float, json_codec.NonFiniteFloat}:
+        return pyarrow.array([value if value is None else float(value) for value in values], pyarrow.float64())
+    if kinds == {str}:
+        return string_array(values)
+    if not kinds:
+        return pyarrow.nulls(len(values))
+    return string_array([None if value is None else json.dumps(value, ensure_ascii=False, separators=(",", ":")) for value in values])
+
+class ColumnarEncoder:
+    """
+    パートのツイートを列指向の形式（Parquet または Arrow IPC）のバイト列に変換するクラス
+    
+    列は id（int64）、created_at（エポックマイクロ秒、int64）、text（full_text または text）に続き、
+    ツイートのフィールド（{"tweet": {...}} 形式の場合は内側）を '親.子' の名前で展開したもの。
+    パートごとに1つの行グループとして書き込むため、行グループはJSONモードのサイズ上限に従う。
+    project（FieldProjector）を指定した場合、展開するフィールドは取り出したレコードのものに限る。
+    Arrow IPC のファイルはメモリマップしてJSONのパースなしに列を読み込める。
+    """
+    def __init__(self, output_format, time_format=None, project=None):
+        if output_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"不明な出力形式です: {output_format}（{', '.join(OUTPUT_FORMATS)} のいずれかを指定してください）")
+        if not load_pyarrow():
+            raise ValueError(f"--format={output_format} には pyarrow ライブラリが必要です（pip install pyarrow）")
+        self.output_format = output_format
+        self.extension = COLUMNAR_FORMATS[output_format]
+        self.time_format = time_format
+        self.project = project
+        self.get_epoch = make_epoch_getter(time_format)
+    
+    def __reduce__(self):
+        # 日時を求める関数はクロージャのため、ワーカープロセスでは作り直す
+        return (ColumnarEncoder, (self.output_format, self.time_format, self.project))
+    
+    def build_table(self, tweets):
+        """
+        ツイートのリストから列指向のテーブルを作成する
+        """
+        ids = []
+        epochs = []
+        texts = []
+        rows = []
+        for tweet in tweets:
+            tweet_data = tweet['tweet'] if isinstance(tweet.get('tweet'), dict) else tweet
+            tweet_id = tweet_id_number(tweet)
+            ids.append(tweet_id if 0 < tweet_id <= INT64_MAX else None)
+            epochs.append(self.get_epoch(tweet))
+            texts.append(tweet_data.get('full_text') or tweet_data.get('text'))
+            rows.append(flatten_fields(self.project(tweet_data) if self.project is not None else tweet_data))
+        columns = {
+            'id': pyarrow.array(ids, pyarrow.int64()),
+            'created_at': pyarrow.array(epochs, pyarrow.int64()),
+            'text': string_array(texts),
+        }
+        # 列の順序はフィールドが最初に現れた順
+        names = dict.fromkeys(name for row in rows for name in row if name not in COLUMNAR_KEY_COLUMNS)
+        for name in names:
+            columns[name] = column_array([row.get(name) for row in rows])
+        return pyarrow.table(columns)
+    
+    def encode(self, tweets):
+        """
+        ツイートのリストをファイルの内容（バイト列）に変換する
+        """
+        table = self.build_table(tweets)
+        sink = pyarrow.BufferOutputStream()
+        if self.output_format == 'parquet':
+            pyarrow.parquet.write_table(table, sink, row_group_size=max(table.num_rows, 1))
+        else:
+            with pyarrow.ipc.new_file(sink, table.schema) as ipc_writer:
+                ipc_writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+# 外部ソートで一度にマージするランファイルの最大数
+MAX_MERGE_FANIN = 64
+# バッファ内の1レコードあたりのオブジェクトのオーバーヘッド（概算バイト数）
+RECORD_OVERHEAD = 200
+
+def parse_size(size_str):
+    """
+    '512M'、'1G'、'100K'、'1048576' などのサイズ指定をバイト数に変換する関数
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*', size_str.upper())
+    if not match:
+        raise ValueError(f"サイズ指定を認識できません: {size_str}")
+    number, unit = match.groups()
+    multiplier = 1024 ** ' KMGT'.index(unit or ' ')
+    return int(float(number) * multiplier)
+
+def split_with_external_sort(input_files, output_dir, max_size_bytes, time_format, text_only, group_by, memory_limit, executor=None, manifest=None, writer=None, index=None, adaptive=False, compression=None, columnar=None, parallel_workers=0, tweet_filter=None, project=None, workers=1):
+    """
+    メモリ上限を超えるアーカイブ向けに、外部ソートで時系列順に分割する関数
+    
+    ストリーミング読み込みしながらツイートを期間ごとのランファイルに書き出し、
+    期間ごとにランファイルをk-wayマージして時系列順に分割・書き込みを行う。
+    出力ファイルはメモリ上で処理する場合と同じになる。
+    複数のパートファイルはメモリ上限を守るため順に読み込む。
+    
+    Parameters:
+    - input_files: 入力ファイルのパスのリスト（パート順）
+    - memory_limit: バッファに保持するツイートの上限（バイト）
+    - executor: テキスト整形に使用するプロセスプール（Noneの場合は逐次処理）
+    - manifest: インクリメンタルモードのマニフェスト（Noneの場合は全ツイートを処理）
+    - writer: ファイル書き込みに使用する PartWriter（Noneの場合は同期書き込み）
+    - index: 書き込んだツイートを登録する TweetIndexBuilder（Noneの場合はインデックスを作成しない）
+    - adaptive: Trueの場合、隣り合う小さな期間をサイズ上限に達するまでまとめる
+    - compression: (圧縮形式, 圧縮後のサイズに上限を適用するか) のタプル（Noneの場合は圧縮しない）
+    - columnar: 列指向の形式で出力する ColumnarEncoder（Noneの場合はJSONまたはテキスト）
+    - parallel_workers: 1以上の場合、executor のこの数のワーカーで期間ごとに並列にマージ・分割・書き込み
+      （ワーカーにはランファイルのパスを送り、マージとパースもワーカーで行う）
+    - tweet_filter: 振り分けの前に適用する TweetFilter（Noneの場合は全件）
+    - project: 出力するフィールドを取り出す FieldProjector（Noneの場合はツイート全体）
+    - workers: executor のワーカー数（テキスト整形で先読みするチャンク数の上限に使用）
+    - その他: split_twitter_log_by_time と同じ
+    
+    Returns:
+    - (処理したツイート数, 作成したファイル数)
+    """
+    stats = {'bytes_read': 0}
+    is_new_tweet = make_new_tweet_filter(manifest) if manifest is not None else None
+    # ストリーミング読み込み中に除外するため、除外したツイートはランファイルに書き出されない
+    spill_filter = tweet_filter or is_new_tweet
+    if tweet_filter is not None and is_new_tweet is not None:
+        spill_filter = lambda tweet, epoch: tweet_filter(tweet, epoch) and is_new_tweet(tweet, epoch)
+    with tempfile.TemporaryDirectory(prefix='twitter-log-splitter-') as run_dir:
+        # 入力順の通し番号（同時刻のツイートはパートをまたいでも入力順を保つ）
+        sequence = itertools.count()
+        buckets = {}
+        period_sizes = {} if adaptive else None
+        for input_file in input_files:
+            # 前のパートのバッファはランファイルに書き出してメモリを解放
+            for period, (count, runs, buffer) in buckets.items():
+                if buffer:
+                    buckets[period] = (count, runs + [write_sorted_run(buffer, run_dir)], [])
+            part_dir = tempfile.mkdtemp(dir=run_dir)
+            # 読み込み・日時のパース・振り分け・ランファイルの書き出しはまとめて spill として計測
+            with metrics.stage('spill'):
+                part_buckets = spill_input_file(input_file, part_dir, memory_limit, time_format, group_by, sequence, stats, spill_filter, period_sizes, text_only, project)
+            for period, (count, runs, buffer) in part_buckets.items():
+                total, previous_runs, _ = buckets.get(period, (0, [], []))
+                buckets[period] = (total + count, previous_runs + runs, buffer)
+        report_load_stats(stats)
+        if tweet_filter is not None:
+            tweet_filter.report()
+        
+        tweet_count = sum(count for count, _, _ in buckets.values())
+        print(f"処理対象ツイート数: {tweet_count}")
+        print(f"期間ごとの振り分け完了: {len(buckets)} 期間に分類")
+        
+        if period_sizes is not None:
+            merged_periods = merge_small_periods(sorted(buckets), period_sizes, max_size_bytes)
+            print(f"小さな期間をまとめました: {len(merged_periods)} 期間")
+        else:
+            merged_periods = [(period, [period]) for period in sorted(buckets)]
+        
+        # 期間ごとにランファイルをマージして分割
+        file_count = 0
+        print("ファイル分割処理を開始...")
+        if parallel_workers:
+            period_jobs = ((period, MergedRunSource([(buckets[key][1], buckets[key][2]) for key in periods], run_dir),
+                            sum(buckets[key][0] for key in periods)) for period, periods in merged_periods)
+            file_count = write_periods_in_parallel(executor, parallel_workers, tqdm(period_jobs, total=len(merged_periods), desc="ファイル分割", unit="期間"),
+                                                   output_dir, max_size_bytes, text_only, manifest, index, compression, columnar, project)
+            return tweet_count, file_count
+        for period, periods in tqdm(merged_periods, desc="ファイル分割", unit="期間"):
+            count = sum(buckets[key][0] for key in periods)
+            print(f"期間 {period} の処理中... ({count} ツイート)")
+            # まとめた期間は順にマージして連結する
+            period_tweets = MergedRunSource([(buckets[key][1], buckets[key][2]) for key in periods], run_dir)
+            file_count += write_period_parts(period, period_tweets, count, output_dir, max_size_bytes, text_only, executor, manifest, writer, index, compression, columnar, project, workers)
+    return tweet_count, file_count
+
+def spill_input_file(input_file, run_dir, memory_limit, time_format, group_by, sequence=None, stats=None, tweet_filter=None, period_sizes=None, text_only=False, project=None):
+    """
+    1つの入力ファイルをストリーミング読み込みし、期間ごとのランファイルに振り分ける関数
+    
+    振り分けを始めると、tweet_filter（マニフェストや重複除外のID）と period_sizes に読み込んだツイートが
+    反映されて読み直せなくなるため、エンコーディングの候補ごとにファイル全体をデコードできるかを
+    先に確認してから振り分ける（iter_file_tweets と同じ）。
+    
+    Parameters:
+    - input_file: 入力ファイルのパス
+    - run_dir: このファイル専用のランファイルの出力ディレクトリ
+    - sequence: 入力順の通し番号を返すイテレータ（Noneの場合は0から）
+    - stats: 読み込んだバイト数を 'bytes_read' に加算する辞書
+    - その他: spill_tweets_by_period と同じ
+    
+    Returns:
+    - spill_tweets_by_period と同じ
+    """
+    with open_input_buffer(input_file) as buf:
+        for encoding in iter_candidate_encodings(buf):
+            if not can_decode_buffer(buf, encoding):
+                continue
+            tweet_stream = iter_tweets(iter_json_array(iter_decoded_chunks(buf, encoding, stats=stats)))
+            try:
+                first_tweet = next(tweet_stream, None)
+            except json.JSONDecodeError as e:
+                # 先頭のツイートを読み込む前のため、次のエンコーディングで読み直せる
+                print(f"{encoding}エンコーディングでストリーミング読み込み失敗: {e}")
+                metrics.count('encoding_fallbacks')
+                continue
+            except ValueError:
+                # JSON配列ではない場合はファイル全体を読み込む（メモリ上限は保証されない）
+                print("警告: 入力がJSON配列ではないため、ファイル全体を読み込みます")
+                tweets = decode_json_buffer(buf, encoding, stats)
+                if tweets is None:
+                    metrics.count('encoding_fallbacks')
+                    tweets = extract_tweets(load_json_data(input_file, detect_encodings(input_file)))
+                tweet_stream = iter(tweets)
+                first_tweet = next(tweet_stream, None)
+            if first_tweet is None:
+                raise ValueError("入力ファイル内にTwitter投稿の配列が見つかりません")
+            
+            buckets = spill_tweets_by_period(
+                itertools.chain([first_tweet], tweet_stream), run_dir,
+                memory_limit, time_format, group_by, sequence, tweet_filter, period_sizes, text_only, project
+            )
+            print(f"ファイル読み込み完了: {len(buf)/1024/1024:.2f} MB (エンコーディング: {encoding})")
+            return buckets
+    raise ValueError("ファイルを読み込めませんでした。すべてのエンコーディングが失敗しました。")
+
+def spill_tweets_by_period(tweets, run_dir, memory_limit, time_format, group_by, sequence=None, tweet_filter=None, period_sizes=None, text_only=False, project=None):
+    """
+    ツイートを期間ごとに振り分け、バッファが上限を超えたらソート済みランファイルに書き出す関数
+    
+    Parameters:
+    - tweets: ツイートのイテラブル（ストリーム）
+    - run_dir: ランファイルの出力ディレクトリ
+    - memory_limit: バッファに保持するツイートの上限（バイト）
+    - time_format: 日時情報のフォーマット
+    - group_by: グループ化の単位
+    - sequence: 入力順の通し番号を返すイテレータ（Noneの場合は0から）
+    - tweet_filter: (ツイート, エポック値) を受け取り、処理対象ならTrueを返す関数（Noneの場合は全件）
+    - period_sizes: 指定した場合、期間ごとの出力サイズの見積もり（バイト）を加算する辞書
+    - text_only: 出力サイズの見積もりをテキスト抽出モードで行う
+    - project: 出力サイズの見積もりに使用する FieldProjector（Noneの場合はツイート全体）
+    
+    Returns:
+    - {期間: (ツイート数, ランファイルのパスのリスト, 未書き出しのレコードのリスト)}
+    """
+    # オブジェクトのオーバーヘッドを考慮して上限の半分をバッファに使用
+    budget = max(memory_limit // 2, 1)
+    buffers = {}
+    runs = {}
+    counts = {}
+    buffered_bytes = 0
+    schema = None
+    period_key = make_period_key(group_by)
+    if sequence is None:
+        sequence = itertools.count()
+    read_count = 0
+    parse_failures = 0
+    for seq, tweet in zip(sequence, tqdm(tweets, desc="振り分け", unit="tweet")):
+        read_count += 1
+        if schema is None:
+            # 先頭のツイートで日時のパスとフォーマットを特定（同じ構造のパートではキャッシュを使用）
+            schema = get_tweet_schema(tweet)
+            get_value = schema.get_date
+            parse = make_date_parser(time_format or schema.time_format)
+        try:
+            epoch = parse(get_value(tweet))
+        except Exception as e:
+            print(f"警告: 日時パースエラー {schema.date_value(tweet)}: {e}")
+            parse_failures += 1
+            continue
+        if tweet_filter is not None and not tweet_filter(tweet, epoch):
+            continue
+        period = period_key(epoch)
+        # ソートキーは (日時, 入力順) とし、同時刻のツイートは入力順を保つ（安定ソートと同じ順序）
+        line = json_codec.dumps(tweet, errors='surrogatepass')
+        buffers.setdefault(period, []).append((epoch, seq, line))
+        counts[period] = counts.get(period, 0) + 1
+        if period_sizes is not None:
+            # JSONモードではランファイルの行がそのまま出力の要素になる（フィールドを取り出す場合を除く）
+            size = estimate_output_size(tweet, text_only, project) if text_only or project is not None else len(line) + 1
+            period_sizes[period] = period_sizes.get(period, 0) + size
+        buffered_bytes += len(line) + RECORD_OVERHEAD
+        if buffered_bytes > budget:
+            # 期間ごとにソートしてランファイルに書き出す
+            for key, records in buffers.items():
+                runs.setdefault(key, []).append(write_sorted_run(records, run_dir))
+            buffers = {}
+            buffered_bytes = 0
+    metrics.count('tweets_read', read_count)
+    metrics.count('parse_failures', parse_failures)
+    return {
+        period: (count, runs.get(period, []), buffers.get(period, []))
+        for period, count in counts.items()
+    }
+
+def write_sorted_run(records, run_dir):
+    """
+    レコードをソートしてランファイルに書き出し、そのパスを返す関数
+    """
+    records.sort()
+    fd, path = tempfile.mkstemp(suffix='.run', dir=run_dir)
+    with open(fd, 'wb') as f:
+        for epoch, seq, line in records:
+            f.write(b"%d\t%d\t%s\n" % (epoch, seq, line))
+    return path
+
+def iter_run(path):
+    """
+    ランファイルのレコードを (エポック値, 入力順, JSONのバイト列) として順に返すジェネレータ
+    """
+    with open(path, 'rb') as f:
+        for row in f:
+            epoch, seq, line = row.rstrip(b'\n').split(b'\t', 2)
+            yield int(epoch), int(seq), line
+
+def iter_merged_runs(runs, buffer, run_dir):
+    """
+    ランファイルとメモリ上のレコードをk-wayマージし、ツイートを時系列順に返すジェネレータ
+    """
+    for _, tweet in iter_merged_records(runs, buffer, run_dir):
+        yield tweet
+
+class MergedRunSource:
+    """
+    1つ以上の期間のランファイルを順にマージしてツイートを返すイテラブル
+    
+    ランファイルのパスとメモリ上のレコードだけを保持するため、ワーカープロセスに送っても
+    ツイートを pickle せずに済む（マージとJSONのパースはイテレートしたプロセスで行う）。
+    
+    Parameters:
+    - sources: (ランファイルのパスのリスト, メモリ上のレコードのリスト) のリスト（この順に連結する）
+    - run_dir: 部分的なマージに使用する一時ディレクトリ
+    """
+    def __init__(self, sources, run_dir):
+        self.sources = sources
+        self.run_dir = run_dir
+    
+    def __iter__(self):
+        for runs, buffer in self.sources:
+            yield from iter_merged_runs(runs, buffer, self.run_dir)
+
+def iter_merged_records(runs, buffer, run_dir):
+    """
+    ランファイルとメモリ上のレコードをk-wayマージし、(エポック値, ツイート) を時系列順に返すジェネレータ
+    
+    ランファイルが MAX_MERGE_FANIN を超える場合は、先に部分的にマージして数を減らす。
+    """
+    runs = list(runs)
+    while len(runs) > MAX_MERGE_FANIN:
+        group, runs = runs[:MAX_MERGE_FANIN], runs[MAX_MERGE_FANIN:]
+        fd, path = tempfile.mkstemp(suffix='.run', dir=run_dir)
+        with open(fd, 'wb') as f:
+            for epoch, seq, line in heapq.merge(*[iter_run(run) for run in group]):
+                f.write(b"%d\t%d\t%s\n" % (epoch, seq, line))
+        for run in group:
+            os.remove(run)
+        runs.append(path)
+    buffer.sort()
+    for epoch, _, line in heapq.merge(iter(buffer), *[iter_run(run) for run in runs]):
+        yield epoch, json_codec.loads(line)
+
+# 顔文字として扱うUnicodeの範囲（開始, 終了）
+EMOJI_RANGES = [
+    (0x1F600, 0x1F64F),  # 顔文字: 笑顔
+    (0x1F300, 0x1F5FF),  # 顔文字: その他
+    (0x1F680, 0x1F6FF),  # 顔文字: 交通機関
+    (0x1F700, 0x1F77F),  # 顔文字: その他
+    (0x1F780, 0x1F7FF),  # 顔文字: その他
+    (0x1F800, 0x1F8FF),  # 顔文字: その他
+    (0x1F900, 0x1F9FF),  # 顔文字: その他
+    (0x1FA00, 0x1FA6F),  # 顔文字: その他
+    (0x1FA70, 0x1FAFF),  # 顔文字: その他
+    (0x2702, 0x27B0),  # 顔文字: Dingbats
+    (0x24C2, 0x257F),  # 顔文字: その他
+    (0x2600, 0x26FF),  # 顔文字: その他
+    (0x2700, 0x27BF),  # 顔文字: Dingbats
+    (0xFE00, 0xFE0F),  # 顔文字: その他
+    (0x1F000, 0x1F02F),  # 顔文字: その他
+    (0x1F0A0, 0x1F0FF),  # 顔文字: トランプ
+    (0x1F100, 0x1F1FF),  # 顔文字: その他
+    (0x1F200, 0x1F2FF),  # 顔文字: その他
+    (0x1F300, 0x1F5FF),  # 顔文字: その他
+    (0x1F600, 0x1F64F),  # 顔文字: 笑顔
+    (0x1F680, 0x1F6FF),  # 顔文字: 交通機関
+    (0x1F700, 0x1F77F),  # 顔文字: その他
+    (0x20D0, 0x20FF),  # 顔文字: その他
+    (0xFE00, 0xFE0F),  # 顔文字: その他
+    (0x1F900, 0x1F9FF),  # 顔文字: その他
+    (0x2600, 0x27BF),  # 顔文字: その他
+    (0x2B50, 0x2B50),  # 顔文字: ↑
+    (0x2B55, 0x2B55),  # 顔文字: ↓
+    (0x3030, 0x3030),  # 顔文字: 〰
+    (0x3297, 0x3297),  # 顔文字: ㊗
+    (0x3299, 0x3299),  # 顔文字: ㊙
+    (0x1F201, 0x1F201),  # 顔文字: →
+    (0x1F202, 0x1F202),  # 顔文字: ←
+    (0x1F21A, 0x1F21A),  # 顔文字: ↩
+    (0x1F22F, 0x1F22F),  # 顔文字: ↪
+    (0x1F232, 0x1F23A),  # 顔文字: その他
+    (0x1F250, 0x1F251),  # 顔文字: その他
+    (0x1F300, 0x1F320),  # 顔文字: その他
+    (0x1F330, 0x1F335),  # 顔文字: その他
+    (0x1F337, 0x1F37C),  # 顔文字: その他
+    (0x1F380, 0x1F393),  # 顔文字: その他
+    (0x1F3A0, 0x1F3C4),  # 顔文字: その他
+    (0x1F3C6, 0x1F3CA),  # 顔文字: その他
+    (0x1F3E0, 0x1F3F0),  # 顔文字: その他
+    (0x1F400, 0x1F43E),  # 顔文字: その他
+    (0x1F440, 0x1F440),  # 顔文字: 顔文字
+    (0x1F442, 0x1F4F7),  # 顔文字: その他
+    (0x1F4F9, 0x1F4FC),  # 顔文字: その他
+    (0x1F500, 0x1F53D),  # 顔文字: その他
+    (0x1F550, 0x1F567),  # 顔文字: その他
+    (0x1F5FB, 0x1F5FF),  # 顔文字: その他
+    (0x1F601, 0x1F610),  # 顔文字: 笑顔
+    (0x1F612, 0x1F614),  # 顔文字: 笑顔
+    (0x1F616, 0x1F616),  # 顔文字: 笑顔
+    (0x1F618, 0x1F618),  # 顔文字: 笑顔
+    (0x1F61A, 0x1F61A),  # 顔文字: 笑顔
+    (0x1F61C, 0x1F61E),  # 顔文字: 笑顔
+    (0x1F620, 0x1F625),  # 顔文字: 笑顔
+    (0x1F628, 0x1F62B),  # 顔文字: 笑顔
+    (0x1F62D, 0x1F62D),  # 顔文字: 笑顔
+    (0x1F630, 0x1F633),  # 顔文字: 笑顔
+    (0x1F635, 0x1F640),  # 顔文字: 笑顔
+    (0x1F645, 0x1F64F),  # 顔文字: 笑顔
+    (0x1F680, 0x1F6C5),  # 顔文字: 交通機関
+    (0x1F6CC, 0x1F6CC),  # 顔文字: 交通機関
+    (0x1F6D0, 0x1F6D2),  # 顔文字: その他
+    (0x1F6D5, 0x1F6D7),  # 顔文字: その他
+    (0x1F6EB, 0x1F6EC),  # 顔文字: その他
+    (0x1F6F4, 0x1F6FC),  # 顔文字: 交通機関
+    (0x1F7E0, 0x1F7EB),  # 顔文字: その他
+    (0x1F90C, 0x1F93A),  # 顔文字: その他
+    (0x1F93C, 0x1F945),  # 顔文字: その他
+    (0x1F947, 0x1F978),  # 顔文字: その他
+    (0x1F97A, 0x1F9CB),  # 顔文字: その他
+    (0x1F9CD, 0x1F9FF),  # 顔文字: その他
+    (0x1FA70, 0x1FA74),  # 顔文字: その他
+    (0x1FA78, 0x1FA7A),  # 顔文字: その他
+    (0x1FA80, 0x1FA86),  # 顔文字: その他
+    (0x1FA90, 0x1FAA8),  # 顔文字: その他
+    (0x1FAB0, 0x1FAB6),  # 顔文字: その他
+    (0x1FAC0, 0x1FAC2),  # 顔文字: その他
+    (0x1FAD0, 0x1FAD6),  # 顔文字: その他
+]
+
+def merge_ranges(ranges):
+    """
+    重複・隣接する (開始, 終了) の範囲をマージしてソート済みのリストを返す関数
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+# 重複を除いてマージした顔文字の範囲と、その開始位置（二分探索用）
+_EMOJI_MERGED_RANGES = merge_ranges(EMOJI_RANGES)
+_EMOJI_RANGE_STARTS = [start for start, _ in _EMOJI_MERGED_RANGES]
+# 顔文字を削除するための正規表現パターン（インポート時に一度だけコンパイル）
+_EMOJI_PATTERN = re.compile(
+    '[' + ''.join(re.escape(chr(start)) if start == end else f"{re.escape(chr(start))}-{re.escape(chr(end))}"
+                  for start, end in _EMOJI_MERGED_RANGES) + ']'
+)
+
+def is_emoji_codepoint(codepoint):
+    """
+    コードポイントが顔文字の範囲に含まれるかを判定する関数
+    """
+    i = bisect.bisect_right(_EMOJI_RANGE_STARTS, codepoint) - 1
+    return i >= 0 and codepoint <= _EMOJI_MERGED_RANGES[i][1]
+
+# 顔文字を削除する関数
+def remove_emojis(text):
+    """
+    顔文字を削除する関数
+    
+    Parameters:
+    - text: 顔文字を含むテキスト
+    
+    Returns:
+    - 顔文字を削除したテキスト
+    """
+    # 顔文字を削除
+    return _EMOJI_PATTERN.sub(' ', text)
+
+class TextCleaningTable(dict):
+    """
+    制御文字の削除と顔文字の空白への置換を1回の str.translate で行うための変換テーブル
+    
+    Unicodeの制御文字（カテゴリC）は全体で約100万文字あるため事前には展開せず、
+    未登録の文字は初回参照時に判定してキャッシュする。
+    制御文字の判定を顔文字より優先する（従来の「制御文字削除→顔文字削除」の順序と同じ結果）。
+    """
+    def __missing__(self, codepoint):
+        ch = chr(codepoint)
+        if unicodedata.category(ch)[0] == 'C' and ch not in (' ', '\t', '\n'):
+            value = None  # 制御文字は削除
+        elif is_emoji_codepoint(codepoint):
+            value = ' '   # 顔文字は空白に置換
+        else:
+            value = codepoint
+        self[codepoint] = value
+        return value
+
+def build_text_cleaning_table():
+    """
+    ASCIIと顔文字の範囲を登録済みのテキスト整形用変換テーブルを作成する関数
+    """
+    table = TextCleaningTable()
+    for codepoint in range(128):
+        table[codepoint]  # 参照時に判定結果が登録される
+    for start, end in _EMOJI_MERGED_RANGES:
+        for codepoint in range(start, end + 1):
+            table[codepoint]
+    return table
+
+# テキスト整形用の変換テーブル（インポート時に一度だけ作成）
+TEXT_CLEANING_TABLE = build_text_cleaning_table()
+
+def strip_control_and_emojis(text):
+    """
+    制御文字を削除し、顔文字を空白に置換する関数（1パスで処理）
+    """
+    return text.translate(TEXT_CLEANING_TABLE)
+
+# ファイル名重複回避用のユーティリティ関数
+
+def get_unique_filename(file_path):
+    """
+    指定ファイルパスが既に存在する場合、連番を付与して新しいファイル名を返す
+    """
+    base, ext = os.path.splitext(file_path)
+    counter = 1
+    new_path = file_path
+    while os.path.exists(new_path):
+        new_path = f"{base}_{counter}{ext}"
+        counter += 1
+    return new_path
+
+# 圧縮形式ごとの出力ファイルの拡張子
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'xz': '.xz'}
+
+# 圧縮後のサイズの上限を判定する際に見込む、ストリームの終端（トレーラー）などの最大バイト数
+COMPRESSION_OVERHEAD = 128
+
+def compressed_size_bound(size):
+    """
+    size バイトを圧縮した場合の最大バイト数を返す関数（圧縮できないデータでも超えない値）
+    """
+    return size + size // 1024 + COMPRESSION_OVERHEAD
+
+class StreamingCompressor:
+    """
+    1つの出力ファイルの内容を逐次圧縮するクラス
+    
+    sync() でそれまでに入力したデータの圧縮結果をすべて出力させ（フラッシュポイント）、
+    size で正確な圧縮後のバイト数を得られる。
+    gzip と zstd は辞書を保ったままフラッシュし、xz はストリームを終了して次のストリームを開始する
+    （連結したxzストリームは1つのファイルとして展開できる）。
+    gzip と xz は checkpoint() で保存したフラッシュポイントまで rollback() で戻すことができる。
+    """
+    def __init__(self, compression):
+        if compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"不明な圧縮形式です: {compression}（{', '.join(COMPRESSION_EXTENSIONS)} のいずれかを指定してください）")
+        if compression == 'zstd' and not HAS_ZSTANDARD:
+            raise ValueError("zstd での圧縮には zstandard ライブラリが必要です（pip install zstandard）")
+        self.compression = compression
+        self.chunks = []
+        self.size = 0
+        self.compressor = self.new_compressor()
+        self.saved = None
+    
+    @property
+    def can_rollback(self):
+        # zstandard の圧縮オブジェクトは状態を複製できない
+        return self.compression != 'zstd'
+    
+    def new_compressor(self):
+        if self.compression == 'gzip':
+            # wbits=31 でgzip形式（ヘッダーの更新日時は0のため、同じ内容からは同じ出力になる）
+            return zlib.compressobj(6, zlib.DEFLATED, 31)
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor().compressobj()
+        return lzma.LZMACompressor(format=lzma.FORMAT_XZ)
+    
+    def append(self, data):
+        if data:
+            self.chunks.append(data)
+            self.size += len(data)
+    
+    def write(self, data):
+        """
+        データを圧縮ストリームに入力する
+        """
+        self.append(self.compressor.compress(data))
+    
+    def sync(self):
+        """
+        入力済みのデータの圧縮結果をすべて出力させる
+        """
+        if self.compression == 'gzip':
+            self.append(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        elif self.compression == 'zstd':
+            self.append(self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+        else:
+            self.append(self.compressor.flush())
+            self.compressor = self.new_compressor()
+    
+    def checkpoint(self):
+        """
+        現在のフラッシュポイント（sync() の直後）を保存する
+        """
+        state = self.compressor.copy() if self.compression == 'gzip' else None
+        self.saved = (len(self.chunks), self.size, state)
+    
+    def rollback(self):
+        """
+        保存したフラッシュポイント以降に入力したデータを取り消す
+        """
+        chunk_count, self.size, state = self.saved
+        del self.chunks[chunk_count:]
+        self.compressor = state.copy() if state is not None else self.new_compressor()
+    
+    def finish(self):
+        """
+        ストリームを終了し、圧縮後の内容（バイト列）を返す
+        """
+        self.append(self.compressor.flush())
+        return b''.join(self.chunks)
+
+def compress_bytes(data, compression):
+    """
+    バイト列を一度に圧縮する関数
+    """
+    compressor = StreamingCompressor(compression)
+    compressor.write(data)
+    return compressor.finish()
+
+def read_part_file(file_path):
+    """
+    パートファイルを読み込み、拡張子に応じて展開した内容（バイト列）を返す関数
+    """
+    with open(file_path, 'rb') as f:
+        content = f.read()
+    if file_path.endswith('.gz'):
+        return zlib.decompress(content, 47)
+    if file_path.endswith('.zst'):
+        if not HAS_ZSTANDARD:
+            raise ValueError(f"{file_path} の展開には zstandard ライブラリが必要です（pip install zstandard）")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    if file_path.endswith('.xz'):
+        return lzma.decompress(content)
+    return content
+
+# 圧縮率から圧縮後のサイズを予測する際の余裕（予測値をこの倍率で見積もる）
+COMPRESSION_RATIO_MARGIN = 1.1
+
+def iter_compressed_batches(items, max_size_bytes, compression, prefix, separator, suffix):
+    """
+    圧縮後のサイズが上限を超えないようにバッチに分割し、各バッチを圧縮した内容とともに返すジェネレータ
+    
+    バッチ全体を要素ごとに圧縮し直すのではなく、各要素を1つの圧縮ストリームに逐次入力する。
+    前回のフラッシュポイント以降に入力したバイト数から圧縮後のサイズの上限を見積もり、
+    上限を超えうる場合のみフラッシュして正確な圧縮後のサイズを確認する。
+    ロールバックできる形式（gzip, xz）では、それまでの圧縮率から予測して上限の近くまで入力を進め、
+    予測が外れて上限を超えた場合のみ直前のフラッシュポイントに戻して入力し直す。
+    そのため1ファイルあたりのフラッシュの回数はわずかで、圧縮率はほとんど変わらない。
+    
+    Parameters:
+    - items: (要素, バイト列またはNone) のイテラブル（Noneの要素は出力に現れない）
+    - max_size_bytes: 各バッチの圧縮後の最大サイズ（バイト）
+    - compression: 圧縮形式（'gzip', 'zstd', 'xz'）
+    - prefix, separator, suffix: 内容の先頭・要素間の区切り・末尾のバイト列
+      （JSON配列の場合は b'[', b',', b']'、テキストの場合は b'', b'\\n', b'\\n'）
+    
+    Yields:
+    - ((要素, バイト列) のリスト, 圧縮後の内容のバイト列)（1要素だけでサイズ超過する場合は1要素のみのバッチ）
+    """
+    items = iter(items)
+    retry = deque()  # ロールバックで取り消し、入力し直す要素
+    batch = []
+    # 圧縮の状態はバッチの先頭の要素で初期化する
+    compressor = checkpoint = ratio = None
+    pending = 0
+    has_data = False
+    while True:
+        if retry:
+            item, data = retry.popleft()
+        else:
+            entry = next(items, None)
+            if entry is None:
+                if batch and ratio is not None and pending:
+                    # 最後のバッチも予測で入力を進めているため、フラッシュして上限を超えていないか確認する
+                    compressor.sync()
+                    if compressor.size + compressed_size_bound(len(suffix)) > max_size_bytes:
+                        # 超えた場合はフラッシュポイントに戻し、残りの要素を予測なしで入力し直す（次のバッチに分かれる）
+                        compressor.rollback()
+                        retry.extend(batch[checkpoint[0]:])
+                        del batch[checkpoint[0]:]
+                        has_data = checkpoint[1]
+                        pending = 0
+                        ratio = None
+                        continue
+                break
+            item, data = entry
+        if not batch:
+            compressor = StreamingCompressor(compression)
+            compressor.write(prefix)
+            checkpoint = (0, False, 0)  # フラッシュポイントでのバッチの要素数・データのある要素の有無・圧縮後のサイズ
+            pending = len(prefix)    # 前回のフラッシュポイント以降に入力したバイト数
+            has_data = False
+            ratio = None             # 直前のフラッシュポイント間の圧縮率（予測に使用）
+        if data is not None:
+            added = len(data) + (len(separator) if has_data else 0)
+            fits = compressor.size + compressed_size_bound(pending + added + len(suffix)) <= max_size_bytes
+            if not fits and batch and ratio is not None:
+                # 圧縮率から予測して上限に収まる見込みなら、フラッシュせずに入力を進める
+                fits = (compressor.size + (pending + added) * ratio * COMPRESSION_RATIO_MARGIN
+                        + compressed_size_bound(len(suffix)) <= max_size_bytes)
+            if not fits and batch:
+                # フラッシュして正確な圧縮後のサイズで判定し直す
+                compressor.sync()
+                if compressor.size + compressed_size_bound(len(suffix)) > max_size_bytes and ratio is not None:
+                    # 予測が外れて上限を超えた場合、フラッシュポイントに戻して予測なしで入力し直す
+                    compressor.rollback()
+                    retry.extendleft(reversed(batch[checkpoint[0]:] + [(item, data)]))
+                    del batch[checkpoint[0]:]
+                    has_data = checkpoint[1]
+                    pending = 0
+                    ratio = None
+                    continue
+                if pending and compressor.can_rollback:
+                    ratio = (compressor.size - checkpoint[2]) / pending
+                    compressor.checkpoint()
+                    checkpoint = (len(batch), has_data, compressor.size)
+                pending = 0
+                if compressor.size + compressed_size_bound(added + len(suffix)) > max_size_bytes:
+                    compressor.write(suffix)
+                    yield batch, compressor.finish()
+                    batch = []
+                    retry.appendleft((item, data))
+                    continue
+            compressor.write(separator + data if has_data else data)
+            pending += added
+            has_data = True
+        batch.append((item, data))
+    if batch:
+        compressor.write(suffix)
+        yield batch, compressor.finish()
+
+# ファイル出力時のエンコーディング処理を強化
+def write_to_file(file_path, content, is_text=False):
+    """
+    ファイルへの書き込みを安全に行う関数
+    
+    内容を一度にUTF-8のバイト列へエンコードし、一時ファイルに書き込んでから置き換える。
+    
+    Parameters:
+    - file_path: 出力ファイルのパス
+    - content: 書き込む内容（テキスト、エンコード済みのバイト列、またはJSON）
+    - is_text: Trueの場合はテキストモード、Falseの場合はJSONモード
+    """
+    try:
+        data, warning = encode_output(content, is_text)
+        write_bytes_atomic(file_path, data)
+        if warning:
+            print(f"警告: {file_path} の書き込み時に{warning}")
+        return True
+    except Exception as e:
+        print(f"エラー: {file_path} への書き込みに失敗しました: {e}")
+        return False
+
+def encode_output(content, is_text=False):
+    """
+    書き込む内容をUTF-8のバイト列にエンコードする関数
+    
+    Parameters:
+    - content: 書き込む内容（テキスト、エンコード済みのバイト列、またはJSON）
+    - is_text: Trueの場合はテキストモード、Falseの場合はJSONモード
+    
+    Returns:
+    - (バイト列, 警告メッセージまたはNone)
+    """
+    if isinstance(content, bytes):
+        return content, None
+    text = content if is_text else json.dumps(content, ensure_ascii=False, indent=None)
+    try:
+        return text.encode('utf-8'), None
+    except UnicodeEncodeError:
+        # UTF-8でエンコードできない文字（孤立したサロゲートなど）は置換して再試行
+        return text.encode('utf-8', errors='replace'), "Unicodeエンコードエラーが発生しました。一部の文字が置換されています。"
+
+def write_bytes_atomic(file_path, data):
+    """
+    バイト列を一時ファイルに一度に書き込み、完了後に目的のファイル名へ置き換える関数
+    
+    書き込み途中で失敗しても、不完全なファイルが出力ファイル名で残らない。
+    """
+    temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as out:
+            out.write(data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# バックグラウンドの書き込みキューに保持するパートの最大数
+WRITE_QUEUE_SIZE = 8
+
+class PartWriter:
+    """
+    エンコード済みのパートをバックグラウンドのスレッドで書き込むライター
+    
+    パートのエンコードは呼び出し側のスレッドで行い、ファイルへの書き込みと置き換えは
+    スレッドプールで行うため、次のパートの分割処理とディスクI/Oが並行して進む。
+    書き込み待ちのパートは WRITE_QUEUE_SIZE 個までに制限され、超える場合は空くまで待つ。
+    書き込みの結果（エラーや文字の置換の警告、成功時の記録）は追加した順に呼び出し側のスレッドで処理する。
+    """
+    def __init__(self, threads=2, queue_size=WRITE_QUEUE_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.pending = deque()
+        self.failed_count = 0
+    
+    def submit(self, file_path, content, is_text=False, on_written=None):
+        """
+        パートをエンコードして書き込みキューに追加する
+        
+        Parameters:
+        - file_path: 書き込み先のファイルのパス
+        - content: パートの内容
+        - is_text: Trueの場合、テキストファイルとしてエンコード
+        - on_written: 書き込みが成功した後に、書き込んだバイト数を渡して呼び出す関数
+          （report または close の中で、呼び出し側のスレッドから追加した順に呼び出す）
+        """
+        self.report()
+        try:
+            data, warning = encode_output(content, is_text)
+        except Exception as e:
+            self.failed_count += 1
+            metrics.count('write_failures')
+            print(f"エラー: {file_path} への書き込みに失敗しました: {e}")
+            return
+        # キューが満杯の場合は書き込みが終わるまで待つ
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self.write, file_path, data)
+        except BaseException:
+            self.slots.release()
+            raise
+        self.pending.append((file_path, len(data), warning, on_written, future))
+    
+    def write(self, file_path, data):
+        """
+        バックグラウンドのスレッドで1つのパートを書き込む
+        """
+        try:
+            with metrics.stage('write'):
+                write_bytes_atomic(file_path, data)
+        finally:
+            self.slots.release()
+    
+    def report(self, wait=False):
+        """
+        完了した書き込みの結果を追加した順に処理する（警告とエラーを表示し、成功したパートの on_written を呼び出す）
+        
+        Parameters:
+        - wait: Trueの場合、キュー内のすべての書き込みの完了を待つ
+        """
+        while self.pending and (wait or self.pending[0][4].done()):
+            file_path, size, warning, on_written, future = self.pending.popleft()
+            error = future.exception()
+            if error is not None:
+                self.failed_count += 1
+                metrics.count('write_failures')
+                print(f"エラー: {file_path} への書き込みに失敗しました: {error}")
+                continue
+            if warning:
+                print(f"警告: {file_path} の書き込み時に{warning}")
+            if on_written is not None:
+                on_written(size)
+    
+    def close(self):
+        """
+        キュー内のすべての書き込みの完了を待ち、結果を処理する
+        """
+        self.report(wait=True)
+        self.executor.shutdown(wait=True)
+        if self.failed_count:
+            print(f"警告: {self.failed_count} 個のファイルの書き込みに失敗しました")
+
+def query_main(args):
+    """
+    query サブコマンド: インデックスを使って日時の範囲やツイートIDでツイートを検索し、1行に1件ずつ出力する
+    """
+    if not args:
+        print(f"使用方法: {sys.argv[0]} query <出力ディレクトリ> [--since=<日時>] [--until=<日時>] [--id=<ツイートID>]")
+        print("  --since=<日時>: この日時以降のツイート（例: 2023-01-01, \"2023-01-01 12:00:00\"）")
+        print("  --until=<日時>: この日時より前のツイート（指定した日時は含まない）")
+        print("  --id=<ツイートID>: 指定したIDのツイート")
+        sys.exit(1)
+    
+    output_dir = args[0]
+    since = until = tweet_id = None
+    try:
+        for arg in args[1:]:
+            if arg.startswith("--since="):
+                since = parse_query_time(arg.split("=", 1)[1])
+            elif arg.startswith("--until="):
+                until = parse_query_time(arg.split("=", 1)[1])
+            elif arg.startswith("--id="):
+                tweet_id = int(arg.split("=", 1)[1])
+            else:
+                print(f"警告: 不明なオプションです: {arg}", file=sys.stderr)
+        
+        match_count = 0
+        for content in query_index(output_dir, since, until, tweet_id):
+            sys.stdout.buffer.write(content + b'\n')
+            match_count += 1
+        sys.stdout.flush()
+        print(f"検索結果: {match_count} 件", file=sys.stderr)
+    except Exception as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        query_main(sys.argv[2:])
+        return
+    
+    if len(sys.argv) < 3:
+        print(f"使用方法: {sys.argv[0]} <入力ファイル> <出力ディレクトリ> [最大ファイルサイズ(MB)] [オプション]")
+        print("  <入力ファイル>にはTwitterエクスポートのディレクトリや \"data/tweets*.js\" のようなパターンも指定可能")
+        print("オプション:")
+        print("  --text-only: ツイートのテキスト部分のみを抽出して保存")
+        print("  --group-by=<year|quarter|month|week|day|hour|all>: ツイートのグループ化単位を指定（weekはISO週）")
+        print("    month: 年月ごとに分割（デフォルト）")
+        print("    year: 年ごとに分割")
+        print("    all: 全期間を一つにまとめる（ファイル数を最小化）")
+        print("  --bucket=<長さ>: 指定した長さ（例: 6h, 30m, 2d）ごとにグループ化")
+        print("  --adaptive: 隣り合う小さな期間をサイズ上限に達するまで1つのファイルにまとめる")
+        print("  --memory-limit=<サイズ>: メモリ使用量の上限を指定し、ディスク上で外部ソートする（例: 512M, 2G）")
+        print("  --workers=<N>: 複数パートの読み込みとテキスト抽出モードのテキスト整形をNプロセスで並列実行")
+        print("  --dedup: 同じIDのツイートを最初の1件のみ出力（結合したエクスポートや再ダウンロードの重複を除外）")
+        print("  --exclude-retweets: リツイートを出力しない")
+        print("  --exclude-replies: リプライを出力しない")
+        print("  --since=<日時> / --until=<日時>: 指定した日時以降・より前のツイートのみを出力（例: 2020-01-01）")
+        print("  --fields=<フィールド,...>: 指定したフィールドだけを出力（例: id,created_at,full_text,user.screen_name、ドット区切りでネストしたフィールドを指定）")
+        print("  --parallel-periods: 期間ごとの分割・シリアライズ・書き込みを --workers のプロセスで並列実行（--workers=2 以上が必要）")
+        print(f"  --json-backend=<auto|{'|'.join(json_codec.BACKENDS)}>: JSONのパース・シリアライズに使用するライブラリ（デフォルトはautoで、orjson→ujson→jsonの順にインストールされているものを使用）")
+        print("  --compress=<gzip|zstd|xz>: 出力ファイルを圧縮して保存（zstdには zstandard ライブラリが必要）")
+        print("  --size-limit=<uncompressed|compressed>: 最大ファイルサイズを圧縮前・圧縮後のどちらのサイズに適用するか（デフォルトはuncompressed）")
+        print(f"  --format=<{'|'.join(OUTPUT_FORMATS)}>: 出力形式（parquet・arrowは列指向の形式で、pyarrow ライブラリが必要）")
+        print("  --index: 日時・ツイートIDで検索するためのインデックスファイルを作成（query サブコマンドで検索）")
+        print("  --write-threads=<N>: ファイル書き込みに使用するバックグラウンドスレッド数（デフォルト2、0で同期書き込み）")
+        print("  --incremental: 出力ディレクトリのマニフェストを使い、前回以降の新しいツイートのみを追加")
+        print("  --metrics=<パス>: 処理段階ごとの時間とカウンタを出力（拡張子が .prom の場合はPrometheusのテキスト形式、それ以外はJSON Lines で追記）")
+        print(f"  --profile[=<{'|'.join(PROFILE_MODES)}>]: cProfile（cpu、デフォルト）または tracemalloc（memory）の下で実行し、結果を保存")
+        print("  --no-schema-cache: 検出した入力の構造（日時のパス・フォーマット）をキャッシュファイルに保存・再利用しない")
+        print("  --profile-output=<パス>: プロファイル結果の出力先（デフォルトは twitter-log-splitter.prof または twitter-log-splitter-memory.txt）")
+        print(f"検索: {sys.argv[0]} query <出力ディレクトリ> [--since=<日時>] [--until=<日時>] [--id=<ツイートID>]")
+        sys.exit(1)
+    
+    input_file = sys.argv[1]
+    output_dir = sys.argv[2]
+    
+    # 検出した構造を実行をまたいで再利用する（--no-schema-cache で無効化）
+    set_schema_cache(default_schema_cache_path())
+    
+    max_size_mb = 5  # デフォルト5MB
+    text_only = False
+    group_by = 'month'  # デフォルトは月単位
+    memory_limit = None  # デフォルトはメモリ上で処理
+    workers = 1  # デフォルトは単一プロセス
+    parallel_periods = False
+    dedup = False
+    exclude_retweets = False
+    exclude_replies = False
+    since = None  # デフォルトは期間で絞り込まない
+    until = None
+    fields = None  # デフォルトはツイート全体を出力
+    incremental = False
+    write_threads = 2  # デフォルトは2スレッドで書き込み
+    build_index = False
+    adaptive = False
+    compression = None  # デフォルトは圧縮しない
+    compressed_limit = False
+    output_format = 'json'  # デフォルトはJSON
+    metrics_path = None
+    profile = None  # デフォルトはプロファイルしない
+    profile_output = None
+    
+    # 残りの引数を処理
+    for i in range(3, len(sys.argv)):
+        arg = sys.argv[i]
+        if arg == "--text-only":
+            text_only = True
+        elif arg == "--incremental":
+            incremental = True
+        elif arg == "--index":
+            build_index = True
+        elif arg == "--parallel-periods":
+            parallel_periods = True
+        elif arg.startswith("--fields="):
+            fields = [field for field in arg.split("=", 1)[1].split(",") if field.strip()]
+            if not fields:
+                print("警告: 出力するフィールドが指定されていません。ツイート全体を出力します。")
+                fields = None
+        elif arg == "--dedup":
+            dedup = True
+        elif arg == "--exclude-retweets":
+            exclude_retweets = True
+        elif arg == "--exclude-replies":
+            exclude_replies = True
+        elif arg.startswith("--since=") or arg.startswith("--until="):
+            name, value = arg[2:].split("=", 1)
+            try:
+                if name == "since":
+                    since = parse_query_time(value)
+                else:
+                    until = parse_query_time(value)
+            except ValueError:
+                print(f"エラー: 日時を認識できません: {value}")
+                sys.exit(1)
+        elif arg.startswith("--group-by="):
+            group_option = arg.split("=")[1].lower()
+            if group_option in GROUP_BY_CHOICES:
+                group_by = group_option
+            else:
+                print(f"警告: 無効なグループ化オプションです。デフォルトの {group_by} を使用します。")
+        elif arg.startswith("--bucket="):
+            bucket = arg.split("=", 1)[1].strip().lower()
+            try:
+                parse_duration(bucket)
+                group_by = bucket
+            except ValueError as e:
+                print(f"警告: {e}。{group_by} 単位でグループ化します。")
+        elif arg == "--adaptive":
+            adaptive = True
+        elif arg.startswith("--metrics="):
+            metrics_path = arg.split("=", 1)[1]
+        elif arg == "--profile":
+            profile = 'cpu'
+        elif arg.startswith("--profile="):
+            profile_option = arg.split("=", 1)[1].lower()
+            if profile_option in PROFILE_MODES:
+                profile = profile_option
+            else:
+                print(f"警告: 無効なプロファイルの種類です。{'・'.join(PROFILE_MODES)} のいずれかを指定してください。プロファイルせずに実行します。")
+        elif arg.startswith("--profile-output="):
+            profile_output = arg.split("=", 1)[1]
+        elif arg == "--no-schema-cache":
+            set_schema_cache(None)
+        elif arg.startswith("--compress="):
+            compress_option = arg.split("=", 1)[1].lower()
+            try:
+                StreamingCompressor(compress_option)
+                compression = compress_option
+            except ValueError as e:
+                print(f"警告: {e}。圧縮せずに出力します。")
+        elif arg.startswith("--format="):
+            format_option = arg.split("=", 1)[1].lower()
+            if format_option in OUTPUT_FORMATS:
+                output_format = format_option
+            else:
+                print(f"警告: 無効な出力形式です。デフォルトの {output_format} を使用します。")
+        elif arg.startswith("--size-limit="):
+            limit_option = arg.split("=", 1)[1].lower()
+            if limit_option in ['uncompressed', 'compressed']:
+                compressed_limit = limit_option == 'compressed'
+            else:
+                print("警告: 無効なサイズ上限の指定です。圧縮前のサイズに適用します。")
+        elif arg.startswith("--memory-limit="):
+            try:
+                memory_limit = parse_size(arg.split("=", 1)[1])
+            except ValueError:
+                print("警告: 無効なメモリ上限の指定です。メモリ上で処理します。")
+        elif arg.startswith("--json-backend="):
+            try:
+                json_codec.select_backend(arg.split("=", 1)[1].lower())
+            except ValueError as e:
+                print(f"警告: {e}。{json_codec.backend_name()} を使用します。")
+        elif arg.startswith("--write-threads="):
+            try:
+                write_threads = max(0, int(arg.split("=", 1)[1]))
+            except ValueError:
+                print(f"警告: 無効な書き込みスレッド数の指定です。デフォルトの {write_threads} を使用します。")
+        elif arg.startswith("--workers="):
+            try:
+                workers = max(1, int(arg.split("=", 1)[1]))
+            except ValueError:
+                print(f"警告: 無効なワーカー数の指定です。デフォルトの {workers} を使用します。")
+        elif i == 3 and not arg.startswith("--"):  # 3番目の引数がオプションでなければサイズと解釈
+            try:
+                max_size_mb = float(arg)
+            except ValueError:
+                print(f"警告: 無効なサイズ指定です。デフォルトの {max_size_mb}MB を使用します。")
+    
+    max_size_bytes = int(max_size_mb * 1024 * 1024)
+    
+    try:
+        options = dict(text_only=text_only, group_by=group_by, memory_limit=memory_limit, workers=workers, incremental=incremental, write_threads=write_threads, build_index=build_index, adaptive=adaptive, compression=compression, compressed_limit=compressed_limit, output_format=output_format, metrics_path=metrics_path, parallel_periods=parallel_periods, dedup=dedup, exclude_retweets=exclude_retweets, exclude_replies=exclude_replies, since=since, until=until, fields=fields)
+        if profile is not None:
+            file_count = run_with_profile(profile, profile_output, split_twitter_log_by_time, input_file, output_dir, max_size_bytes, **options)
+        else:
+            file_count = split_twitter_log_by_time(input_file, output_dir, max_size_bytes, **options)
+        print(f"合計 {file_count} ファイルを作成しました")
+        if text_only:
+            print("テキスト抽出モード: ツイートのテキスト部分のみが保存されました")
+        print(f"グループ化単位: {group_by}")
+    except Exception as e:
+        print(f"エラー: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()